@@ -1,132 +1,218 @@
 """Add missing assessments from train set."""
-import json
-import csv
-import requests
+import os
+import orjson
+import re
+import asyncio
+import aiohttp
+import pandas as pd
 from bs4 import BeautifulSoup
 from urllib.parse import urljoin
-import time
 
 BASE_URL = "https://www.shl.com"
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
 }
+MAX_CONCURRENT_FETCHES = 16
+FETCH_RETRIES = 3
+RETRY_BACKOFF = 0.3  # seconds, doubled on each retry
+ASSESSMENTS_FILE = 'data/assessments.json'
+# Crash-safe sink: each fetched assessment is appended here as soon as it arrives,
+# so an interrupted run resumes without re-crawling pages it already has
+PENDING_FILE = 'data/assessments.new.jsonl'
 
-def fetch_assessment(url):
+TYPE_KEYWORDS = {
+    'Ability & Aptitude': ['ability', 'aptitude', 'cognitive', 'reasoning'],
+    'Knowledge & Skills': ['knowledge', 'skills', 'technical'],
+    'Personality & Behavior': ['personality', 'behavior', 'opq'],
+    'Biodata & Situational Judgement': ['situational', 'judgement', 'biodata'],
+    'Simulations': ['simulation', 'simulated'],
+    'Assessment Exercises': ['exercise', 'assessment center'],
+    'Development & 360': ['development', '360', 'feedback'],
+    'Competencies': ['competenc', 'competency']
+}
+KEYWORD_TO_TYPE = {kw.lower(): type_name for type_name, kws in TYPE_KEYWORDS.items() for kw in kws}
+# Lookahead keeps substring semantics: overlapping keywords are all reported
+KEYWORD_RE = re.compile('(?=(' + '|'.join(map(re.escape, KEYWORD_TO_TYPE)) + '))')
+
+async def get_page(session, url, retries=FETCH_RETRIES):
+    """GET a page over the shared keep-alive session, retrying transient errors."""
+    for attempt in range(retries):
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=30)) as resp:
+                if resp.status != 200:
+                    return None
+                return await resp.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            if attempt == retries - 1:
+                raise
+            await asyncio.sleep(RETRY_BACKOFF * 2 ** attempt)
+
+async def fetch_html(session, url):
+    """Download a product page; returns None for non-200 responses."""
+    return await get_page(session, url)
+
+def parse_html(html, url):
+    """Parse a product page into an assessment record (CPU-bound, run off the event loop)."""
+    soup = BeautifulSoup(html, 'lxml')
+    
+    # Extract name
+    h1 = soup.find('h1')
+    name = h1.get_text(strip=True) if h1 else 'Unknown'
+    
+    # Extract description
+    meta_desc = soup.find('meta', {'name': 'description'})
+    description = meta_desc.get('content') if meta_desc else None
+    
+    if not description:
+        main = soup.find('main')
+        if main:
+            for p in main.find_all('p'):
+                text = p.get_text(strip=True)
+                if len(text) > 50:
+                    description = text
+                    break
+    
+    # Extract test types from page (single regex pass over the lowercased text)
+    text_lower = soup.get_text().lower()
+    found_types = {KEYWORD_TO_TYPE[m.group(1)] for m in KEYWORD_RE.finditer(text_lower)}
+    test_types = [type_name for type_name in TYPE_KEYWORDS if type_name in found_types]
+    
+    return {
+        'url': url,
+        'name': name,
+        'description': description,
+        'duration': None,
+        'remote_support': 'Yes',  # Default
+        'adaptive_support': 'No',  # Default
+        'test_type': test_types,
+        'alternate_urls': []
+    }
+
+async def fetch_assessment(session, url):
     """Fetch assessment details from URL."""
     try:
-        resp = requests.get(url, headers=HEADERS, timeout=30)
-        if resp.status_code != 200:
+        html = await fetch_html(session, url)
+        if html is None:
             return None
-        
-        soup = BeautifulSoup(resp.text, 'html.parser')
-        
-        # Extract name
-        h1 = soup.find('h1')
-        name = h1.get_text(strip=True) if h1 else 'Unknown'
-        
-        # Extract description
-        meta_desc = soup.find('meta', {'name': 'description'})
-        description = meta_desc.get('content') if meta_desc else None
-        
-        if not description:
-            main = soup.find('main')
-            if main:
-                for p in main.find_all('p'):
-                    text = p.get_text(strip=True)
-                    if len(text) > 50:
-                        description = text
-                        break
-        
-        # Extract test types from page
-        test_types = []
-        text_content = soup.get_text()
-        type_keywords = {
-            'Ability & Aptitude': ['ability', 'aptitude', 'cognitive', 'reasoning'],
-            'Knowledge & Skills': ['knowledge', 'skills', 'technical'],
-            'Personality & Behavior': ['personality', 'behavior', 'opq'],
-            'Biodata & Situational Judgement': ['situational', 'judgement', 'biodata'],
-            'Simulations': ['simulation', 'simulated'],
-            'Assessment Exercises': ['exercise', 'assessment center'],
-            'Development & 360': ['development', '360', 'feedback'],
-            'Competencies': ['competenc', 'competency']
-        }
-        
-        for type_name, keywords in type_keywords.items():
-            for keyword in keywords:
-                if keyword.lower() in text_content.lower():
-                    if type_name not in test_types:
-                        test_types.append(type_name)
-                    break
-        
-        return {
-            'url': url,
-            'name': name,
-            'description': description,
-            'duration': None,
-            'remote_support': 'Yes',  # Default
-            'adaptive_support': 'No',  # Default
-            'test_type': test_types,
-            'alternate_urls': []
-        }
+        # Parse in a worker thread so downloads keep flowing while we parse
+        return await asyncio.to_thread(parse_html, html, url)
     except Exception as e:
         print(f"Error fetching {url}: {e}")
         return None
 
-def main():
+def canonical_and_alt(url):
+    """Return (slug, alternate_url) for a catalog URL; slug is None if it has no /view/ part."""
+    slug = url.split('/view/')[-1].rstrip('/') if '/view/' in url else None
+    if '/solutions/products/' in url:
+        alt_url = url.replace('/solutions/products/', '/products/')
+    else:
+        alt_url = url.replace('/products/', '/solutions/products/')
+    return slug, alt_url
+
+async def bounded(sem, coro):
+    """Run coroutine while holding the semaphore (limits concurrent requests)."""
+    async with sem:
+        return await coro
+
+def load_pending():
+    """
+    Load assessments saved to the JSONL sink by a previous, interrupted run.
+    
+    Unparseable lines (e.g. a record truncated by a crash) are skipped, and
+    the sink is then rewritten with only the valid records so that new
+    records are appended after a clean newline.
+    """
+    if not os.path.exists(PENDING_FILE):
+        return []
+    pending = []
+    damaged = False
+    with open(PENDING_FILE, 'rb') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                pending.append(orjson.loads(line))
+            except orjson.JSONDecodeError:
+                damaged = True
+    if damaged:
+        tmp = PENDING_FILE + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.writelines(orjson.dumps(a) + b'\n' for a in pending)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, PENDING_FILE)
+    return pending
+
+def write_atomic(path, data):
+    """Write JSON to a temp file and swap it in, so a crash never leaves a half-written file."""
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_INDENT_2))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+async def main():
     # Load existing
-    with open('data/assessments.json', 'r') as f:
-        existing = json.load(f)
+    with open(ASSESSMENTS_FILE, 'rb') as f:
+        existing = orjson.loads(f.read())
+    
+    existing_slugs = {canonical_and_alt(a['url'])[0] for a in existing} - {None}
+    
+    # A crash between saving the catalog and removing the sink leaves records
+    # that are already in the catalog; drop those instead of adding them twice
+    pending = [a for a in load_pending() if canonical_and_alt(a['url'])[0] not in existing_slugs]
+    if pending:
+        print(f"Resuming with {len(pending)} assessments from {PENDING_FILE}")
     
-    existing_slugs = set()
-    for a in existing:
-        url = a['url']
-        if '/view/' in url:
-            slug = url.split('/view/')[-1].rstrip('/')
-            existing_slugs.add(slug)
+    existing_slugs.update(canonical_and_alt(a['url'])[0] for a in pending)
+    existing_slugs.discard(None)
     
     # Find missing from train set
-    train_urls = set()
-    with open('data/train.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            url = row['Assessment_url'].strip()
-            train_urls.add(url)
-    
-    missing = []
+    df = pd.read_csv('data/train.csv', usecols=['Assessment_url'], dtype=str, keep_default_na=False)
+    train_urls = set(df['Assessment_url'].str.strip())
+    
+    # One pass keyed by slug: both URL variants of the same assessment share a slug,
+    # so each missing assessment is fetched once
+    missing = {}
     for url in train_urls:
-        if '/view/' in url:
-            slug = url.split('/view/')[-1].rstrip('/')
-            if slug not in existing_slugs:
-                missing.append(url)
+        slug, alt_url = canonical_and_alt(url)
+        if slug and slug not in existing_slugs and slug not in missing:
+            missing[slug] = (url, alt_url)
+    missing = list(missing.values())
     
     print(f"Found {len(missing)} missing assessments")
     
-    # Fetch missing assessments
     new_assessments = []
-    for url in missing:
-        print(f"Fetching: {url}")
-        assessment = fetch_assessment(url)
-        if assessment:
-            new_assessments.append(assessment)
-            # Add alternate URL
-            if '/solutions/products/' in url:
-                alt_url = url.replace('/solutions/products/', '/products/')
-            else:
-                alt_url = url.replace('/products/', '/solutions/products/')
-            assessment['alternate_urls'] = [alt_url]
-        time.sleep(0.5)
+    
+    with open(PENDING_FILE, 'ab') as sink:
+        async def fetch_and_record(session, url, alt_url):
+            assessment = await fetch_assessment(session, url)
+            print(f"Fetched: {url}" if assessment else f"Failed: {url}")
+            if assessment:
+                assessment['alternate_urls'] = [alt_url]
+                sink.write(orjson.dumps(assessment) + b'\n')
+                sink.flush()
+                new_assessments.append(assessment)
+        
+        # Fetch missing assessments concurrently (semaphore caps in-flight requests)
+        sem = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+        # One pooled connector so TCP/TLS connections are reused across fetches
+        connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_FETCHES, ttl_dns_cache=300)
+        async with aiohttp.ClientSession(headers=HEADERS, connector=connector) as session:
+            await asyncio.gather(*[bounded(sem, fetch_and_record(session, u, alt)) for u, alt in missing])
     
     # Merge
-    all_assessments = existing + new_assessments
+    all_assessments = existing + pending + new_assessments
     
-    # Save
-    with open('data/assessments.json', 'w', encoding='utf-8') as f:
-        json.dump(all_assessments, f, indent=2, ensure_ascii=False)
+    # Save, then drop the sink now that its contents are in the catalog
+    write_atomic(ASSESSMENTS_FILE, all_assessments)
+    os.remove(PENDING_FILE)
     
-    print(f"\nAdded {len(new_assessments)} assessments")
+    print(f"\nAdded {len(pending) + len(new_assessments)} assessments")
     print(f"Total assessments: {len(all_assessments)}")
 
 if __name__ == "__main__":
-    main()
+    asyncio.run(main())
 
 
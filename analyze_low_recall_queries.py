@@ -4,23 +4,23 @@ This will help us target improvements better.
 """
 import sys
 import os
-import csv
 from collections import defaultdict
+import pandas as pd
 
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.advanced_retriever import retrieve_advanced
-from src.retriever import get_vector_db
+from src.advanced_retriever import retrieve_advanced_batch
+from src.retriever import get_vector_db, enable_query_cache
 from src.url_utils import normalize_url_to_slug, get_all_url_variants
-import json
+import orjson
 
 def main():
     # Load assessments to get names
-    with open('data/assessments.json', 'r', encoding='utf-8') as f:
-        assessments = json.load(f)
+    with open('data/assessments.json', 'rb') as f:
+        assessments = orjson.loads(f.read())
     
     url_to_name = {}
     for ass in assessments:
@@ -32,15 +32,13 @@ def main():
     train_queries = defaultdict(set)
     train_urls = defaultdict(list)
     
-    with open('data/train.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url_to_slug(url))
-            train_urls[query].append(url)
+    df = pd.read_csv('data/train.csv', usecols=['Query', 'Assessment_url'], dtype=str, keep_default_na=False)
+    for query, url in zip(df['Query'].str.strip(), df['Assessment_url'].str.strip()):
+        train_queries[query].add(normalize_url_to_slug(url))
+        train_urls[query].append(url)
     
     vector_db = get_vector_db()
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     print("="*70)
     print("LOW RECALL QUERY ANALYSIS")
@@ -48,8 +46,11 @@ def main():
     
     results = []
     
-    for query, relevant_slugs in train_queries.items():
-        recommendations = retrieve_advanced(query, vector_db, top_k=10, use_xgboost_rerank=True)
+    queries = list(train_queries)
+    retrieved = retrieve_advanced_batch(queries, vector_db, top_k=10, use_xgboost_rerank=True)
+    
+    for query, recommendations in zip(queries, retrieved):
+        relevant_slugs = train_queries[query]
         
         recommended_slugs = set()
         for r in recommendations:
@@ -97,15 +98,11 @@ def main():
     print("="*70)
     
     # Find common patterns in missed assessments
-    all_missed_names = []
-    for r in results:
-        all_missed_names.extend(r['missed_names'])
-    
-    from collections import Counter
-    missed_counts = Counter(all_missed_names)
+    all_missed_names = [name for r in results for name in r['missed_names']]
+    missed_counts = pd.Series(all_missed_names, dtype=object).value_counts()
     
     print("\nMost Frequently Missed Assessments:")
-    for name, count in missed_counts.most_common(10):
+    for name, count in missed_counts.head(10).items():
         print(f"  {name}: missed in {count} queries")
     
     # Analyze query types with low recall
@@ -114,13 +111,16 @@ def main():
     
     if low_recall_queries:
         print("\nCommon patterns in low-recall queries:")
+        # Lowercase once, then match each pattern in a vectorized pass
+        query_lower = pd.Series([r['query'] for r in low_recall_queries]).str.lower()
         patterns = {
-            'consultant': sum(1 for r in low_recall_queries if 'consultant' in r['query'].lower()),
-            'qa': sum(1 for r in low_recall_queries if 'qa' in r['query'].lower() or 'quality' in r['query'].lower()),
-            'marketing': sum(1 for r in low_recall_queries if 'marketing' in r['query'].lower()),
-            'manager': sum(1 for r in low_recall_queries if 'manager' in r['query'].lower()),
+            'consultant': 'consultant',
+            'qa': 'qa|quality',
+            'marketing': 'marketing',
+            'manager': 'manager',
         }
-        for pattern, count in patterns.items():
+        for pattern, regex in patterns.items():
+            count = int(query_lower.str.contains(regex, regex=True).sum())
             if count > 0:
                 print(f"  {pattern}: {count} queries")
 
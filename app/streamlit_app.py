@@ -1,6 +1,8 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
 import pandas as pd
+import numpy as np
 import os
 from dotenv import load_dotenv
 
@@ -25,6 +27,99 @@ with st.sidebar:
     if api_url_input:
         API_URL = api_url_input
 
+
+def fix_mojibake(text: str) -> str:
+    """Undo UTF-8 text that was mis-decoded as cp1252 (e.g. 'â€¦' -> '…') in one pass."""
+    try:
+        return text.encode('cp1252').decode('utf-8')
+    except UnicodeError:
+        return text
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """Keep-alive HTTP session shared across reruns, so repeat submissions skip the handshake."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=4)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update({'Accept-Encoding': 'gzip'})
+    return session
+
+
+@st.cache_data(ttl=300, show_spinner=False)
+def call_api(api_url: str, query: str) -> dict:
+    """POST the query to the API (cached per API URL + query for 5 minutes)."""
+    response = get_session().post(
+        f"{api_url}/recommend",
+        json={"query": query},
+        timeout=60
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+def render_results(data: dict):
+    """Render summary metrics, table and detail cards for an API response."""
+    assessments = data['recommended_assessments']
+    
+    if assessments:
+        st.success(f"Found {len(assessments)} recommendations")
+        
+        # Display summary statistics
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            # Exclude 0/null durations from average calculation
+            durations = np.fromiter(
+                (a['duration'] for a in assessments if a.get('duration', 0) and a['duration'] > 0),
+                dtype=float
+            )
+            if durations.size:
+                avg_duration = durations.mean()
+                st.metric("Average Duration", f"{avg_duration:.0f} mins")
+            else:
+                st.metric("Average Duration", "N/A")
+        with col2:
+            remote_count = sum(1 for a in assessments if a['remote_support'] == 'Yes')
+            st.metric("Remote Supported", f"{remote_count}/{len(assessments)}")
+        with col3:
+            adaptive_count = sum(1 for a in assessments if a['adaptive_support'] == 'Yes')
+            st.metric("Adaptive Tests", f"{adaptive_count}/{len(assessments)}", help="Adaptive tests use IRT (Item Response Theory) to adjust difficulty based on responses. Most technical skill assessments are not adaptive.")
+        
+        # Display as table
+        st.subheader("Recommended Assessments")
+        # Build column-wise so pandas doesn't have to infer a schema row by row
+        df = pd.DataFrame({
+            'Rank': range(1, len(assessments) + 1),
+            'Name': [a['name'] for a in assessments],
+            'Duration (mins)': [a['duration'] for a in assessments],
+            'Test Type': [', '.join(a['test_type']) if a['test_type'] else 'Unknown' for a in assessments],
+            'Remote Support': [a['remote_support'] for a in assessments],
+            'Adaptive': [a['adaptive_support'] for a in assessments],
+            'URL': [a['url'] for a in assessments]
+        })
+        st.dataframe(df, use_container_width=True, hide_index=True)
+        
+        # Display detailed cards
+        st.subheader("Detailed Information")
+        for i, assessment in enumerate(assessments, 1):
+            with st.expander(f"{i}. {assessment['name']}", expanded=(i == 1)):
+                col1, col2 = st.columns([2, 1])
+                with col1:
+                    st.write(f"**URL:** [{assessment['url']}]({assessment['url']})")
+                    # Clean description - fix encoding issues (e.g. 'â€¦' -> '…')
+                    description = fix_mojibake(assessment.get('description', '') or '')
+                    st.write(f"**Description:** {description}")
+                with col2:
+                    duration_display = f"{assessment['duration']} minutes" if assessment.get('duration', 0) and assessment['duration'] > 0 else "Not specified"
+                    st.write(f"**Duration:** {duration_display}")
+                    st.write(f"**Test Type:** {', '.join(assessment['test_type']) if assessment['test_type'] else 'Unknown'}")
+                    st.write(f"**Remote Support:** {assessment['remote_support']}")
+                    st.write(f"**Adaptive Support:** {assessment['adaptive_support']}")
+    else:
+        st.warning("No assessments found")
+
+
 # Main input area
 query = st.text_area(
     "Enter your job description or query:",
@@ -39,79 +134,15 @@ with col1:
 with col2:
     st.markdown("")
 
-if submit_button or query:
+if submit_button:
     if not query.strip():
         st.error("Please enter a query")
     else:
+        # Drop any previous result so a failed request doesn't show stale data
+        st.session_state.pop('result', None)
         with st.spinner("Finding relevant assessments..."):
             try:
-                response = requests.post(
-                    f"{API_URL}/recommend",
-                    json={"query": query},
-                    timeout=60
-                )
-                response.raise_for_status()
-                data = response.json()
-                
-                assessments = data['recommended_assessments']
-                
-                if assessments:
-                    st.success(f"Found {len(assessments)} recommendations")
-                    
-                    # Display summary statistics
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        # Exclude 0/null durations from average calculation
-                        durations = [a['duration'] for a in assessments if a.get('duration', 0) and a['duration'] > 0]
-                        if durations:
-                            avg_duration = sum(durations) / len(durations)
-                            st.metric("Average Duration", f"{avg_duration:.0f} mins")
-                        else:
-                            st.metric("Average Duration", "N/A")
-                    with col2:
-                        remote_count = sum(1 for a in assessments if a['remote_support'] == 'Yes')
-                        st.metric("Remote Supported", f"{remote_count}/{len(assessments)}")
-                    with col3:
-                        adaptive_count = sum(1 for a in assessments if a['adaptive_support'] == 'Yes')
-                        st.metric("Adaptive Tests", f"{adaptive_count}/{len(assessments)}", help="Adaptive tests use IRT (Item Response Theory) to adjust difficulty based on responses. Most technical skill assessments are not adaptive.")
-                    
-                    # Display as table
-                    st.subheader("Recommended Assessments")
-                    df = pd.DataFrame([
-                        {
-                            'Rank': i + 1,
-                            'Name': a['name'],
-                            'Duration (mins)': a['duration'],
-                            'Test Type': ', '.join(a['test_type']) if a['test_type'] else 'Unknown',
-                            'Remote Support': a['remote_support'],
-                            'Adaptive': a['adaptive_support'],
-                            'URL': a['url']
-                        }
-                        for i, a in enumerate(assessments)
-                    ])
-                    st.dataframe(df, use_container_width=True, hide_index=True)
-                    
-                    # Display detailed cards
-                    st.subheader("Detailed Information")
-                    for i, assessment in enumerate(assessments, 1):
-                        with st.expander(f"{i}. {assessment['name']}", expanded=(i == 1)):
-                            col1, col2 = st.columns([2, 1])
-                            with col1:
-                                st.write(f"**URL:** [{assessment['url']}]({assessment['url']})")
-                                # Clean description - fix ellipsis encoding issue
-                                description = assessment.get('description', '') or ''
-                                # Replace common encoding issues with proper ellipsis
-                                description = description.replace('â€¦', '…').replace('â€"', '—').replace('â€™', "'")
-                                st.write(f"**Description:** {description}")
-                            with col2:
-                                duration_display = f"{assessment['duration']} minutes" if assessment.get('duration', 0) and assessment['duration'] > 0 else "Not specified"
-                                st.write(f"**Duration:** {duration_display}")
-                                st.write(f"**Test Type:** {', '.join(assessment['test_type']) if assessment['test_type'] else 'Unknown'}")
-                                st.write(f"**Remote Support:** {assessment['remote_support']}")
-                                st.write(f"**Adaptive Support:** {assessment['adaptive_support']}")
-                else:
-                    st.warning("No assessments found")
-                    
+                st.session_state['result'] = call_api(API_URL, query)
             except requests.exceptions.ConnectionError:
                 st.error("Could not connect to API. Make sure the API is running.")
                 st.info(f"Expected API URL: {API_URL}")
@@ -125,6 +156,9 @@ if submit_button or query:
             except Exception as e:
                 st.error(f"Error: {e}")
 
+if 'result' in st.session_state:
+    render_results(st.session_state['result'])
+
 # Footer
 st.markdown("---")
 st.markdown("**SHL Assessment Recommendation System** - Built for AI Research Intern Assessment")
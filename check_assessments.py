@@ -1,8 +1,18 @@
 """Check if missing assessments exist in our database."""
-import json
+import orjson
 
-with open('data/assessments.json', 'r') as f:
-    assessments = json.load(f)
+with open('data/assessments.json', 'rb') as f:
+    assessments = orjson.loads(f.read())
+
+
+def _slug(url):
+    """Lowercased slug after /view/ (or the whole URL if there is none)."""
+    url = url.rstrip('/')
+    return url.rsplit('/view/', 1)[-1].lower() if '/view/' in url else url.lower()
+
+
+# Index assessments by slug once so each lookup is a dict hit, not a scan
+slug_index = {_slug(a['url']): a for a in assessments}
 
 # Check for specific slugs from train set
 missing_slugs = [
@@ -20,10 +30,10 @@ print('Checking if train set assessments exist in our database:')
 print('=' * 60)
 found_count = 0
 for slug in missing_slugs:
-    found = [a for a in assessments if slug in a['url'].lower()]
-    if found:
+    hit = slug_index.get(slug)
+    if hit:
         print(f'FOUND: {slug}')
-        print(f'       -> {found[0]["name"]}')
+        print(f'       -> {hit["name"]}')
         found_count += 1
     else:
         print(f'MISSING: {slug}')
@@ -35,7 +45,6 @@ print('All Java-related assessments in database:')
 print('=' * 60)
 java_assessments = [a for a in assessments if 'java' in a['name'].lower()]
 for a in java_assessments:
-    slug = a['url'].split('/view/')[-1].rstrip('/') if '/view/' in a['url'] else a['url']
-    print(f'  {slug}: {a["name"]}')
+    print(f'  {_slug(a["url"])}: {a["name"]}')
 
 
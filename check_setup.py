@@ -1,10 +1,17 @@
 """
 Quick setup verification script.
 Checks if all required files and dependencies are in place.
+
+Usage: python check_setup.py [--deep]
+  --deep  actually import each dependency instead of only locating it
 """
+import importlib
+import importlib.util
 import os
 import sys
 
+KEY_DEPENDENCIES = ('fastapi', 'streamlit', 'chromadb', 'google.generativeai')
+
 
 def check_file(path, description):
     """Check if a file exists."""
@@ -22,7 +29,25 @@ def check_directory(path, description):
     return exists
 
 
+def check_module(name, deep=False):
+    """Check if a module is installed (imports it only in deep mode)."""
+    try:
+        if deep:
+            importlib.import_module(name)
+            ok = True
+        else:
+            # Spec lookup only - avoids running the package's (slow) import-time code
+            ok = importlib.util.find_spec(name) is not None
+    except ImportError:
+        ok = False
+    status = "[OK]" if ok else "[MISSING]"
+    print(f"  {status} {name}")
+    return ok
+
+
 def main():
+    deep = '--deep' in sys.argv[1:]
+
     print("="*60)
     print("SHL Assessment Recommender - Setup Verification")
     print("="*60)
@@ -68,14 +93,8 @@ def main():
     print("Checking dependencies...")
     req_exists = check_file("requirements.txt", "Requirements file")
     if req_exists:
-        try:
-            import fastapi
-            import streamlit
-            import chromadb
-            import google.generativeai
-            print("  [OK] Key dependencies are installed")
-        except ImportError as e:
-            print(f"  [MISSING] Missing dependency: {e}")
+        deps_ok = all([check_module(name, deep=deep) for name in KEY_DEPENDENCIES])
+        if not deps_ok:
             print("  Run: pip install -r requirements.txt")
             all_ok = False
     print()
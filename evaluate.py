@@ -0,0 +1,122 @@
+"""
+Evaluate several retrieval strategies in one process.
+
+The Gemini index, the SentenceTransformer index/model and the query
+embedding caches are loaded once and shared by every selected strategy.
+
+Usage:
+    python evaluate.py
+    python evaluate.py --strategies st,st_boost,gemini,ensemble,ensemble_no_st
+"""
+import sys
+import os
+
+# Fix encoding for Windows
+if sys.platform == 'win32':
+    sys.stdout.reconfigure(encoding='utf-8')
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from src.url_utils import get_all_url_variants
+from src.eval_utils import RecallScorer, RecallTracker, parse_eval_args, load_train
+from src.eval_strategies import STRATEGIES
+
+
+def add_arguments(parser):
+    parser.add_argument('--strategies', default=','.join(STRATEGIES),
+                        help=f"Comma-separated strategies to run (default: all of {', '.join(STRATEGIES)})")
+
+
+def load_dbs(strategies):
+    """Load only the vector DBs the selected strategies need."""
+    vector_db = None
+    st_db = None
+    
+    if any(STRATEGIES[name].needs_gemini for name in strategies):
+        try:
+            from src.retriever import get_vector_db, enable_query_cache
+            print("Loading Gemini vector database...")
+            vector_db = get_vector_db()
+            enable_query_cache()  # reuse query embeddings from earlier runs
+        except Exception as e:
+            print(f"Error loading Gemini vector DB: {e}")
+    
+    # The ensemble uses ST results whenever the ST DB is loaded
+    if any(STRATEGIES[name].needs_st for name in strategies):
+        try:
+            from src.retriever_st import get_vector_db_st, enable_query_cache_st
+            print("Loading SentenceTransformer vector database...")
+            st_db = get_vector_db_st()
+            enable_query_cache_st()
+        except Exception as e:
+            print(f"Error loading SentenceTransformer vector DB: {e}")
+    
+    return vector_db, st_db
+
+
+def main():
+    args = parse_eval_args(__doc__, add_arguments)
+    
+    strategies = [name.strip() for name in args.strategies.split(',') if name.strip()]
+    unknown = [name for name in strategies if name not in STRATEGIES]
+    if unknown:
+        print(f"Error: unknown strategies {unknown}. Choose from: {', '.join(STRATEGIES)}")
+        return
+    
+    train_path = 'data/train.csv'
+    if not os.path.exists(train_path):
+        print(f"Error: {train_path} not found")
+        return
+    
+    train_queries = load_train(train_path)
+    queries = list(train_queries)
+    print(f"Loaded {len(train_queries)} unique queries from train set")
+    scorer = RecallScorer(train_queries)
+    
+    vector_db, st_db = load_dbs(strategies)
+    
+    results = {}
+    for name in strategies:
+        strategy = STRATEGIES[name]
+        if (strategy.needs_gemini and vector_db is None) or (strategy.needs_st and st_db is None):
+            print(f"\nSkipping {strategy.label}: required vector DB not available")
+            continue
+        
+        print(f"\n{'='*60}")
+        print(f"Evaluating: {strategy.label}")
+        print(f"{'='*60}")
+        
+        try:
+            recommendations = strategy.run(queries, vector_db, st_db, workers=args.workers)
+        except Exception as e:
+            print(f"Error with {strategy.label}: {e}")
+            continue
+        
+        tracker = RecallTracker(keep=5)
+        for query in queries:
+            recommended_slugs = set()
+            for r in recommendations.get(query) or []:
+                recommended_slugs.update(get_all_url_variants(r.get('url', ''), r.get('alternate_urls', [])))
+            hits, recall = scorer.score(query, recommended_slugs)
+            tracker.add(recall, (query, recall))
+        
+        print(f"Mean Recall@10: {tracker.mean:.4f} ({tracker.mean*100:.2f}%)")
+        for query, recall in tracker.worst():
+            print(f"  {recall*100:5.2f}% - {query[:60]}...")
+        results[strategy.label] = tracker.mean
+    
+    # Summary
+    print("\n" + "="*60)
+    print("SUMMARY - Mean Recall@10")
+    print("="*60)
+    for label, recall in sorted(results.items(), key=lambda x: x[1], reverse=True):
+        print(f"  {label}: {recall*100:.2f}%")
+    
+    if results:
+        best = max(results.items(), key=lambda x: x[1])
+        print(f"\nBest strategy: {best[0]} ({best[1]*100:.2f}%)")
+
+
+if __name__ == "__main__":
+    main()
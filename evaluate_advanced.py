@@ -1,39 +1,28 @@
 """Evaluate with advanced retriever."""
-import json
-import csv
-from collections import defaultdict
-from src.advanced_retriever import retrieve_advanced
-from src.retriever import get_vector_db
-
-def normalize_url(url):
-    """Extract slug from URL."""
-    url = url.lower().strip().rstrip('/')
-    if '/view/' in url:
-        return url.split('/view/')[-1].rstrip('/')
-    return url
+from src.advanced_retriever import retrieve_advanced_batch
+from src.retriever import get_vector_db, enable_query_cache
+from src.url_utils import normalize_url_to_slug as normalize_url
+from src.eval_utils import load_train
 
 def main():
     print("Loading vector database...")
     vector_db = get_vector_db()
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     print("Loading train data...")
-    train_queries = defaultdict(set)
-    with open('data/train.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url(url))
+    train_queries = load_train('data/train.csv')
     
     print(f"Found {len(train_queries)} unique queries\n")
     
+    # Use advanced retriever (one batched embedding call + one FAISS search)
+    queries = list(train_queries)
+    results_per_query = retrieve_advanced_batch(queries, vector_db, top_k=10)
+    
     recalls = []
-    for query, relevant_slugs in train_queries.items():
+    for query, results in zip(queries, results_per_query):
+        relevant_slugs = train_queries[query]
         print(f"Query: {query[:70]}...")
         
-        # Use advanced retriever
-        results = retrieve_advanced(query, vector_db, top_k=10)
-        
         # Get recommended slugs (including alternate URLs)
         recommended_slugs = set()
         for r in results:
@@ -1,40 +1,41 @@
 """Comprehensive evaluation of all retrieval strategies."""
-import json
-import csv
-from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from src.advanced_retriever import retrieve_advanced
 from src.ensemble_retriever import ensemble_retrieve
-from src.retriever import get_vector_db
-from src.url_utils import normalize_url_to_slug, get_all_url_variants
+from src.retriever import get_vector_db, enable_query_cache
+from src.url_utils import get_all_url_variants
+from src.eval_utils import compute_recalls, load_train
 
-def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, **kwargs):
+MAX_WORKERS = 16  # retrieval is I/O-bound (embedding/LLM APIs), so threads overlap the waits
+
+
+def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, top_k=10, use_llm_rerank=False):
     """Evaluate a retrieval strategy using unified URL normalization."""
     print(f"\n{'='*60}")
     print(f"Evaluating: {strategy_name}")
     print(f"{'='*60}")
     
-    recalls = []
-    for query, relevant_slugs in train_queries.items():
+    def _retrieve(query):
         try:
-            results = retrieve_func(query, vector_db, **kwargs)
-            
-            # Get recommended slugs (including alternate URLs) using unified normalization
-            recommended_slugs = set()
-            for r in results:
-                url = r.get('url', '')
-                alternate_urls = r.get('alternate_urls', [])
-                # Get all URL variants (primary + alternates) normalized to slugs
-                variants = get_all_url_variants(url, alternate_urls)
-                recommended_slugs.update(variants)
-            
-            # Calculate recall
-            hits = len(relevant_slugs & recommended_slugs)
-            recall = hits / len(relevant_slugs) if relevant_slugs else 0
-            recalls.append(recall)
-            
+            return retrieve_func(query, vector_db, top_k=top_k, use_llm_rerank=use_llm_rerank)
         except Exception as e:
             print(f"Error with query: {e}")
-            recalls.append(0.0)
+            return None
+    
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        all_results = list(executor.map(_retrieve, train_queries))
+    
+    # Get recommended slugs (including alternate URLs) using unified normalization
+    recommended = {}
+    for query, results in zip(train_queries, all_results):
+        recommended_slugs = set()
+        for r in results or ():
+            # Get all URL variants (primary + alternates) normalized to slugs
+            recommended_slugs.update(get_all_url_variants(r.get('url', ''), r.get('alternate_urls', [])))
+        recommended[query] = recommended_slugs
+    
+    # Calculate recall for all queries at once
+    recalls = compute_recalls(train_queries, recommended).tolist()
     
     mean_recall = sum(recalls) / len(recalls) if recalls else 0
     print(f"\nMean Recall@10: {mean_recall:.4f} ({mean_recall*100:.2f}%)")
@@ -44,16 +45,10 @@ def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, **
 def main():
     print("Loading vector database...")
     vector_db = get_vector_db()
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     print("Loading train data...")
-    train_queries = defaultdict(set)
-    with open('data/train.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            # Use unified normalization to extract slug
-            train_queries[query].add(normalize_url_to_slug(url))
+    train_queries = load_train('data/train.csv')
     
     print(f"Found {len(train_queries)} unique queries")
     
@@ -3,8 +3,6 @@ Comprehensive evaluation of all retrieval strategies including SentenceTransform
 """
 import sys
 import os
-import csv
-from collections import defaultdict
 
 # Fix encoding for Windows
 if sys.platform == 'win32':
@@ -13,11 +11,13 @@ if sys.platform == 'win32':
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.url_utils import normalize_url_to_slug, get_all_url_variants
+from src.url_utils import get_all_url_variants
+from src.eval_utils import RecallScorer, DEFAULT_WORKERS, parse_eval_args, map_queries, load_train
 
 
-def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, top_k=10, **kwargs):
+def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, top_k=10, workers=DEFAULT_WORKERS, **kwargs):
     """Evaluate a retrieval strategy on train queries."""
+    scorer = RecallScorer(train_queries)
     total_recall = 0.0
     query_count = 0
     
@@ -25,26 +25,27 @@ def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, to
     print(f"Evaluating: {strategy_name}")
     print(f"{'='*60}")
     
-    for query, relevant_slugs in train_queries.items():
-        try:
-            results = retrieve_func(query, vector_db, top_k=top_k, **kwargs)
-            
-            # Get recommended URL slugs
-            recommended_slugs = set()
-            for r in results:
-                url = r.get('url', '')
-                alternate_urls = r.get('alternate_urls', [])
-                variants = get_all_url_variants(url, alternate_urls)
-                recommended_slugs.update(variants)
-            
-            # Calculate recall
-            matches = len(relevant_slugs & recommended_slugs)
-            recall = matches / len(relevant_slugs) if relevant_slugs else 0.0
-            total_recall += recall
-            query_count += 1
-        except Exception as e:
-            print(f"Error processing query '{query[:50]}...': {e}")
+    all_results = map_queries(
+        lambda q: retrieve_func(q, vector_db, top_k=top_k, **kwargs),
+        train_queries, workers, catch_errors=True
+    )
+    
+    for query, results in zip(train_queries, all_results):
+        if results is None:
             continue
+        
+        # Get recommended URL slugs
+        recommended_slugs = set()
+        for r in results:
+            url = r.get('url', '')
+            alternate_urls = r.get('alternate_urls', [])
+            variants = get_all_url_variants(url, alternate_urls)
+            recommended_slugs.update(variants)
+        
+        # Calculate recall
+        matches, recall = scorer.score(query, recommended_slugs)
+        total_recall += recall
+        query_count += 1
     
     mean_recall = total_recall / query_count if query_count > 0 else 0.0
     print(f"\nMean Recall@{top_k}: {mean_recall:.4f} ({mean_recall*100:.2f}%)")
@@ -54,35 +55,44 @@ def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, to
 
 
 def main():
+    args = parse_eval_args(__doc__)
+    
     # Load train data
     train_path = 'data/train.csv'
     if not os.path.exists(train_path):
         print(f"Error: {train_path} not found")
         return
     
-    train_queries = defaultdict(set)
-    with open(train_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url_to_slug(url))
+    train_queries = load_train(train_path)
     
     print(f"Loaded {len(train_queries)} unique queries from train set")
     
     results = {}
     
+    def batch_results(db, boost):
+        """Run every train query through one batched ST encode + search."""
+        from src.retriever_st import retrieve_batch, enable_query_cache_st
+        enable_query_cache_st()  # reuse query embeddings from earlier runs
+        queries = list(train_queries)
+        return dict(zip(queries, retrieve_batch(queries, db, top_k=10, boost=boost)))
+    
     # Test 1: SentenceTransformer with keyword boost (Best: 33.33%)
     try:
-        from src.retriever_st import retrieve_with_boost_st, get_vector_db_st
+        from src.retriever_st import get_vector_db_st
         
         db_st = get_vector_db_st()
         if db_st:
+            boosted_results = batch_results(db_st, boost=True)
+            
+            def st_boosted(query, db, top_k=10, **kwargs):
+                return boosted_results[query]
+            
             recall = evaluate_strategy(
                 "SentenceTransformer (Keyword Boost)",
-                retrieve_with_boost_st,
+                st_boosted,
                 db_st,
-                train_queries
+                train_queries,
+                workers=args.workers
             )
             results["ST Boosted"] = recall
         else:
@@ -90,21 +100,38 @@ def main():
     except Exception as e:
         print(f"Error with SentenceTransformer: {e}")
     
-    # Test 2: Gemini Advanced (Current: 32.67%)
+    # Load the Gemini vector DB once; tests 2-4 share it
     try:
-        from src.advanced_retriever import retrieve_advanced
-        from src.retriever import get_vector_db
+        from src.retriever import get_vector_db, enable_query_cache
         
         db_gemini = get_vector_db()
+        enable_query_cache()
+    except Exception as e:
+        print(f"Error loading Gemini vector DB: {e}")
+        db_gemini = None
+    
+    # Run each retrieval primitive once per query; tests 2-4 are composed from these
+    components = {}
+    if db_gemini:
+        from src.pipeline import retrieve_components, advanced_from_components, ensemble_from_components
+        all_components = map_queries(
+            lambda q: retrieve_components(q, db_gemini, top_k=10),
+            train_queries, args.workers, catch_errors=True
+        )
+        components = {q: c for q, c in zip(train_queries, all_components) if c is not None}
+    
+    # Test 2: Gemini Advanced (Current: 32.67%)
+    try:
         if db_gemini:
             def gemini_retrieve(query, db, top_k=10, **kwargs):
-                return retrieve_advanced(query, db, top_k=top_k, use_llm_rerank=False)
+                return advanced_from_components(components[query], top_k=top_k)
             
             recall = evaluate_strategy(
                 "Gemini Advanced (No LLM)",
                 gemini_retrieve,
                 db_gemini,
-                train_queries
+                train_queries,
+                workers=args.workers
             )
             results["Gemini Advanced"] = recall
     except Exception as e:
@@ -112,19 +139,16 @@ def main():
     
     # Test 3: Ensemble with SentenceTransformer
     try:
-        from src.ensemble_retriever import ensemble_retrieve
-        from src.retriever import get_vector_db
-        
-        db_gemini = get_vector_db()
         if db_gemini:
             def ensemble_retrieve_wrapper(query, db, top_k=10, **kwargs):
-                return ensemble_retrieve(query, db, top_k=top_k, use_llm_rerank=False, include_st=True)
+                return ensemble_from_components(components[query], top_k=top_k, include_st=True)
             
             recall = evaluate_strategy(
                 "Ensemble (ST + Gemini)",
                 ensemble_retrieve_wrapper,
                 db_gemini,
-                train_queries
+                train_queries,
+                workers=args.workers
             )
             results["Ensemble (ST+Gemini)"] = recall
     except Exception as e:
@@ -132,19 +156,16 @@ def main():
     
     # Test 4: Ensemble without SentenceTransformer (for comparison)
     try:
-        from src.ensemble_retriever import ensemble_retrieve
-        from src.retriever import get_vector_db
-        
-        db_gemini = get_vector_db()
         if db_gemini:
             def ensemble_retrieve_no_st(query, db, top_k=10, **kwargs):
-                return ensemble_retrieve(query, db, top_k=top_k, use_llm_rerank=False, include_st=False)
+                return ensemble_from_components(components[query], top_k=top_k, include_st=False)
             
             recall = evaluate_strategy(
                 "Ensemble (Gemini Only)",
                 ensemble_retrieve_no_st,
                 db_gemini,
-                train_queries
+                train_queries,
+                workers=args.workers
             )
             results["Ensemble (Gemini)"] = recall
     except Exception as e:
@@ -3,8 +3,6 @@ Evaluate current system (Advanced Retriever + XGBoost Re-ranking) with fixes.
 """
 import sys
 import os
-import csv
-from collections import defaultdict
 
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -12,70 +10,66 @@ if sys.platform == 'win32':
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from src.advanced_retriever import retrieve_advanced
-from src.retriever import get_vector_db
-from src.url_utils import normalize_url_to_slug, get_all_url_variants
+from src.retriever import get_vector_db, enable_query_cache
+from src.url_utils import get_all_url_variants
+from src.eval_utils import RecallScorer, RecallTracker, parse_eval_args, map_queries, load_train
 
 def main():
+    args = parse_eval_args(__doc__)
+    
     # Load train data
     train_path = 'data/train.csv'
     if not os.path.exists(train_path):
         print(f"Error: {train_path} not found")
         return
     
-    train_queries = defaultdict(set)
-    with open(train_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url_to_slug(url))
+    train_queries = load_train(train_path)
     
     print(f"Loaded {len(train_queries)} unique queries from train set")
+    scorer = RecallScorer(train_queries)
     
     # Load vector DB
     print("Loading vector database...")
     vector_db = get_vector_db()
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     # Evaluate with current system (XGBoost re-ranking)
     print("\n" + "="*60)
     print("Evaluating: Advanced Retriever + XGBoost Re-ranking")
     print("="*60)
     
-    total_recall = 0.0
-    query_count = 0
-    per_query_recalls = []
+    tracker = RecallTracker(keep=20)
+    
+    def _retrieve(query):
+        # Get recommendations using current system (same as submission)
+        return retrieve_advanced(
+            query=query,
+            vector_db=vector_db,
+            top_k=10,
+            use_llm_rerank=False,
+            use_xgboost_rerank=True
+        )
+    
+    all_results = map_queries(_retrieve, train_queries, args.workers, catch_errors=True)
     
-    for query, relevant_slugs in train_queries.items():
-        try:
-            # Get recommendations using current system (same as submission)
-            results = retrieve_advanced(
-                query=query,
-                vector_db=vector_db,
-                top_k=10,
-                use_llm_rerank=False,
-                use_xgboost_rerank=True
-            )
-            
-            # Get recommended URL slugs (including alternate URLs)
-            recommended_slugs = set()
-            for r in results:
-                url = r.get('url', '')
-                alternate_urls = r.get('alternate_urls', [])
-                variants = get_all_url_variants(url, alternate_urls)
-                recommended_slugs.update(variants)
-            
-            # Calculate recall
-            matches = len(relevant_slugs & recommended_slugs)
-            recall = matches / len(relevant_slugs) if relevant_slugs else 0.0
-            total_recall += recall
-            query_count += 1
-            per_query_recalls.append((query, recall, matches, len(relevant_slugs)))
-            
-        except Exception as e:
-            print(f"Error processing query '{query[:50]}...': {e}")
+    for (query, relevant_slugs), results in zip(train_queries.items(), all_results):
+        if results is None:
             continue
+        
+        # Get recommended URL slugs (including alternate URLs)
+        recommended_slugs = set()
+        for r in results:
+            url = r.get('url', '')
+            alternate_urls = r.get('alternate_urls', [])
+            variants = get_all_url_variants(url, alternate_urls)
+            recommended_slugs.update(variants)
+        
+        # Calculate recall
+        matches, recall = scorer.score(query, recommended_slugs)
+        tracker.add(recall, (query, recall, matches, len(relevant_slugs)))
     
-    mean_recall = total_recall / query_count if query_count > 0 else 0.0
+    mean_recall = tracker.mean
+    query_count = tracker.count
     
     print(f"\n{'='*60}")
     print(f"RESULTS")
@@ -85,9 +79,9 @@ def main():
     
     # Per-query breakdown
     print(f"\n{'='*60}")
-    print("Per-Query Recall:")
+    print(f"Per-Query Recall (worst {tracker.keep}):")
     print(f"{'='*60}")
-    for query, recall, matches, total in sorted(per_query_recalls, key=lambda x: x[1]):
+    for query, recall, matches, total in tracker.worst():
         print(f"  {recall*100:5.2f}% ({matches}/{total}) - {query[:60]}...")
     
     print(f"\n{'='*60}")
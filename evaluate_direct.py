@@ -1,41 +1,29 @@
 """Direct evaluation without API - just retriever."""
-import json
-import csv
-from collections import defaultdict
-from src.retriever import retrieve_candidates, get_vector_db
-
-def normalize_url(url):
-    """Normalize URL for comparison - extract slug."""
-    url = url.lower().strip().rstrip('/')
-    # Extract slug from URL
-    if '/view/' in url:
-        slug = url.split('/view/')[-1].rstrip('/')
-        return slug
-    return url
+from src.retriever import retrieve_candidates_batch, get_vector_db, enable_query_cache
+from src.eval_utils import RecallScorer, parse_eval_args, load_train
+from src.url_utils import normalize_url_to_slug as normalize_url
 
 def main():
+    parse_eval_args(__doc__)
+    
     # Load vector DB
     print("Loading vector database...")
     vector_db = get_vector_db()
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     # Load train data
     print("Loading train data...")
-    train_queries = defaultdict(set)
-    with open('data/train.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url(url))
+    train_queries = load_train('data/train.csv')
     
     print(f"Found {len(train_queries)} unique queries")
+    scorer = RecallScorer(train_queries)
     
     # Evaluate
     recalls = []
-    for query, relevant_slugs in train_queries.items():
-        # Get recommendations (increase top_k for better recall)
-        results = retrieve_candidates(query, vector_db, top_k=15)
-        
+    # Get recommendations (increase top_k for better recall)
+    all_results = retrieve_candidates_batch(list(train_queries), vector_db, top_k=15)
+    
+    for (query, relevant_slugs), results in zip(train_queries.items(), all_results):
         # Get recommended slugs (including alternate URLs)
         recommended_slugs = set()
         for r in results[:10]:  # Take top 10 for evaluation
@@ -45,8 +33,7 @@ def main():
                 recommended_slugs.add(normalize_url(alt_url))
         
         # Calculate recall
-        hits = len(relevant_slugs & recommended_slugs)
-        recall = hits / len(relevant_slugs) if relevant_slugs else 0
+        hits, recall = scorer.score(query, recommended_slugs)
         recalls.append(recall)
         
         print(f"\nQuery: {query[:80]}...")
@@ -1,92 +1,77 @@
 """Evaluate ensemble retriever."""
-import json
-import csv
-from collections import defaultdict
+import os
+import sys
 from src.ensemble_retriever import ensemble_retrieve
-from src.retriever import get_vector_db
+from src.retriever import get_vector_db, enable_query_cache
+from src.eval_utils import RecallScorer, parse_eval_args, map_queries, load_train
+from src.url_utils import normalize_url_to_slug as normalize_url
+
+# Per-query details are off by default; enable with --verbose or EVAL_VERBOSE=1
+VERBOSE = os.environ.get('EVAL_VERBOSE', '0') == '1'
+
+
+def add_arguments(parser):
+    parser.add_argument('--verbose', action='store_true', default=VERBOSE,
+                        help='Print per-query hits and matches (default: EVAL_VERBOSE=1)')
 
-def normalize_url(url):
-    """Extract slug from URL."""
-    url = url.lower().strip().rstrip('/')
-    if '/view/' in url:
-        return url.split('/view/')[-1].rstrip('/')
-    return url
 
 def main():
+    args = parse_eval_args(__doc__, add_arguments)
+    
     print("=" * 70)
     print("ENSEMBLE RETRIEVER EVALUATION")
     print("=" * 70)
     
     print("\nLoading vector database...")
     vector_db = get_vector_db()
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     print("Loading train data...")
-    train_queries = defaultdict(set)
-    with open('data/train.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url(url))
+    train_queries = load_train('data/train.csv')
     
     print(f"Found {len(train_queries)} unique queries\n")
+    scorer = RecallScorer(train_queries)
+    
+    def run_sweep(use_llm_rerank):
+        """Mean recall for one sweep; per-query details are buffered and written once."""
+        recalls = []
+        buf = []
+        all_results = map_queries(
+            lambda q: ensemble_retrieve(q, vector_db, top_k=10, use_llm_rerank=use_llm_rerank),
+            train_queries, args.workers
+        )
+        for (query, relevant_slugs), results in zip(train_queries.items(), all_results):
+            recommended_slugs = set()
+            for r in results:
+                recommended_slugs.add(normalize_url(r['url']))
+                for alt_url in r.get('alternate_urls', []):
+                    recommended_slugs.add(normalize_url(alt_url))
+            
+            hits, recall = scorer.score(query, recommended_slugs)
+            recalls.append(recall)
+            
+            if args.verbose:
+                buf.append(f"\nQuery: {query[:60]}...")
+                buf.append(f"  Relevant: {len(relevant_slugs)}, Hits: {hits}, Recall@10: {recall:.4f}")
+                if hits > 0:
+                    buf.append(f"  Matched: {list(relevant_slugs & recommended_slugs)[:5]}")
+                elif use_llm_rerank:
+                    buf.append(f"  Missing: {list(relevant_slugs)[:3]}")
+        
+        if buf:
+            sys.stdout.write('\n'.join(buf) + '\n')
+            sys.stdout.flush()
+        return sum(recalls) / len(recalls) if recalls else 0
     
     # Test with and without LLM re-ranking
     print("Testing ensemble retriever WITH LLM re-ranking:")
     print("-" * 70)
-    
-    recalls_with_llm = []
-    for query, relevant_slugs in train_queries.items():
-        print(f"\nQuery: {query[:60]}...")
-        
-        results = ensemble_retrieve(query, vector_db, top_k=10, use_llm_rerank=True)
-        
-        recommended_slugs = set()
-        for r in results:
-            recommended_slugs.add(normalize_url(r['url']))
-            for alt_url in r.get('alternate_urls', []):
-                recommended_slugs.add(normalize_url(alt_url))
-        
-        hits = len(relevant_slugs & recommended_slugs)
-        recall = hits / len(relevant_slugs) if relevant_slugs else 0
-        recalls_with_llm.append(recall)
-        
-        print(f"  Relevant: {len(relevant_slugs)}, Hits: {hits}, Recall@10: {recall:.4f}")
-        if hits > 0:
-            matched = list(relevant_slugs & recommended_slugs)[:5]
-            print(f"  Matched: {matched}")
-        else:
-            missing = list(relevant_slugs)[:3]
-            print(f"  Missing: {missing}")
-    
-    mean_recall_with_llm = sum(recalls_with_llm) / len(recalls_with_llm) if recalls_with_llm else 0
+    mean_recall_with_llm = run_sweep(use_llm_rerank=True)
     
     print("\n" + "=" * 70)
     print("Testing ensemble retriever WITHOUT LLM re-ranking:")
     print("-" * 70)
-    
-    recalls_without_llm = []
-    for query, relevant_slugs in train_queries.items():
-        print(f"\nQuery: {query[:60]}...")
-        
-        results = ensemble_retrieve(query, vector_db, top_k=10, use_llm_rerank=False)
-        
-        recommended_slugs = set()
-        for r in results:
-            recommended_slugs.add(normalize_url(r['url']))
-            for alt_url in r.get('alternate_urls', []):
-                recommended_slugs.add(normalize_url(alt_url))
-        
-        hits = len(relevant_slugs & recommended_slugs)
-        recall = hits / len(relevant_slugs) if relevant_slugs else 0
-        recalls_without_llm.append(recall)
-        
-        print(f"  Relevant: {len(relevant_slugs)}, Hits: {hits}, Recall@10: {recall:.4f}")
-        if hits > 0:
-            matched = list(relevant_slugs & recommended_slugs)[:5]
-            print(f"  Matched: {matched}")
-    
-    mean_recall_without_llm = sum(recalls_without_llm) / len(recalls_without_llm) if recalls_without_llm else 0
+    mean_recall_without_llm = run_sweep(use_llm_rerank=False)
     
     print("\n" + "=" * 70)
     print("RESULTS SUMMARY")
@@ -3,8 +3,6 @@ Evaluate SentenceTransformer-based retrieval vs Gemini-based retrieval.
 """
 import sys
 import os
-import csv
-from collections import defaultdict
 
 # Fix encoding for Windows
 if sys.platform == 'win32':
@@ -13,11 +11,13 @@ if sys.platform == 'win32':
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.url_utils import normalize_url_to_slug, get_all_url_variants
+from src.url_utils import get_all_url_variants
+from src.eval_utils import RecallScorer, DEFAULT_WORKERS, parse_eval_args, map_queries, load_train
 
 
-def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, top_k=10):
+def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, top_k=10, workers=DEFAULT_WORKERS):
     """Evaluate a retrieval strategy on train queries."""
+    scorer = RecallScorer(train_queries)
     total_recall = 0.0
     query_count = 0
     
@@ -25,9 +25,9 @@ def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, to
     print(f"Evaluating: {strategy_name}")
     print(f"{'='*60}")
     
-    for query, relevant_slugs in train_queries.items():
-        results = retrieve_func(query, vector_db, top_k=top_k)
-        
+    all_results = map_queries(lambda q: retrieve_func(q, vector_db, top_k=top_k), train_queries, workers)
+    
+    for query, results in zip(train_queries, all_results):
         # Get recommended URL slugs
         recommended_slugs = set()
         for r in results:
@@ -37,8 +37,7 @@ def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, to
             recommended_slugs.update(variants)
         
         # Calculate recall
-        matches = len(relevant_slugs & recommended_slugs)
-        recall = matches / len(relevant_slugs) if relevant_slugs else 0.0
+        matches, recall = scorer.score(query, recommended_slugs)
         total_recall += recall
         query_count += 1
     
@@ -50,35 +49,44 @@ def evaluate_strategy(strategy_name, retrieve_func, vector_db, train_queries, to
 
 
 def main():
+    args = parse_eval_args(__doc__)
+    
     # Load train data
     train_path = 'data/train.csv'
     if not os.path.exists(train_path):
         print(f"Error: {train_path} not found")
         return
     
-    train_queries = defaultdict(set)
-    with open(train_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url_to_slug(url))
+    train_queries = load_train(train_path)
     
     print(f"Loaded {len(train_queries)} unique queries from train set")
     
     results = {}
     
+    def batch_results(db, boost):
+        """Run every train query through one batched ST encode + search."""
+        from src.retriever_st import retrieve_batch, enable_query_cache_st
+        enable_query_cache_st()  # reuse query embeddings from earlier runs
+        queries = list(train_queries)
+        return dict(zip(queries, retrieve_batch(queries, db, top_k=10, boost=boost)))
+    
     # Test 1: SentenceTransformer simple retrieval
     try:
-        from src.retriever_st import retrieve_candidates_st, get_vector_db_st
+        from src.retriever_st import get_vector_db_st
         
         db_st = get_vector_db_st()
         if db_st:
+            simple_results = batch_results(db_st, boost=False)
+            
+            def st_simple(query, db, top_k=10):
+                return simple_results[query]
+            
             recall = evaluate_strategy(
                 "SentenceTransformer (Simple)",
-                retrieve_candidates_st,
+                st_simple,
                 db_st,
-                train_queries
+                train_queries,
+                workers=args.workers
             )
             results["ST Simple"] = recall
         else:
@@ -88,26 +96,55 @@ def main():
     
     # Test 2: SentenceTransformer with keyword boosting
     try:
-        from src.retriever_st import retrieve_with_boost_st, get_vector_db_st
+        from src.retriever_st import get_vector_db_st
         
         db_st = get_vector_db_st()
         if db_st:
+            boosted_results = batch_results(db_st, boost=True)
+            
+            def st_boosted(query, db, top_k=10, **kwargs):
+                return boosted_results[query]
+            
             recall = evaluate_strategy(
                 "SentenceTransformer (Keyword Boost)",
-                retrieve_with_boost_st,
+                st_boosted,
                 db_st,
-                train_queries
+                train_queries,
+                workers=args.workers
             )
             results["ST Boosted"] = recall
     except Exception as e:
         print(f"Error with SentenceTransformer boosted: {e}")
-    
+
+    # Test 2b: same as Test 2 against int8-quantized embeddings (recall check)
+    try:
+        from src.retriever_st import get_vector_db_st
+
+        db_st_int8 = get_vector_db_st(quantize=True)
+        if db_st_int8:
+            int8_results = batch_results(db_st_int8, boost=True)
+
+            def st_int8(query, db, top_k=10, **kwargs):
+                return int8_results[query]
+
+            recall = evaluate_strategy(
+                "SentenceTransformer (Keyword Boost, int8)",
+                st_int8,
+                db_st_int8,
+                train_queries,
+                workers=args.workers
+            )
+            results["ST Boosted int8"] = recall
+    except Exception as e:
+        print(f"Error with SentenceTransformer int8: {e}")
+
     # Test 3: Gemini advanced retriever (current best)
     try:
         from src.advanced_retriever import retrieve_advanced
-        from src.retriever import get_vector_db
+        from src.retriever import get_vector_db, enable_query_cache
         
         db_gemini = get_vector_db()
+        enable_query_cache()
         if db_gemini:
             # Wrapper to match interface
             def gemini_retrieve(query, db, top_k=10):
@@ -117,7 +154,8 @@ def main():
                 "Gemini Advanced (Current)",
                 gemini_retrieve,
                 db_gemini,
-                train_queries
+                train_queries,
+                workers=args.workers
             )
             results["Gemini Advanced"] = recall
     except Exception as e:
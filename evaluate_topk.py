@@ -1,73 +1,73 @@
 """Evaluate with different top_k values to find optimal retrieval."""
-import json
-import csv
-from collections import defaultdict
-from src.retriever import retrieve_candidates, get_vector_db
+from src.retriever import retrieve_candidates_multi, get_vector_db, enable_query_cache
+from src.eval_utils import RecallScorer, RecallTracker, parse_eval_args, map_queries, load_train
+from src.url_utils import normalize_url_to_slug as normalize_url
 
-def normalize_url(url):
-    """Extract slug from URL."""
-    url = url.lower().strip().rstrip('/')
-    if '/view/' in url:
-        return url.split('/view/')[-1].rstrip('/')
-    return url
+# Retrieval depths compared by the sweep
+TOP_K_VALUES = [10, 15, 20, 30, 50]
 
-def evaluate_with_topk(vector_db, train_queries, top_k, eval_k=10):
+
+def evaluate_with_topk(train_queries, results_by_query, top_k, eval_k=10):
     """Evaluate with specific top_k retrieval, evaluating top eval_k."""
-    recalls = []
-    for query, relevant_slugs in train_queries.items():
-        results = retrieve_candidates(query, vector_db, top_k=top_k)
-        
+    scorer = RecallScorer(train_queries)
+    tracker = RecallTracker(keep=0)
+    
+    for query in train_queries:
         # Get recommended slugs from top eval_k results
         recommended_slugs = set()
-        for r in results[:eval_k]:
+        for r in results_by_query[query][top_k][:eval_k]:
             recommended_slugs.add(normalize_url(r['url']))
             for alt_url in r.get('alternate_urls', []):
                 recommended_slugs.add(normalize_url(alt_url))
         
-        hits = len(relevant_slugs & recommended_slugs)
-        recall = hits / len(relevant_slugs) if relevant_slugs else 0
-        recalls.append(recall)
+        hits, recall = scorer.score(query, recommended_slugs)
+        tracker.add(recall)
     
-    return sum(recalls) / len(recalls) if recalls else 0
+    return tracker.mean
 
 def main():
+    args = parse_eval_args(__doc__)
+    
     print("Loading vector database...")
     vector_db = get_vector_db()
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     print("Loading train data...")
-    train_queries = defaultdict(set)
-    with open('data/train.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url(url))
+    train_queries = load_train('data/train.csv')
     
     print(f"Found {len(train_queries)} unique queries\n")
+    scorer = RecallScorer(train_queries)
+    
+    # One embedding + search per query serves every depth (and the detailed section)
+    all_results = map_queries(
+        lambda q: retrieve_candidates_multi(q, vector_db, TOP_K_VALUES), train_queries, args.workers
+    )
+    results_by_query = dict(zip(train_queries, all_results))
     
     # Test different top_k values
     print("Testing different retrieval depths...")
-    for top_k in [10, 15, 20, 30, 50]:
-        recall = evaluate_with_topk(vector_db, train_queries, top_k)
+    for top_k in TOP_K_VALUES:
+        recall = evaluate_with_topk(train_queries, results_by_query, top_k)
         print(f"  top_k={top_k:2d} -> Mean Recall@10: {recall:.4f}")
     
     # Detailed evaluation with top_k=30
     print("\n" + "=" * 60)
-    print("Detailed results with top_k=30:")
+    print("Detailed results with top_k=30 (worst 20 queries):")
     print("=" * 60)
     
+    tracker = RecallTracker(keep=20)
+    
     for query, relevant_slugs in train_queries.items():
-        results = retrieve_candidates(query, vector_db, top_k=30)
-        
         recommended_slugs = set()
-        for r in results[:10]:
+        for r in results_by_query[query][30][:10]:
             recommended_slugs.add(normalize_url(r['url']))
             for alt_url in r.get('alternate_urls', []):
                 recommended_slugs.add(normalize_url(alt_url))
         
-        hits = len(relevant_slugs & recommended_slugs)
-        recall = hits / len(relevant_slugs) if relevant_slugs else 0
-        
+        hits, recall = scorer.score(query, recommended_slugs)
+        tracker.add(recall, (query, recall, hits, relevant_slugs, recommended_slugs))
+    
+    for query, recall, hits, relevant_slugs, recommended_slugs in tracker.worst():
         print(f"\nQuery: {query[:70]}...")
         print(f"  Relevant: {len(relevant_slugs)}, Hits: {hits}, Recall: {recall:.2%}")
         if hits > 0:
@@ -77,6 +77,8 @@ def main():
         missed = relevant_slugs - recommended_slugs
         if missed:
             print(f"  Missing: {list(missed)[:3]}...")
+    
+    print(f"\nMean Recall@10 (top_k=30): {tracker.mean:.4f}")
 
 if __name__ == "__main__":
     main()
@@ -1,43 +1,30 @@
 """Evaluation with LLM re-ranking."""
-import json
-import csv
-from collections import defaultdict
-from src.retriever import retrieve_candidates, get_vector_db
-from src.reranker import rerank_assessments
-
-def normalize_url(url):
-    """Normalize URL for comparison - extract slug."""
-    url = url.lower().strip().rstrip('/')
-    if '/view/' in url:
-        slug = url.split('/view/')[-1].rstrip('/')
-        return slug
-    return url
+from src.retriever import retrieve_candidates_batch, get_vector_db, enable_query_cache
+from src.reranker import rerank_batch
+from src.eval_utils import RecallScorer, parse_eval_args, load_train
+from src.url_utils import normalize_url_to_slug as normalize_url
 
 def main():
+    args = parse_eval_args(__doc__)
+    
     print("Loading vector database...")
     vector_db = get_vector_db()
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     print("Loading train data...")
-    train_queries = defaultdict(set)
-    with open('data/train.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url(url))
+    train_queries = load_train('data/train.csv')
     
     print(f"Found {len(train_queries)} unique queries\n")
+    scorer = RecallScorer(train_queries)
+    
+    # Get more candidates for re-ranking, then re-rank with LLM in batched prompts
+    all_candidates = retrieve_candidates_batch(list(train_queries), vector_db, top_k=25)
+    all_reranked = rerank_batch(list(zip(train_queries, all_candidates)), top_k=10, workers=args.workers)
     
     recalls = []
-    for query, relevant_slugs in train_queries.items():
+    for (query, relevant_slugs), results, reranked in zip(train_queries.items(), all_candidates, all_reranked):
         print(f"Query: {query[:60]}...")
-        
-        # Get more candidates for re-ranking
-        results = retrieve_candidates(query, vector_db, top_k=25)
         print(f"  Retrieved: {len(results)} candidates")
-        
-        # Re-rank with LLM
-        reranked = rerank_assessments(query, results, top_k=10)
         print(f"  Re-ranked: {len(reranked)} results")
         
         # Get recommended slugs (including alternate URLs)
@@ -48,8 +35,7 @@ def main():
                 recommended_slugs.add(normalize_url(alt_url))
         
         # Calculate recall
-        hits = len(relevant_slugs & recommended_slugs)
-        recall = hits / len(relevant_slugs) if relevant_slugs else 0
+        hits, recall = scorer.score(query, recommended_slugs)
         recalls.append(recall)
         
         print(f"  Relevant: {len(relevant_slugs)}, Hits: {hits}, Recall@10: {recall:.4f}")
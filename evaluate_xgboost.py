@@ -3,8 +3,7 @@ Evaluate XGBoost re-ranking vs other strategies.
 """
 import sys
 import os
-import csv
-from collections import defaultdict
+from functools import partial
 
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
@@ -12,85 +11,121 @@ if sys.platform == 'win32':
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
 from src.advanced_retriever import retrieve_advanced, preprocess_query
-from src.retriever import get_vector_db
-from src.xgboost_reranker import train_xgboost_reranker, load_xgboost_reranker, rerank_with_xgboost
-from src.url_utils import normalize_url_to_slug, get_all_url_variants
+from src.retriever import get_vector_db, enable_query_cache, metadata_columns
+from src.xgboost_reranker import train_xgboost_reranker, load_xgboost_reranker, rerank_with_xgboost_batch
+from src.url_utils import get_all_url_variants
+from src.eval_utils import DEFAULT_WORKERS, parse_eval_args, map_queries, load_train
 
 
-def evaluate_with_reranker(strategy_name, retrieve_func, rerank_func, vector_db, train_queries, top_k=10):
-    """Evaluate a retrieval strategy with a specific re-ranker."""
-    total_recall = 0.0
-    query_count = 0
+def retrieve_candidate_map(retrieve_func, vector_db, train_queries, top_k=10, workers=DEFAULT_WORKERS):
+    """
+    Retrieve the re-ranking candidates (top_k * 3) for every train query once.
     
-    print(f"\n{'='*60}")
-    print(f"Evaluating: {strategy_name}")
-    print(f"{'='*60}")
+    Returns query -> candidates, or None where retrieval failed.
+    """
+    all_candidates = map_queries(
+        lambda q: retrieve_func(q, vector_db, top_k=top_k * 3), train_queries, workers, catch_errors=True
+    )
+    return dict(zip(train_queries, all_candidates))
+
+
+def rerank_isolated(rerank_func, queries, candidates_list, top_k=10):
+    """
+    Re-rank all queries in one call; if that raises, re-rank them one at a time.
     
-    for query, relevant_slugs in train_queries.items():
+    Returns one result list per query, or None where re-ranking that query failed.
+    """
+    try:
+        return rerank_func(queries, candidates_list, top_k=top_k)
+    except Exception as e:
+        print(f"Batched re-ranking failed, re-ranking per query: {e}")
+    
+    reranked = []
+    for query, candidates in zip(queries, candidates_list):
         try:
-            # Get initial candidates
-            candidates = retrieve_func(query, vector_db, top_k=top_k * 3)  # Get more for re-ranking
-            
-            # Apply re-ranker
-            reranked = rerank_func(query, candidates, top_k=top_k)
+            reranked.append(rerank_func([query], [candidates], top_k=top_k)[0])
+        except Exception as e:
+            print(f"Error processing query '{query[:50]}...': {e}")
+            reranked.append(None)
+    return reranked
+
+
+def evaluate_multi_rerankers(rerankers, cand_map, train_queries, top_k=10, url_variants=None):
+    """
+    Evaluate several re-rankers on the same precomputed candidates in one pass.
+    
+    rerankers maps a strategy name to rerank_func(queries, candidates_list, top_k),
+    which re-ranks all queries in one call. url_variants (MetadataColumns.url_variants
+    of the candidates' vector DB) supplies each result's URL slugs by row_id.
+    A query that fails to re-rank is skipped for that strategy only.
+    Returns strategy name -> mean recall.
+    """
+    # Apply each re-ranker once over all queries that retrieved successfully
+    ok = [q for q in train_queries if cand_map.get(q) is not None]
+    candidates_list = [cand_map[q] for q in ok]
+    reranked_by_name = {
+        name: rerank_isolated(rerank_func, ok, candidates_list, top_k=top_k) if ok else []
+        for name, rerank_func in rerankers.items()
+    }
+    
+    def result_slugs(r):
+        row_id = r.get('row_id')
+        if url_variants is not None and row_id is not None:
+            return url_variants[row_id]
+        return get_all_url_variants(r.get('url', ''), r.get('alternate_urls', []))
+    
+    totals = dict.fromkeys(rerankers, 0.0)
+    counts = dict.fromkeys(rerankers, 0)
+    for i, query in enumerate(ok):
+        relevant_slugs = train_queries[query]
+        for name, all_reranked in reranked_by_name.items():
+            if all_reranked[i] is None:
+                continue
             
             # Get recommended URL slugs
             recommended_slugs = set()
-            for r in reranked:
-                url = r.get('url', '')
-                alternate_urls = r.get('alternate_urls', [])
-                variants = get_all_url_variants(url, alternate_urls)
-                recommended_slugs.update(variants)
+            for r in all_reranked[i]:
+                recommended_slugs |= result_slugs(r)
             
             # Calculate recall
             matches = len(relevant_slugs & recommended_slugs)
-            recall = matches / len(relevant_slugs) if relevant_slugs else 0.0
-            total_recall += recall
-            query_count += 1
-        except Exception as e:
-            print(f"Error processing query '{query[:50]}...': {e}")
-            continue
+            totals[name] += matches / len(relevant_slugs) if relevant_slugs else 0.0
+            counts[name] += 1
     
-    mean_recall = total_recall / query_count if query_count > 0 else 0.0
-    print(f"\nMean Recall@{top_k}: {mean_recall:.4f} ({mean_recall*100:.2f}%)")
-    print(f"Total queries evaluated: {query_count}")
+    results = {}
+    for name, total in totals.items():
+        mean_recall = total / counts[name] if counts[name] else 0.0
+        print(f"\n{'='*60}")
+        print(f"Evaluating: {name}")
+        print(f"{'='*60}")
+        print(f"Mean Recall@{top_k}: {mean_recall:.4f} ({mean_recall*100:.2f}%)")
+        print(f"Total queries evaluated: {counts[name]}")
+        results[name] = mean_recall
     
-    return mean_recall
+    return results
 
 
 def main():
+    args = parse_eval_args(__doc__)
+    
     # Load train data
     train_path = 'data/train.csv'
     if not os.path.exists(train_path):
         print(f"Error: {train_path} not found")
         return
     
-    train_queries = defaultdict(set)
-    with open(train_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url_to_slug(url))
+    train_queries = load_train(train_path)
     
     print(f"Loaded {len(train_queries)} unique queries from train set")
     
     vector_db = get_vector_db()
-    
-    results = {}
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     # Baseline: No re-ranking
-    def no_rerank(query, candidates, top_k=10):
-        return candidates[:top_k]
-    
-    recall_baseline = evaluate_with_reranker(
-        "Baseline (No Re-ranking)",
-        retrieve_advanced,
-        no_rerank,
-        vector_db,
-        train_queries
-    )
-    results["Baseline"] = recall_baseline
+    def no_rerank(queries, candidates_list, top_k=10):
+        return [candidates[:top_k] for candidates in candidates_list]
+    
+    rerankers = {"Baseline": no_rerank}
     
     # Train XGBoost model
     print("\n" + "="*60)
@@ -98,22 +133,25 @@ def main():
     print("="*60)
     
     model_path = 'data/xgboost_reranker.pkl'
-    model = train_xgboost_reranker(train_path, vector_db, retrieve_advanced, model_path)
+    model = train_xgboost_reranker(train_path, vector_db, retrieve_advanced, model_path, workers=args.workers)
     
     if model:
         # Test XGBoost re-ranking
-        def xgboost_rerank_wrapper(query, candidates, top_k=10):
-            query_info = preprocess_query(query)
-            return rerank_with_xgboost(query, candidates, model, query_info, top_k)
+        def xgboost_rerank_wrapper(queries, candidates_list, top_k=10):
+            query_infos = [preprocess_query(q) for q in queries]
+            return rerank_with_xgboost_batch(queries, candidates_list, model, query_infos, top_k)
         
-        recall_xgboost = evaluate_with_reranker(
-            "XGBoost Re-ranking",
-            retrieve_advanced,
-            xgboost_rerank_wrapper,
-            vector_db,
-            train_queries
-        )
-        results["XGBoost"] = recall_xgboost
+        rerankers["XGBoost"] = xgboost_rerank_wrapper
+    
+    # Both strategies re-rank the same candidates, so retrieve them once, after
+    # training. The candidates come from the rule-based ranking so they do not
+    # depend on whichever XGBoost model was on disk (or cached) before this run.
+    retrieve_rule_based = partial(retrieve_advanced, use_xgboost_rerank=False)
+    cand_map = retrieve_candidate_map(retrieve_rule_based, vector_db, train_queries, workers=args.workers)
+    url_variants = metadata_columns(vector_db).url_variants
+    
+    # Score every re-ranker in one pass over the shared candidates
+    results = evaluate_multi_rerankers(rerankers, cand_map, train_queries, url_variants=url_variants)
     
     # Summary
     print("\n" + "="*60)
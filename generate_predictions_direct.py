@@ -2,54 +2,45 @@
 Uses Gemini Advanced retriever (best performing: 33.56% recall).
 """
 import os
-import csv
+import pandas as pd
 import sys
-from tqdm import tqdm
 
 if sys.platform == 'win32':
     sys.stdout.reconfigure(encoding='utf-8')
 
-from src.advanced_retriever import retrieve_advanced
-from src.retriever import get_vector_db
+from src.advanced_retriever import retrieve_advanced_batch
+from src.retriever import get_vector_db, enable_query_cache
 
 def main():
     print("Loading vector database...")
     vector_db = get_vector_db()
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     # Load test queries
     test_path = 'data/test.csv'
     print(f"Loading test queries from {test_path}...")
     
-    queries = []
-    with open(test_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            if query not in queries:
-                queries.append(query)
+    test_df = pd.read_csv(test_path, usecols=['Query'], dtype=str, keep_default_na=False)
+    queries = test_df['Query'].str.strip().drop_duplicates().tolist()
     
     print(f"Found {len(queries)} unique test queries")
     
     # Generate predictions using Gemini Advanced (best: 33.56% recall)
-    predictions = []
-    for query in tqdm(queries, desc="Generating predictions"):
-        # Get top 10 recommendations using advanced retriever with XGBoost re-ranking (best: 62.22% recall)
-        results = retrieve_advanced(query, vector_db, top_k=10, use_llm_rerank=False, use_xgboost_rerank=True)
-        
-        for r in results:
-            predictions.append({
-                'Query': query,
-                'Assessment_url': r['url']
-            })
+    # Get top 10 recommendations using advanced retriever with XGBoost re-ranking (best: 62.22% recall),
+    # embedding and searching all queries in one batch
+    print("Generating predictions...")
+    all_results = retrieve_advanced_batch(queries, vector_db, top_k=10, use_llm_rerank=False, use_xgboost_rerank=True)
+    
+    predictions = pd.DataFrame(
+        [(query, r['url']) for query, results in zip(queries, all_results) for r in results],
+        columns=['Query', 'Assessment_url']
+    )
     
     # Save predictions
     os.makedirs('submission', exist_ok=True)
     output_path = 'submission/predictions.csv'
     
-    with open(output_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['Query', 'Assessment_url'])
-        writer.writeheader()
-        writer.writerows(predictions)
+    predictions.to_csv(output_path, index=False, encoding='utf-8')
     
     print(f"\nGenerated {len(predictions)} predictions")
     print(f"Saved to {output_path}")
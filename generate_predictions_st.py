@@ -1,8 +1,7 @@
 """Generate predictions for test set using SentenceTransformer (best performing approach)."""
 import sys
 import os
-import csv
-from tqdm import tqdm
+import pandas as pd
 
 # Fix encoding for Windows
 if sys.platform == 'win32':
@@ -11,11 +10,12 @@ if sys.platform == 'win32':
 # Add project root to path
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.retriever_st import retrieve_with_boost_st, get_vector_db_st
+from src.retriever_st import retrieve_batch, get_vector_db_st, enable_query_cache_st
 
 def main():
     print("Loading SentenceTransformer vector database...")
     vector_db = get_vector_db_st()
+    enable_query_cache_st()  # reuse query embeddings from earlier runs
     
     if vector_db is None:
         print("Error: SentenceTransformer vector DB not found.")
@@ -26,36 +26,26 @@ def main():
     test_path = 'data/test.csv'
     print(f"Loading test queries from {test_path}...")
     
-    queries = []
-    with open(test_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            if query not in queries:
-                queries.append(query)
+    test_df = pd.read_csv(test_path, usecols=['Query'], dtype=str, keep_default_na=False)
+    queries = test_df['Query'].str.strip().drop_duplicates().tolist()
     
     print(f"Found {len(queries)} unique test queries")
     
-    # Generate predictions using SentenceTransformer with keyword boost
-    predictions = []
-    for query in tqdm(queries, desc="Generating predictions"):
-        # Get top 10 recommendations using SentenceTransformer with keyword boost
-        results = retrieve_with_boost_st(query, vector_db, top_k=10)
-        
-        for r in results:
-            predictions.append({
-                'Query': query,
-                'Assessment_url': r['url']
-            })
+    # Get top 10 recommendations using SentenceTransformer with keyword boost,
+    # encoding and searching all queries in one batch
+    print("Generating predictions...")
+    all_results = retrieve_batch(queries, vector_db, top_k=10, boost=True)
+    
+    predictions = pd.DataFrame(
+        [(query, r['url']) for query, results in zip(queries, all_results) for r in results],
+        columns=['Query', 'Assessment_url']
+    )
     
     # Save predictions
     os.makedirs('submission', exist_ok=True)
     output_path = 'submission/predictions.csv'
     
-    with open(output_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['Query', 'Assessment_url'])
-        writer.writeheader()
-        writer.writerows(predictions)
+    predictions.to_csv(output_path, index=False, encoding='utf-8')
     
     print(f"\nGenerated {len(predictions)} predictions")
     print(f"Saved to {output_path}")
@@ -5,6 +5,7 @@ Format: Query, Assessment_url (as per Appendix 3)
 import sys
 import os
 import csv
+import pandas as pd
 from tqdm import tqdm
 
 if sys.platform == 'win32':
@@ -12,77 +13,79 @@ if sys.platform == 'win32':
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from src.advanced_retriever import retrieve_advanced
-from src.retriever import get_vector_db
+from src.advanced_retriever import retrieve_advanced_batch
+from src.retriever import get_vector_db, enable_query_cache
+
+# Test queries retrieved (and written) per batch
+BATCH_SIZE = 32
 
 def main():
     print("Loading vector database...")
     vector_db = get_vector_db()
+    enable_query_cache()  # reuse query embeddings from earlier runs
     
     # Load test queries
     test_path = 'data/test.csv'
     print(f"Loading test queries from {test_path}...")
     
-    queries = []
-    with open(test_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            queries.append(query)
+    test_df = pd.read_csv(test_path, usecols=['Query'], dtype=str, keep_default_na=False)
+    queries = test_df['Query'].str.strip().tolist()
     
     print(f"Found {len(queries)} test queries")
     
-    # Generate predictions using XGBoost re-ranking (best: 61.56% recall)
-    predictions = []
-    for query in tqdm(queries, desc="Generating predictions"):
-        # Get top 10 recommendations using XGBoost re-ranking
-        results = retrieve_advanced(
-            query, 
-            vector_db, 
-            top_k=10, 
-            use_llm_rerank=False, 
-            use_xgboost_rerank=True
-        )
-        
-        for r in results:
-            predictions.append({
-                'Query': query,
-                'Assessment_url': r['url']
-            })
-    
     # Save predictions in submission format (Appendix 3)
     os.makedirs('submission', exist_ok=True)
     output_path = 'submission/predictions.csv'
     
+    # Generate predictions using XGBoost re-ranking (best: 61.56% recall)
+    # Get top 10 recommendations for one batch of queries at a time and write
+    # each batch's rows straight away (repeated queries reuse their results)
+    print("Generating predictions...")
+    results_by_query = {}
+    n_predictions = 0
     with open(output_path, 'w', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=['Query', 'Assessment_url'])
-        writer.writeheader()
-        writer.writerows(predictions)
+        writer = csv.writer(f)
+        writer.writerow(['Query', 'Assessment_url'])
+        
+        for start in tqdm(range(0, len(queries), BATCH_SIZE), desc="Batches"):
+            batch = queries[start:start + BATCH_SIZE]
+            new_queries = [q for q in dict.fromkeys(batch) if q not in results_by_query]
+            if new_queries:
+                all_results = retrieve_advanced_batch(
+                    new_queries,
+                    vector_db,
+                    top_k=10,
+                    use_llm_rerank=False,
+                    use_xgboost_rerank=True
+                )
+                # Keep only the URLs; the full result dicts are not needed again
+                results_by_query.update(
+                    (q, [r['url'] for r in results]) for q, results in zip(new_queries, all_results)
+                )
+            
+            for query in batch:
+                urls = results_by_query[query]
+                writer.writerows((query, url) for url in urls)
+                n_predictions += len(urls)
+            f.flush()
     
-    print(f"\nGenerated {len(predictions)} predictions")
+    print(f"\nGenerated {n_predictions} predictions")
     print(f"Saved to {output_path}")
-    print(f"Average {len(predictions)/len(queries):.1f} recommendations per query")
+    print(f"Average {n_predictions/len(queries):.1f} recommendations per query")
     
     # Verify format
     print("\nVerifying format...")
-    with open(output_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        first_row = next(reader)
-        if 'Query' in first_row and 'Assessment_url' in first_row:
-            print("✓ Format correct: Query, Assessment_url")
-        else:
-            print("✗ Format error: Expected Query, Assessment_url")
+    written = pd.read_csv(output_path, dtype=str, keep_default_na=False, nrows=3)
+    if list(written.columns) == ['Query', 'Assessment_url']:
+        print("✓ Format correct: Query, Assessment_url")
+    else:
+        print("✗ Format error: Expected Query, Assessment_url")
     
     # Show sample
     print("\nSample predictions:")
-    with open(output_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for i, row in enumerate(reader):
-            if i < 3:
-                print(f"  Query: {row['Query'][:60]}...")
-                print(f"  URL: {row['Assessment_url']}")
-            else:
-                break
+    for query, url in zip(written['Query'], written['Assessment_url']):
+        print(f"  Query: {query[:60]}...")
+        print(f"  URL: {url}")
 
 if __name__ == "__main__":
     main()
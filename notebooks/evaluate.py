@@ -4,15 +4,12 @@ Evaluate the system using Mean Recall@10 on the train set.
 import sys
 import os
 import pandas as pd
-import requests
-from tqdm import tqdm
-import time
-from collections import defaultdict
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from src.url_utils import normalize_url_to_slug, get_all_url_variants
+from src.api_client import recommend_many
 
 API_URL = os.getenv('API_URL', 'http://localhost:8000')
 
@@ -26,23 +23,26 @@ def compute_recall_at_k(relevant_urls: set, recommended_assessments: list, k: in
         return 0.0
     
     # Normalize relevant URLs to slugs
-    normalized_relevant = set()
-    for url in relevant_urls:
-        normalized_relevant.add(normalize_url_to_slug(url))
+    normalized_relevant = frozenset(normalize_url_to_slug(url) for url in relevant_urls)
+    return recall_at_k_slugs(normalized_relevant, recommended_assessments, k=k)
+
+
+def recall_at_k_slugs(relevant_slugs: frozenset, recommended_assessments: list, k: int = 10) -> float:
+    """compute_recall_at_k for relevant URLs already normalized to slugs."""
+    if not relevant_slugs:
+        return 0.0
     
-    # Normalize recommended URLs (including alternate URLs)
+    # Normalize recommended URLs (including alternate URLs); variants are memoized per assessment
     normalized_recommended = set()
     for assessment in recommended_assessments[:k]:
-        url = assessment.get('url', '')
-        alternate_urls = assessment.get('alternate_urls', [])
-        # Get all variants (primary + alternates)
-        variants = get_all_url_variants(url, alternate_urls)
-        normalized_recommended.update(variants)
+        normalized_recommended |= get_all_url_variants(
+            assessment.get('url', ''), assessment.get('alternate_urls', [])
+        )
     
     # Calculate hits
-    relevant_found = len(normalized_recommended & normalized_relevant)
+    relevant_found = len(relevant_slugs & normalized_recommended)
     
-    return relevant_found / len(normalized_relevant) if normalized_relevant else 0.0
+    return relevant_found / len(relevant_slugs)
 
 
 def evaluate_on_train_set(train_csv_path: str, api_url: str = API_URL, k: int = 10):
@@ -50,47 +50,40 @@ def evaluate_on_train_set(train_csv_path: str, api_url: str = API_URL, k: int =
     # Load train set
     df_train = pd.read_csv(train_csv_path)
     
-    # Group by query to get relevant URLs for each query
-    query_to_relevant = defaultdict(set)
-    for _, row in df_train.iterrows():
-        query_to_relevant[row['Query']].add(row['Assessment_url'])
+    # Group by query to get relevant slugs for each query, normalized once up front
+    query_to_relevant = {
+        query: frozenset(urls.map(normalize_url_to_slug))
+        for query, urls in df_train.groupby('Query', sort=False)['Assessment_url']
+    }
     
     print(f"Found {len(query_to_relevant)} unique queries in train set")
     
     recalls = []
     query_results = []
     
-    for query, relevant_urls in tqdm(query_to_relevant.items(), desc="Evaluating"):
-        try:
-            # Call API
-            response = requests.post(
-                f"{api_url}/recommend",
-                json={"query": query},
-                timeout=60
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract recommended assessments (with alternate URLs)
-            recommended_assessments = data.get('recommended_assessments', [])
-            
-            # Compute Recall@K (now considers alternate URLs)
-            recall = compute_recall_at_k(relevant_urls, recommended_assessments, k=k)
-            recalls.append(recall)
-            
-            query_results.append({
-                'Query': query[:100] + '...' if len(query) > 100 else query,
-                'Relevant Count': len(relevant_urls),
-                'Recommended Count': len(recommended_assessments),
-                f'Recall@{k}': recall
-            })
-            
-            time.sleep(0.5)  # Rate limiting
-            
-        except Exception as e:
-            print(f"Error processing query: {query[:50]}... - {e}")
+    queries = list(query_to_relevant)
+    responses = recommend_many(queries, api_url, desc="Evaluating")
+    
+    for query, data in zip(queries, responses):
+        relevant_slugs = query_to_relevant[query]
+        if isinstance(data, Exception):
+            print(f"Error processing query: {query[:50]}... - {data}")
             recalls.append(0.0)
             continue
+        
+        # Extract recommended assessments (with alternate URLs)
+        recommended_assessments = data.get('recommended_assessments', [])
+        
+        # Compute Recall@K (now considers alternate URLs)
+        recall = recall_at_k_slugs(relevant_slugs, recommended_assessments, k=k)
+        recalls.append(recall)
+        
+        query_results.append({
+            'Query': query[:100] + '...' if len(query) > 100 else query,
+            'Relevant Count': len(relevant_slugs),
+            'Recommended Count': len(recommended_assessments),
+            f'Recall@{k}': recall
+        })
     
     # Compute mean recall
     mean_recall = sum(recalls) / len(recalls) if recalls else 0.0
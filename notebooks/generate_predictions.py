@@ -4,13 +4,12 @@ Generate predictions for the test set and save in submission format.
 import sys
 import os
 import pandas as pd
-import requests
-from tqdm import tqdm
-import time
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.api_client import recommend_many
+
 API_URL = os.getenv('API_URL', 'http://localhost:8000')
 
 
@@ -26,30 +25,19 @@ def generate_predictions(test_csv_path: str, output_path: str, api_url: str = AP
     
     predictions = []
     
-    for query in tqdm(unique_queries, desc="Generating predictions"):
-        try:
-            # Call API
-            response = requests.post(
-                f"{api_url}/recommend",
-                json={"query": query},
-                timeout=60
-            )
-            response.raise_for_status()
-            data = response.json()
-            
-            # Extract assessment URLs
-            assessments = data.get('recommended_assessments', [])
-            for assessment in assessments:
-                predictions.append({
-                    'Query': query,
-                    'Assessment_url': assessment['url']
-                })
-            
-            time.sleep(0.5)  # Rate limiting
-            
-        except Exception as e:
-            print(f"Error processing query: {query[:50]}... - {e}")
+    responses = recommend_many(unique_queries, api_url, desc="Generating predictions")
+    for query, data in zip(unique_queries, responses):
+        if isinstance(data, Exception):
+            print(f"Error processing query: {query[:50]}... - {data}")
             continue
+        
+        # Extract assessment URLs
+        assessments = data.get('recommended_assessments', [])
+        for assessment in assessments:
+            predictions.append({
+                'Query': query,
+                'Assessment_url': assessment['url']
+            })
     
     # Save to CSV
     df_predictions = pd.DataFrame(predictions)
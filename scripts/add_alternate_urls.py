@@ -7,7 +7,7 @@ This ensures every assessment has both URL variants:
 
 This fixes the recall bottleneck caused by URL variation mismatches.
 """
-import json
+import orjson
 import os
 import sys
 from pathlib import Path
@@ -16,6 +16,7 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from src.url_utils import generate_alternate_url
+from src.url_table import URL_TABLE_FILE, save_url_table
 
 
 def add_alternate_urls_to_assessments(assessments_file: str = 'data/assessments.json'):
@@ -31,8 +32,8 @@ def add_alternate_urls_to_assessments(assessments_file: str = 'data/assessments.
         return
     
     print(f"Loading assessments from {assessments_file}...")
-    with open(assessments_file, 'r', encoding='utf-8') as f:
-        assessments = json.load(f)
+    with open(assessments_file, 'rb') as f:
+        assessments = orjson.loads(f.read())
     
     print(f"Found {len(assessments)} assessments")
     
@@ -86,16 +87,28 @@ def add_alternate_urls_to_assessments(assessments_file: str = 'data/assessments.
     print(f"\nUpdated {updated_count} assessments with alternate URLs")
     print(f"Saving to {assessments_file}...")
     
-    # Create backup
+    # Create backup: a hardlink to the current file (no copy); the new data is
+    # written to a temp file and renamed over, so the backup keeps the old bytes
     backup_file = assessments_file + '.backup'
     if os.path.exists(assessments_file):
-        import shutil
-        shutil.copy2(assessments_file, backup_file)
+        if os.path.exists(backup_file):
+            os.remove(backup_file)
+        try:
+            os.link(assessments_file, backup_file)
+        except OSError:
+            import shutil
+            shutil.copy2(assessments_file, backup_file)
         print(f"Created backup: {backup_file}")
     
-    # Save updated file
-    with open(assessments_file, 'w', encoding='utf-8') as f:
-        json.dump(assessments, f, indent=2, ensure_ascii=False)
+    # Save updated file atomically
+    tmp_file = assessments_file + '.tmp'
+    with open(tmp_file, 'wb') as f:
+        f.write(orjson.dumps(assessments, option=orjson.OPT_INDENT_2))
+    os.replace(tmp_file, assessments_file)
+    
+    # Packed url/alternate_urls table for consumers that only need the URLs
+    save_url_table(assessments, URL_TABLE_FILE)
+    print(f"Saved URL table to {URL_TABLE_FILE}")
     
     print(f"\nSuccessfully updated {len(assessments)} assessments")
     print(f"Total assessments with alternate URLs: {sum(1 for a in assessments if a.get('alternate_urls'))}")
@@ -9,51 +9,84 @@ from pathlib import Path
 # Add parent directory to path
 sys.path.append(str(Path(__file__).parent.parent))
 
-import json
-import csv
-from collections import defaultdict
-from src.advanced_retriever import retrieve_advanced
-from src.retriever import get_vector_db
+import re
+from collections import Counter, defaultdict
+from itertools import chain
+
+import numpy as np
+import orjson
+import pandas as pd
+from src.advanced_retriever import retrieve_advanced, retrieve_advanced_batch
+from src.retriever import get_vector_db, metadata_columns
 from src.url_utils import normalize_url_to_slug, get_all_url_variants
+from src.eval_utils import DEFAULT_WORKERS, map_queries
+from src.url_table import load_url_table
+
+_WHITESPACE_RE = re.compile(r'\s+')
+
+
+def load_train_data(path='data/train.csv'):
+    """
+    Parse train.csv in one pass.
+    
+    Returns (train_queries, train_urls, n_rows): query -> relevant slugs, the
+    set of unique raw assessment URLs, and the number of rows. Queries that
+    differ only in whitespace or case are merged under their first spelling,
+    so each is retrieved once.
+    """
+    train_queries = defaultdict(set)
+    train_urls = set()
+    spellings = {}  # normalized query -> first spelling seen
+    # C parser over a memory-mapped file, only the two columns used here
+    df = pd.read_csv(path, usecols=['Query', 'Assessment_url'], dtype=str,
+                     keep_default_na=False, memory_map=True)
+    for query, url in zip(df['Query'].tolist(), df['Assessment_url'].tolist()):
+        query = query.strip()
+        query = spellings.setdefault(_WHITESPACE_RE.sub(' ', query).lower(), query)
+        url = url.strip()
+        train_queries[query].add(normalize_url_to_slug(url))  # lru-cached, so repeated URLs are cheap
+        train_urls.add(url)
+    n_rows = len(df)
+    return train_queries, train_urls, n_rows
+
+
+def load_assessments(path='data/assessments.json'):
+    """Parse the assessment catalog once for all analyses."""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
 
-def analyze_url_matching():
+
+def assessment_url_slugs(assessments, catalog_path='data/assessments.json'):
+    """
+    Every URL slug (primary and alternates, all variants) in the catalog.
+    
+    Reads the packed URL table when add_alternate_urls.py has written one that
+    is at least as new as the catalog, else the URLs of the parsed catalog.
+    """
+    url_table = load_url_table(source_path=catalog_path)
+    if url_table is None:
+        url_table = [(a.get('url', ''), a.get('alternate_urls', [])) for a in assessments]
+    
+    assessment_slugs = set()
+    for url, alternate_urls in url_table:
+        assessment_slugs.update(get_all_url_variants(url, alternate_urls))
+    return assessment_slugs
+
+
+def analyze_url_matching(train_queries, train_urls, n_rows, assessment_slugs):
     """Analyze if URL normalization is working correctly."""
     print("="*70)
     print("URL NORMALIZATION VERIFICATION")
     print("="*70)
     
-    # Load train data
-    train_queries = defaultdict(set)
-    train_urls = []
-    with open('data/train.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url_to_slug(url))
-            train_urls.append(url)
-    
-    # Load assessments
-    with open('data/assessments.json', 'r', encoding='utf-8') as f:
-        assessments = json.load(f)
-    
-    # Check URL coverage
-    train_slugs = set()
-    for url in train_urls:
-        train_slugs.add(normalize_url_to_slug(url))
-    
-    assessment_slugs = set()
-    for a in assessments:
-        url = a.get('url', '')
-        alternate_urls = a.get('alternate_urls', [])
-        variants = get_all_url_variants(url, alternate_urls)
-        assessment_slugs.update(variants)
+    # Check URL coverage (slugs were already normalized while loading)
+    train_slugs = set().union(*train_queries.values())
     
     # Coverage analysis
     missing_slugs = train_slugs - assessment_slugs
     coverage = len(train_slugs & assessment_slugs) / len(train_slugs) if train_slugs else 0
     
-    print(f"\nTrain Set URLs: {len(train_urls)}")
+    print(f"\nTrain Set URLs: {n_rows} ({len(train_urls)} unique)")
     print(f"Unique Train Slugs: {len(train_slugs)}")
     print(f"Assessment Slugs (with alternates): {len(assessment_slugs)}")
     print(f"Coverage: {coverage:.2%} ({len(train_slugs & assessment_slugs)}/{len(train_slugs)})")
@@ -70,64 +103,74 @@ def analyze_url_matching():
     return coverage, missing_slugs
 
 
-def per_query_analysis():
-    """Analyze recall per query to identify bottlenecks."""
+def _query_result(query, relevant_slugs, recommendations, url_variants):
+    """Recall summary of one query's recommendations (None if retrieval failed)."""
+    # Get recommended slugs
+    recommended_slugs = set()
+    for r in recommendations or []:
+        row_id = r.get('row_id')
+        if row_id is not None:
+            recommended_slugs |= url_variants[row_id]
+        else:
+            recommended_slugs |= get_all_url_variants(r.get('url', ''), r.get('alternate_urls', []))
+    
+    # Calculate recall
+    hits = len(relevant_slugs & recommended_slugs)
+    recall = hits / len(relevant_slugs) if relevant_slugs else 0
+    
+    # Find which relevant URLs were missed
+    missed = relevant_slugs - recommended_slugs
+    
+    return {
+        'query': query[:60] + '...' if len(query) > 60 else query,
+        'relevant_count': len(relevant_slugs),
+        'hits': hits,
+        'recall': recall,
+        'missed_count': len(missed),
+        'missed_slugs': list(missed)[:3] if recommendations is not None else []  # Show first 3
+    }
+
+
+def per_query_analysis(train_queries, workers=DEFAULT_WORKERS):
+    """
+    Analyze recall per query to identify bottlenecks.
+    
+    Returns (results, missed_counts): per-query summaries, lowest recall
+    first, and a Counter of the sample missed slugs, tallied as they are built.
+    """
     print("\n" + "="*70)
     print("PER-QUERY RECALL ANALYSIS")
     print("="*70)
     
     vector_db = get_vector_db()
-    
-    train_queries = defaultdict(set)
-    with open('data/train.csv', 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(normalize_url_to_slug(url))
+    # URL variants per assessment row, computed once (see MetadataColumns)
+    url_variants = metadata_columns(vector_db).url_variants
+    queries = list(train_queries)
+    
+    # Get recommendations for every query with one embedding call and one
+    # FAISS search; fall back to per-query retrieval on a thread pool if the
+    # batch fails (failed queries yield None and count as zero recall)
+    try:
+        all_recommendations = retrieve_advanced_batch(queries, vector_db, top_k=10, use_llm_rerank=False)
+    except Exception as e:
+        print(f"Batch retrieval failed, retrying per query: {e}")
+        all_recommendations = map_queries(
+            lambda q: retrieve_advanced(q, vector_db, top_k=10, use_llm_rerank=False),
+            queries, workers, catch_errors=True, desc='Per-query retrieval'
+        )
     
     results = []
-    for query, relevant_slugs in train_queries.items():
-        try:
-            # Get recommendations
-            recommendations = retrieve_advanced(query, vector_db, top_k=10, use_llm_rerank=False)
-            
-            # Get recommended slugs
-            recommended_slugs = set()
-            for r in recommendations:
-                url = r.get('url', '')
-                alternate_urls = r.get('alternate_urls', [])
-                variants = get_all_url_variants(url, alternate_urls)
-                recommended_slugs.update(variants)
-            
-            # Calculate recall
-            hits = len(relevant_slugs & recommended_slugs)
-            recall = hits / len(relevant_slugs) if relevant_slugs else 0
-            
-            # Find which relevant URLs were missed
-            missed = relevant_slugs - recommended_slugs
-            
-            results.append({
-                'query': query[:60] + '...' if len(query) > 60 else query,
-                'relevant_count': len(relevant_slugs),
-                'hits': hits,
-                'recall': recall,
-                'missed_count': len(missed),
-                'missed_slugs': list(missed)[:3]  # Show first 3
-            })
-        except Exception as e:
-            print(f"Error with query: {e}")
-            results.append({
-                'query': query[:60] + '...' if len(query) > 60 else query,
-                'relevant_count': len(relevant_slugs),
-                'hits': 0,
-                'recall': 0.0,
-                'missed_count': len(relevant_slugs),
-                'missed_slugs': []
-            })
-    
-    # Sort by recall (lowest first)
-    results.sort(key=lambda x: x['recall'])
+    missed_counts = Counter()
+    for query, recommendations in zip(queries, all_recommendations):
+        result = _query_result(query, train_queries[query], recommendations, url_variants)
+        missed_counts.update(result['missed_slugs'])
+        results.append(result)
+    
+    # Sort by recall (lowest first); stable, like list.sort
+    recalls = np.fromiter((r['recall'] for r in results), dtype=np.float64, count=len(results))
+    order = np.argsort(recalls, kind='stable')
+    results = [results[i] for i in order]
+    recalls = recalls[order]
     
     print("\nQueries with Lowest Recall:")
     print("-" * 70)
@@ -146,9 +189,9 @@ def per_query_analysis():
         print(f"  Missed: {r['missed_count']} assessments")
     
     # Statistics
-    mean_recall = sum(r['recall'] for r in results) / len(results) if results else 0
-    min_recall = min(r['recall'] for r in results) if results else 0
-    max_recall = max(r['recall'] for r in results) if results else 0
+    mean_recall = float(recalls.mean()) if results else 0
+    min_recall = float(recalls[0]) if results else 0
+    max_recall = float(recalls[-1]) if results else 0
     
     print("\n" + "="*70)
     print("RECALL STATISTICS")
@@ -156,21 +199,18 @@ def per_query_analysis():
     print(f"Mean Recall@10: {mean_recall:.4f} ({mean_recall*100:.2f}%)")
     print(f"Min Recall@10: {min_recall:.4f} ({min_recall*100:.2f}%)")
     print(f"Max Recall@10: {max_recall:.4f} ({max_recall*100:.2f}%)")
-    print(f"Queries with 0% recall: {sum(1 for r in results if r['recall'] == 0)}")
-    print(f"Queries with 100% recall: {sum(1 for r in results if r['recall'] == 1.0)}")
+    print(f"Queries with 0% recall: {np.count_nonzero(recalls == 0)}")
+    print(f"Queries with 100% recall: {np.count_nonzero(recalls == 1.0)}")
     
-    return results
+    return results, missed_counts
 
 
-def verify_alternate_urls():
+def verify_alternate_urls(assessments):
     """Verify that alternate URLs are correctly generated and stored."""
     print("\n" + "="*70)
     print("ALTERNATE URLS VERIFICATION")
     print("="*70)
     
-    with open('data/assessments.json', 'r', encoding='utf-8') as f:
-        assessments = json.load(f)
-    
     total_assessments = len(assessments)
     with_alternates = sum(1 for a in assessments if a.get('alternate_urls'))
     without_alternates = total_assessments - with_alternates
@@ -194,8 +234,13 @@ def verify_alternate_urls():
     return with_alternates / total_assessments if total_assessments > 0 else 0
 
 
-def suggest_improvements(results):
-    """Suggest improvements based on analysis."""
+def suggest_improvements(results, missed_counts=None):
+    """
+    Suggest improvements based on analysis.
+    
+    missed_counts is the Counter from per_query_analysis; it is rebuilt from
+    results when not given.
+    """
     print("\n" + "="*70)
     print("IMPROVEMENT SUGGESTIONS")
     print("="*70)
@@ -219,13 +264,10 @@ def suggest_improvements(results):
         })
     
     # Check for common patterns in missed assessments
-    all_missed = []
-    for r in results:
-        all_missed.extend(r.get('missed_slugs', []))
+    if missed_counts is None:
+        missed_counts = Counter(chain.from_iterable(r.get('missed_slugs', ()) for r in results))
     
-    if all_missed:
-        from collections import Counter
-        missed_counts = Counter(all_missed)
+    if missed_counts:
         most_missed = missed_counts.most_common(5)
         
         if most_missed:
@@ -258,17 +300,21 @@ def main():
     print("RECALL IMPROVEMENT VERIFICATION REPORT")
     print("="*70)
     
+    # Train data and the catalog are parsed once and shared by the analyses
+    train_queries, train_urls, n_rows = load_train_data()
+    assessments = load_assessments()
+    
     # 1. URL Matching Analysis
-    coverage, missing_slugs = analyze_url_matching()
+    coverage, missing_slugs = analyze_url_matching(train_queries, train_urls, n_rows, assessment_url_slugs(assessments))
     
     # 2. Alternate URLs Verification
-    alt_url_coverage = verify_alternate_urls()
+    alt_url_coverage = verify_alternate_urls(assessments)
     
     # 3. Per-Query Analysis
-    results = per_query_analysis()
+    results, missed_counts = per_query_analysis(train_queries)
     
     # 4. Improvement Suggestions
-    suggestions = suggest_improvements(results)
+    suggestions = suggest_improvements(results, missed_counts)
     
     # Summary
     print("\n" + "="*70)
@@ -6,12 +6,23 @@ Advanced Retriever with Multiple Strategies:
 4. Multi-stage filtering
 5. Smart re-ranking
 """
+import os
 import re
-from typing import List, Dict, Optional, Set
-from src.retriever import get_vector_db, get_query_embedding
+import threading
+from typing import List, Dict, Optional, Set, Tuple
+from src.retriever import get_vector_db, get_query_embedding, get_query_embeddings, metadata_columns, term_mask
+from src.search_core import topk_indices
 import faiss
 import numpy as np
 
+# FAISS candidates pulled per query before keyword scoring
+SEMANTIC_SEARCH_K = 150
+
+# Proximity cache: near-duplicate queries (cosine >= threshold) reuse earlier
+# results. Off by default (size 0) so evaluation numbers stay exact.
+PROXIMITY_CACHE_SIZE = int(os.getenv('PROXIMITY_CACHE_SIZE', '0'))
+PROXIMITY_CACHE_THRESHOLD = float(os.getenv('PROXIMITY_CACHE_THRESHOLD', '0.97'))
+
 # Query expansion dictionary - expanded for better recall
 QUERY_EXPANSIONS = {
     # Programming languages
@@ -50,30 +61,51 @@ QUERY_EXPANSIONS = {
     'senior': ['senior', 'experienced', 'advanced', 'professional', 'expert'],
 }
 
+# Job-role keywords (expanded); a role matches if any keyword is a substring of the query
+ROLE_KEYWORDS = {
+    'developer': ['developer', 'programmer', 'coder', 'engineer', 'software'],
+    'analyst': ['analyst', 'data analyst', 'business analyst', 'data'],
+    'manager': ['manager', 'supervisor', 'lead', 'director', 'management'],
+    'admin': ['admin', 'administrative', 'administrator', 'assistant', 'clerical'],
+    'sales': ['sales', 'salesperson', 'account manager', 'selling'],
+    'executive': ['executive', 'coo', 'ceo', 'cfo', 'leadership', 'senior executive'],
+    'consultant': ['consultant', 'consulting', 'advisor', 'advisory'],
+    'professional': ['professional', 'specialist', 'expert'],
+}
+
+# Words ignored when counting query/assessment-name word overlap
+STOPWORDS = frozenset({'the', 'a', 'an', 'for', 'and', 'or', 'to', 'in', 'of', 'is', 'are'})
+
+# Duration constraint patterns, tried in order (the first pattern that matches wins)
+_DURATION_PATTERNS = [re.compile(pattern) for pattern in (
+    r'(\d+)\s*minutes?',
+    r'(\d+)\s*mins?',
+    r'(\d+)\s*hours?',
+    r'(\d+)\s*hrs?',
+    r'duration[:\s]*(\d+)',
+    r'max[:\s]*(\d+)',
+    r'about\s*(\d+)',
+    r'(\d+)\s*-\s*(\d+)\s*minutes?',  # Range like "30-40 minutes"
+    r'(\d+)\s*to\s*(\d+)\s*minutes?',
+)]
+_DIGIT_RE = re.compile(r'\d')
+_WHITESPACE_RE = re.compile(r'\s+')
+
 def preprocess_query(query: str) -> Dict:
     """Extract structured information from query."""
     # Clean query first
-    query = re.sub(r'\s+', ' ', query).strip()
+    query = _WHITESPACE_RE.sub(' ', query).strip()
     # Normalize common variations
     query = query.replace('Java Script', 'JavaScript').replace('java script', 'javascript')
     query_lower = query.lower()
     
-    # Extract duration constraints (more patterns)
+    # Extract duration constraints (more patterns); every pattern needs a
+    # digit, so queries without one skip the scan
     duration = None
-    duration_patterns = [
-        r'(\d+)\s*minutes?',
-        r'(\d+)\s*mins?',
-        r'(\d+)\s*hours?',
-        r'(\d+)\s*hrs?',
-        r'duration[:\s]*(\d+)',
-        r'max[:\s]*(\d+)',
-        r'about\s*(\d+)',
-        r'(\d+)\s*-\s*(\d+)\s*minutes?',  # Range like "30-40 minutes"
-        r'(\d+)\s*to\s*(\d+)\s*minutes?',
-    ]
+    duration_patterns = _DURATION_PATTERNS if _DIGIT_RE.search(query_lower) else []
     
     for pattern in duration_patterns:
-        match = re.search(pattern, query_lower)
+        match = pattern.search(query_lower)
         if match:
             if len(match.groups()) == 2:  # Range
                 duration = int(match.group(2))  # Take upper bound
@@ -94,18 +126,7 @@ def preprocess_query(query: str) -> Dict:
     
     # Extract job roles (expanded)
     roles = []
-    role_keywords = {
-        'developer': ['developer', 'programmer', 'coder', 'engineer', 'software'],
-        'analyst': ['analyst', 'data analyst', 'business analyst', 'data'],
-        'manager': ['manager', 'supervisor', 'lead', 'director', 'management'],
-        'admin': ['admin', 'administrative', 'administrator', 'assistant', 'clerical'],
-        'sales': ['sales', 'salesperson', 'account manager', 'selling'],
-        'executive': ['executive', 'coo', 'ceo', 'cfo', 'leadership', 'senior executive'],
-        'consultant': ['consultant', 'consulting', 'advisor', 'advisory'],
-        'professional': ['professional', 'specialist', 'expert'],
-    }
-    
-    for role, keywords in role_keywords.items():
+    for role, keywords in ROLE_KEYWORDS.items():
         for keyword in keywords:
             if keyword in query_lower:
                 roles.append(role)
@@ -180,18 +201,104 @@ def expand_query(query_info: Dict) -> str:
     return ' '.join(expanded_parts)
 
 
+class ProximityCache:
+    """
+    Small in-memory cache of (query embedding -> results) with cosine lookup.
+    
+    Keys live in a (capacity, d) float32 matrix, so a lookup is one
+    matrix-vector product. Entries only match when their params (top_k,
+    re-ranker flags, ...) are equal; the least recently used slot is evicted.
+    """
+    
+    def __init__(self, capacity: int = 256, threshold: float = 0.97):
+        self.capacity = capacity
+        self.threshold = threshold
+        self._keys = None  # allocated on first put, once the dimension is known
+        self._params = [None] * capacity
+        self._results = [None] * capacity
+        self._last_used = np.zeros(capacity, dtype=np.int64)
+        self._clock = 0
+        self._size = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def _normalize(vec) -> np.ndarray:
+        vec = np.array(vec, dtype=np.float32, ndmin=2)
+        faiss.normalize_L2(vec)
+        return vec[0]
+    
+    def get(self, vec, params: Tuple) -> Optional[List[Dict]]:
+        """Cached results of the closest matching query, or None."""
+        q = self._normalize(vec)
+        with self._lock:
+            if self._size == 0 or self._keys.shape[1] != q.shape[0]:
+                return None
+            scores = self._keys[:self._size] @ q
+            for i in range(self._size):
+                if self._params[i] != params:
+                    scores[i] = -np.inf
+            best = int(scores.argmax())
+            if scores[best] < self.threshold:
+                return None
+            self._clock += 1
+            self._last_used[best] = self._clock
+            # Copies, since callers annotate and re-sort result dicts
+            return [dict(r) for r in self._results[best]]
+    
+    def put(self, vec, params: Tuple, results: List[Dict]) -> None:
+        q = self._normalize(vec)
+        with self._lock:
+            if self._keys is None or self._keys.shape[1] != q.shape[0]:
+                self._keys = np.zeros((self.capacity, q.shape[0]), dtype=np.float32)
+                self._size = 0
+            if self._size < self.capacity:
+                slot = self._size
+                self._size += 1
+            else:
+                slot = int(self._last_used.argmin())
+            self._clock += 1
+            self._keys[slot] = q
+            self._params[slot] = params
+            self._results[slot] = [dict(r) for r in results]
+            self._last_used[slot] = self._clock
+
+
+_proximity_cache = ProximityCache(PROXIMITY_CACHE_SIZE, PROXIMITY_CACHE_THRESHOLD) if PROXIMITY_CACHE_SIZE > 0 else None
+
+
+def enable_proximity_cache(
+    capacity: int = 256,
+    threshold: float = PROXIMITY_CACHE_THRESHOLD
+) -> Optional[ProximityCache]:
+    """
+    Turn the proximity cache on (or off with capacity 0) for this process.
+    
+    Meant for long-running servers, where near-duplicate queries are common;
+    evaluation scripts leave it off. An existing cache with the same settings
+    is kept, so repeated calls do not drop its entries.
+    """
+    global _proximity_cache
+    if capacity <= 0:
+        _proximity_cache = None
+    elif (_proximity_cache is None or _proximity_cache.capacity != capacity
+          or _proximity_cache.threshold != threshold):
+        _proximity_cache = ProximityCache(capacity, threshold)
+    return _proximity_cache
+
+
 def hybrid_retrieve(
     query: str,
     query_info: Dict,
     vector_db: Dict,
-    top_k: int = 50
+    top_k: int = 50,
+    query_embedding: Optional[List[float]] = None
 ) -> List[Dict]:
     """Hybrid retrieval combining semantic search and keyword matching."""
     index = vector_db['index']
-    metadata = vector_db['metadata']
     
-    # 1. Semantic search
-    query_embedding = get_query_embedding(query)
+    # 1. Semantic search (the caller may already have embedded the query)
+    if query_embedding is None:
+        query_embedding = get_query_embedding(query)
     if not query_embedding:
         return []
     
@@ -199,163 +306,208 @@ def hybrid_retrieve(
     faiss.normalize_L2(query_vec)
     
     # Search candidates - 150 provides good coverage with keyword boosting
-    search_k = min(150, index.ntotal)
+    search_k = min(SEMANTIC_SEARCH_K, index.ntotal)
     distances, indices = index.search(query_vec, search_k)
     
+    return score_hits(query, query_info, vector_db, distances[0], indices[0], top_k=top_k)
+
+
+def score_hits(
+    query: str,
+    query_info: Dict,
+    vector_db: Dict,
+    distances,
+    indices,
+    top_k: int = 50
+) -> List[Dict]:
+    """
+    Combine one query's FAISS hits with keyword scores (second half of hybrid_retrieve).
+    
+    Scores are accumulated as arrays over the hits using the cached metadata
+    columns and term masks; result dicts are only built for the top_k.
+    """
+    columns = metadata_columns(vector_db)
+    
+    indices = np.asarray(indices)
+    valid = (indices >= 0) & (indices < len(columns.records))
+    rows = indices[valid]
+    
+    # Semantic score
+    semantic_scores = np.asarray(distances, dtype=np.float64)[valid]
+    
     # 2. Build keyword scores
     query_lower = query.lower()
     skills = set(query_info['skills'])
     roles = set(query_info['roles'])
     
-    candidates = []
-    for i, idx in enumerate(indices[0]):
-        if idx >= len(metadata):
-            continue
-        
-        meta = metadata[idx]
-        name_lower = meta['name'].lower()
-        desc_lower = (meta.get('description', '') or '').lower()
-        
-        # Semantic score
-        semantic_score = float(distances[0][i])
-        
-        # Keyword matching score (significantly boosted for better recall)
-        keyword_score = 0.0
-        
-        # Name matches (strong boost - doubled)
-        for skill in skills:
-            if skill in name_lower:
-                keyword_score += 0.40  # Increased from 0.20
-            elif skill in desc_lower:
-                keyword_score += 0.10  # Increased from 0.05
-        
-        for role in roles:
-            if role in name_lower:
-                keyword_score += 0.30  # Increased from 0.15
-            elif role in desc_lower:
-                keyword_score += 0.10  # Increased from 0.05
-        
-        # Exact phrase matches (doubled boost)
-        for skill in skills:
-            if skill in query_lower and skill in name_lower:
-                keyword_score += 0.20  # Increased from 0.10
-        
-        # Test type matching (doubled)
-        meta_test_types = meta.get('test_type', [])
-        for pref_type in query_info['test_types']:
-            if pref_type in meta_test_types:
-                keyword_score += 0.20  # Increased from 0.10
-        
-        # Additional boosts for specific patterns
-        # Boost for assessment names containing key query terms
-        query_words = set(query_lower.split())
-        name_words = set(name_lower.split())
-        common_words = query_words & name_words - {'the', 'a', 'an', 'for', 'and', 'or', 'to', 'in', 'of', 'is', 'are'}
-        if common_words:
-            keyword_score += len(common_words) * 0.15
-        
-        # Combined score
-        combined_score = semantic_score + keyword_score
-        
-        candidates.append({
-            'url': meta['url'],
-            'alternate_urls': meta.get('alternate_urls', []),
-            'name': meta['name'],
-            'description': meta.get('description', ''),
-            'duration': meta.get('duration', 0) or 0,
-            'remote_support': meta.get('remote_support', 'No'),
-            'adaptive_support': meta.get('adaptive_support', 'No'),
-            'test_type': meta_test_types,
-            'semantic_score': semantic_score,
-            'keyword_score': keyword_score,
-            'combined_score': combined_score,
-            'distance': combined_score  # For compatibility
-        })
-    
-    # Sort by combined score
-    candidates.sort(key=lambda x: x['combined_score'], reverse=True)
-    
-    return candidates[:top_k]
+    # Keyword matching score (significantly boosted for better recall)
+    keyword_scores = np.zeros(len(rows))
+    
+    # Name matches (strong boost - doubled); the skill name hits are reused below
+    skill_in_name = {}
+    for skill in skills:
+        in_name = skill_in_name[skill] = term_mask(columns, 'name', skill)[rows]
+        in_desc = term_mask(columns, 'desc', skill)[rows]
+        keyword_scores += np.where(in_name, 0.40, np.where(in_desc, 0.10, 0.0))  # Increased from 0.20 / 0.05
+    
+    for role in roles:
+        in_name = term_mask(columns, 'name', role)[rows]
+        in_desc = term_mask(columns, 'desc', role)[rows]
+        keyword_scores += np.where(in_name, 0.30, np.where(in_desc, 0.10, 0.0))  # Increased from 0.15 / 0.05
+    
+    # Exact phrase matches (doubled boost)
+    skills_in_query = [skill for skill in skills if skill in query_lower]
+    for skill in skills_in_query:
+        keyword_scores += np.where(skill_in_name[skill], 0.20, 0.0)  # Increased from 0.10
+    
+    # Test type matching (doubled)
+    for pref_type in query_info['test_types']:
+        keyword_scores += np.where(term_mask(columns, 'test_type', pref_type)[rows], 0.20, 0.0)  # Increased from 0.10
+    
+    # Additional boosts for specific patterns
+    # Boost for assessment names containing key query terms
+    query_words = frozenset(query_lower.split()) - STOPWORDS
+    name_words = columns.name_words
+    # isdisjoint skips building an intersection set for the (common) names sharing no word
+    common_counts = np.fromiter(
+        (0 if query_words.isdisjoint(name_words[r]) else len(query_words & name_words[r]) for r in rows),
+        dtype=np.float64, count=len(rows)
+    )
+    keyword_scores += common_counts * 0.15
+    
+    # Combined score
+    combined_scores = semantic_scores + keyword_scores
+    
+    # Top_k by combined score (stable, like the former full sort); only these
+    # survivors are materialized as dicts, from plain-float column slices
+    top = topk_indices(combined_scores, top_k)
+    records = columns.records
+    return [
+        dict(
+            records[row],
+            semantic_score=semantic_score,
+            keyword_score=keyword_score,
+            combined_score=combined_score,
+            distance=combined_score  # For compatibility
+        )
+        for row, semantic_score, keyword_score, combined_score in zip(
+            rows[top].tolist(), semantic_scores[top].tolist(),
+            keyword_scores[top].tolist(), combined_scores[top].tolist()
+        )
+    ]
 
 
 def filter_candidates(
     candidates: List[Dict],
     query_info: Dict
 ) -> List[Dict]:
-    """Multi-stage filtering - soft penalties for better recall."""
-    filtered = []
-    
-    for cand in candidates:
-        # Duration filter - soft penalty (don't drop candidates)
-        if query_info['duration']:
-            cand_duration = cand.get('duration', 0) or 0
-            if cand_duration > 0 and cand_duration > query_info['duration'] * 1.3:  # 30% tolerance
-                # Slight penalty but keep candidate
-                cand['combined_score'] *= 0.9
-        
-        # Test type filter (soft - boost rather than filter)
-        if query_info['test_types']:
-            meta_types = cand.get('test_type', [])
-            if not any(t in meta_types for t in query_info['test_types']):
-                # Don't filter out, but lower score slightly
-                cand['combined_score'] *= 0.95
-        
-        filtered.append(cand)
+    """
+    Multi-stage filtering - soft penalties for better recall.
     
-    return filtered
+    Penalties are applied to all candidates at once with NumPy; queries with
+    no duration or test-type preference return immediately.
+    """
+    duration = query_info['duration']
+    wanted_types = query_info['test_types']
+    if not candidates or not (duration or wanted_types):
+        return list(candidates)
+    
+    n = len(candidates)
+    scores = np.fromiter((cand['combined_score'] for cand in candidates), dtype=np.float64, count=n)
+    
+    # Duration filter - soft penalty (don't drop candidates)
+    if duration:
+        cand_durations = np.fromiter((cand.get('duration', 0) or 0 for cand in candidates), dtype=np.float64, count=n)
+        too_long = (cand_durations > 0) & (cand_durations > duration * 1.3)  # 30% tolerance
+        # Slight penalty but keep candidate
+        scores = np.where(too_long, scores * 0.9, scores)
+    
+    # Test type filter (soft - boost rather than filter)
+    if wanted_types:
+        type_match = np.fromiter(
+            (any(t in cand.get('test_type', []) for t in wanted_types) for cand in candidates),
+            dtype=bool, count=n
+        )
+        # Don't filter out, but lower score slightly
+        scores = np.where(type_match, scores, scores * 0.95)
+    
+    for cand, score in zip(candidates, scores.tolist()):
+        cand['combined_score'] = score
+    
+    return list(candidates)
 
 
 def rerank_rule_based(
     candidates: List[Dict],
-    query_info: Dict
+    query_info: Dict,
+    vector_db: Optional[Dict] = None
 ) -> List[Dict]:
-    """Rule-based re-ranking using multiple signals."""
+    """
+    Rule-based re-ranking using multiple signals.
+    
+    Name substring checks use the cached term masks of vector_db's metadata
+    columns when given (candidates carry their row_id), otherwise one scan
+    of the candidates' lowercased names per term.
+    """
+    if not candidates:
+        return candidates
+    
     query_lower = query_info['original_query'].lower()
+    n = len(candidates)
     
-    for cand in candidates:
-        rerank_score = 0.0
-        
-        name_lower = cand['name'].lower()
-        desc_lower = (cand.get('description', '') or '').lower()
-        
-        # 1. Exact name matches (very strong)
-        for skill in query_info['skills']:
-            if skill in name_lower:
-                rerank_score += 0.30
-        
-        # 2. Role matches in name
-        for role in query_info['roles']:
-            if role in name_lower:
-                rerank_score += 0.25
+    if vector_db is not None and all('row_id' in cand for cand in candidates):
+        columns = metadata_columns(vector_db)
+        rows = np.fromiter((cand['row_id'] for cand in candidates), dtype=np.int64, count=n)
         
-        # 3. Duration match (boost if within range)
-        if query_info['duration'] and cand.get('duration'):
-            cand_dur = cand['duration']
-            query_dur = query_info['duration']
-            if cand_dur <= query_dur * 1.2:  # Within 20% tolerance
-                rerank_score += 0.15
-        
-        # 4. Test type match
-        meta_types = cand.get('test_type', [])
-        for pref_type in query_info['test_types']:
-            if pref_type in meta_types:
-                rerank_score += 0.10
-        
-        # 5. Entry-level keywords
-        if any(kw in query_lower for kw in ['entry', 'graduate', 'junior', '0-2', '0-3']):
-            if any(kw in name_lower for kw in ['entry', 'junior', 'level']):
-                rerank_score += 0.10
-        
-        # 6. Senior/experienced keywords
-        if any(kw in query_lower for kw in ['senior', 'experienced', '5+', 'years']):
-            if any(kw in name_lower for kw in ['senior', 'advanced', 'professional']):
-                rerank_score += 0.10
-        
-        # 7. Remote support (if mentioned)
-        if 'remote' in query_lower and cand.get('remote_support') == 'Yes':
-            rerank_score += 0.05
+        def name_has(term):
+            return term_mask(columns, 'name', term)[rows]
+    else:
+        names_lower = [cand['name'].lower() for cand in candidates]
         
-        # Update combined score
+        def name_has(term):
+            return np.fromiter((term in name for name in names_lower), dtype=bool, count=n)
+    
+    # Each signal adds its boost or exactly 0.0, in the original order, so the
+    # sums match the per-candidate loop bit for bit
+    rerank_scores = np.zeros(n)
+    
+    # 1. Exact name matches (very strong)
+    for skill in query_info['skills']:
+        rerank_scores += np.where(name_has(skill), 0.30, 0.0)
+    
+    # 2. Role matches in name
+    for role in query_info['roles']:
+        rerank_scores += np.where(name_has(role), 0.25, 0.0)
+    
+    # 3. Duration match (boost if within range)
+    query_dur = query_info['duration']
+    if query_dur:
+        cand_durs = np.fromiter((cand.get('duration') or 0 for cand in candidates), dtype=np.float64, count=n)
+        within = (cand_durs != 0) & (cand_durs <= query_dur * 1.2)  # Within 20% tolerance
+        rerank_scores += np.where(within, 0.15, 0.0)
+    
+    # 4. Test type match
+    for pref_type in query_info['test_types']:
+        type_match = np.fromiter((pref_type in cand.get('test_type', []) for cand in candidates), dtype=bool, count=n)
+        rerank_scores += np.where(type_match, 0.10, 0.0)
+    
+    # 5. Entry-level keywords
+    if any(kw in query_lower for kw in ['entry', 'graduate', 'junior', '0-2', '0-3']):
+        entry_name = name_has('entry') | name_has('junior') | name_has('level')
+        rerank_scores += np.where(entry_name, 0.10, 0.0)
+    
+    # 6. Senior/experienced keywords
+    if any(kw in query_lower for kw in ['senior', 'experienced', '5+', 'years']):
+        senior_name = name_has('senior') | name_has('advanced') | name_has('professional')
+        rerank_scores += np.where(senior_name, 0.10, 0.0)
+    
+    # 7. Remote support (if mentioned)
+    if 'remote' in query_lower:
+        remote = np.fromiter((cand.get('remote_support') == 'Yes' for cand in candidates), dtype=bool, count=n)
+        rerank_scores += np.where(remote, 0.05, 0.0)
+    
+    # Update combined score
+    for cand, rerank_score in zip(candidates, rerank_scores.tolist()):
         cand['combined_score'] += rerank_score
         cand['rerank_score'] = rerank_score
     
@@ -364,6 +516,21 @@ def rerank_rule_based(
     return candidates
 
 
+def _cache_params(vector_db: Dict, query_info: Dict, top_k: int, use_llm_rerank: bool, use_xgboost_rerank: bool) -> Tuple:
+    """
+    Proximity-cache match key: retrieval settings plus the query's parsed
+    constraints, so near-identical queries with different durations, test
+    types, skills or roles never share results.
+    """
+    return (
+        id(vector_db), top_k, use_llm_rerank, use_xgboost_rerank,
+        query_info['duration'],
+        tuple(sorted(query_info['test_types'])),
+        tuple(sorted(query_info['skills'])),
+        tuple(sorted(query_info['roles'])),
+    )
+
+
 def retrieve_advanced(
     query: str,
     vector_db: Dict,
@@ -387,36 +554,118 @@ def retrieve_advanced(
     # 2. Expand query
     expanded_query = expand_query(query_info)
     
+    # Near-duplicate of an earlier query: skip search and re-ranking
+    query_embedding = None
+    if _proximity_cache is not None:
+        query_embedding = get_query_embedding(expanded_query)
+        if query_embedding:
+            params = _cache_params(vector_db, query_info, top_k, use_llm_rerank, use_xgboost_rerank)
+            cached = _proximity_cache.get(query_embedding, params)
+            if cached is not None:
+                return cached
+    
     # 3. Hybrid retrieval - 100 gave best results
-    candidates = hybrid_retrieve(expanded_query, query_info, vector_db, top_k=100)
+    candidates = hybrid_retrieve(expanded_query, query_info, vector_db, top_k=100, query_embedding=query_embedding)
+    
+    results = rerank_candidates(query, query_info, candidates, top_k, use_llm_rerank, use_xgboost_rerank, vector_db)
+    if _proximity_cache is not None and query_embedding:
+        _proximity_cache.put(query_embedding, params, results)
+    return results
+
+
+def rerank_candidates(
+    query: str,
+    query_info: Dict,
+    candidates: List[Dict],
+    top_k: int = 10,
+    use_llm_rerank: bool = False,
+    use_xgboost_rerank: bool = True,
+    vector_db: Optional[Dict] = None
+) -> List[Dict]:
+    """
+    Filter and re-rank hybrid candidates (steps 4-6 of retrieve_advanced).
     
+    vector_db, when given, lets the rule-based re-ranker use its cached
+    metadata term masks.
+    """
     # 4. Filter
     filtered = filter_candidates(candidates, query_info)
     
     # 5. Re-ranking (XGBoost is best, then LLM, then rule-based)
     if use_xgboost_rerank:
         try:
-            from src.xgboost_reranker import load_xgboost_reranker, rerank_with_xgboost
-            model = load_xgboost_reranker('data/xgboost_reranker.pkl')
+            from src.xgboost_reranker import get_xgboost_reranker, rerank_with_xgboost
+            model = get_xgboost_reranker('data/xgboost_reranker.pkl')
             if model:
                 reranked = rerank_with_xgboost(query, filtered[:top_k * 3], model, query_info, top_k=top_k)
             else:
                 # Fallback to rule-based if model not found
-                reranked = rerank_rule_based(filtered, query_info)
+                reranked = rerank_rule_based(filtered, query_info, vector_db)
         except Exception as e:
             print(f"XGBoost re-ranking failed, using rule-based: {e}")
-            reranked = rerank_rule_based(filtered, query_info)
+            reranked = rerank_rule_based(filtered, query_info, vector_db)
     elif use_llm_rerank:
         try:
             from src.llm_reranker import llm_rerank
             reranked = llm_rerank(query, filtered[:top_k * 2], top_k=top_k, use_fallback=True)
         except Exception as e:
             print(f"LLM re-ranking failed, using rule-based: {e}")
-            reranked = rerank_rule_based(filtered, query_info)
+            reranked = rerank_rule_based(filtered, query_info, vector_db)
     else:
         # Rule-based re-ranking
-        reranked = rerank_rule_based(filtered, query_info)
+        reranked = rerank_rule_based(filtered, query_info, vector_db)
     
     # 6. Return top_k
     return reranked[:top_k]
 
+
+def retrieve_advanced_batch(
+    queries: List[str],
+    vector_db: Dict,
+    top_k: int = 10,
+    use_llm_rerank: bool = False,
+    use_xgboost_rerank: bool = True
+) -> List[List[Dict]]:
+    """
+    Run retrieve_advanced over many queries with one embedding call and one FAISS search.
+    
+    Returns one result list per query, in input order. Falls back to per-query
+    retrieval if the batched embedding request fails. With the proximity
+    cache enabled, near-duplicates of earlier queries are answered from it
+    and only the rest are searched and re-ranked.
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+    
+    query_infos = [preprocess_query(q) for q in queries]
+    expanded = [expand_query(info) for info in query_infos]
+    
+    embeddings = get_query_embeddings(expanded)
+    if not embeddings or len(embeddings) != len(queries):
+        return [retrieve_advanced(q, vector_db, top_k, use_llm_rerank, use_xgboost_rerank) for q in queries]
+    
+    cache = _proximity_cache
+    params = [_cache_params(vector_db, info, top_k, use_llm_rerank, use_xgboost_rerank) for info in query_infos]
+    if cache is not None:
+        results = [cache.get(embedding, key) for embedding, key in zip(embeddings, params)]
+    else:
+        results = [None] * len(queries)
+    todo = [i for i, cached in enumerate(results) if cached is None]
+    if not todo:
+        return results
+    
+    query_vecs = np.array([embeddings[i] for i in todo], dtype='float32')
+    faiss.normalize_L2(query_vecs)
+    
+    index = vector_db['index']
+    search_k = min(SEMANTIC_SEARCH_K, index.ntotal)
+    distances, indices = index.search(query_vecs, search_k)
+    
+    for row, i in enumerate(todo):
+        query, query_info = queries[i], query_infos[i]
+        candidates = score_hits(expanded[i], query_info, vector_db, distances[row], indices[row], top_k=100)
+        results[i] = rerank_candidates(query, query_info, candidates, top_k, use_llm_rerank, use_xgboost_rerank, vector_db)
+        if cache is not None:
+            cache.put(embeddings[i], params[i], results[i])
+    return results
@@ -1,21 +1,74 @@
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+from functools import cache, lru_cache
 from typing import List, Optional
+import asyncio
 import os
 import json
+import re
+import faiss
 from dotenv import load_dotenv
 
 from src.retriever import get_vector_db
-from src.advanced_retriever import retrieve_advanced
+from src.advanced_retriever import enable_proximity_cache, retrieve_advanced_batch
 from src.utils import fetch_jd_from_url, clean_query
 
 load_dotenv()
 
-app = FastAPI(title="SHL Assessment Recommendation API")
+app = FastAPI(title="SHL Assessment Recommendation API", default_response_class=ORJSONResponse)
 
 # Global flag to track initialization
 _initialized = False
 
+# Concurrent /recommend queries arriving within BATCH_MAX_DELAY_MS of each
+# other are retrieved together (one embedding call, one FAISS search)
+BATCH_MAX_SIZE = int(os.getenv('API_BATCH_SIZE', '16'))
+BATCH_MAX_DELAY_MS = float(os.getenv('API_BATCH_DELAY_MS', '10'))
+
+# Semantic cache of recent results: a query whose embedding is within
+# API_CACHE_THRESHOLD cosine of a cached one skips search and re-ranking
+API_CACHE_SIZE = int(os.getenv('API_CACHE_SIZE', '2048'))
+API_CACHE_THRESHOLD = float(os.getenv('API_CACHE_THRESHOLD', '0.97'))
+enable_proximity_cache(API_CACHE_SIZE, API_CACHE_THRESHOLD)
+
+# Blocking work (retrieval batches, JD fetches) runs on this pool, never on
+# the event loop. FAISS and XGBoost release the GIL, so batches run in
+# parallel; FAISS is kept single-threaded per call so they don't oversubscribe.
+RETRIEVAL_WORKERS = int(os.getenv('API_RETRIEVAL_WORKERS', str(os.cpu_count() or 4)))
+_pool = ThreadPoolExecutor(max_workers=RETRIEVAL_WORKERS, thread_name_prefix='retrieval')
+faiss.omp_set_num_threads(1)
+
+
+# Query prefixes that mean "fetch the job description from this URL"
+_URL_PREFIXES = ('http://', 'https://')
+
+# Mis-decoded UTF-8 sequences seen in scraped descriptions, fixed in one pass
+_ENCODING_FIXES = {'â€¦': '…', 'â€"': '—', 'â€™': "'"}
+_ENCODING_FIX_RE = re.compile('|'.join(map(re.escape, _ENCODING_FIXES)))
+
+
+def fix_encoding(text: str) -> str:
+    """Replace the known mojibake sequences in text with the intended characters."""
+    return _ENCODING_FIX_RE.sub(lambda m: _ENCODING_FIXES[m.group(0)], text)
+
+
+@lru_cache(maxsize=128)
+def _jd_query_or_raise(url: str) -> str:
+    jd_text = fetch_jd_from_url(url)
+    if not jd_text:
+        raise LookupError(url)  # exceptions are not cached, so failures are retried
+    return clean_query(jd_text)
+
+
+def jd_query_from_url(url: str) -> Optional[str]:
+    """Cleaned job-description query for a URL (memoized), or None if it could not be fetched."""
+    try:
+        return _jd_query_or_raise(url)
+    except LookupError:
+        return None
+
 
 class QueryRequest(BaseModel):
     query: str
@@ -35,18 +88,26 @@ class RecommendationResponse(BaseModel):
     recommended_assessments: List[AssessmentResponse]
 
 
+@cache
 def ensure_initialized():
-    """Verify required files exist (pre-generated for instant startup)."""
+    """
+    Verify required files exist (pre-generated for instant startup).
+    
+    Cached once it succeeds (a failure raises and is retried on the next
+    call); the data directory is listed with a single scandir.
+    """
     global _initialized
     
-    if _initialized:
-        return
+    try:
+        present = {entry.name for entry in os.scandir('data')}
+    except FileNotFoundError:
+        present = set()
     
     # Check if vector DB exists (should be pre-generated)
     index_file = 'data/faiss_index.bin'
     metadata_file = 'data/faiss_metadata.pkl'
     
-    if not os.path.exists(index_file) or not os.path.exists(metadata_file):
+    if not {'faiss_index.bin', 'faiss_metadata.pkl'} <= present:
         raise FileNotFoundError(
             f"Vector database files not found: {index_file}, {metadata_file}. "
             "Please ensure these files are committed to the repository. "
@@ -54,18 +115,118 @@ def ensure_initialized():
         )
     
     # XGBoost model is optional (will use fallback if not found)
-    model_file = 'data/xgboost_reranker.pkl'
-    if not os.path.exists(model_file):
+    if 'xgboost_reranker.pkl' not in present:
         print("Warning: XGBoost model not found. Will use rule-based fallback.")
     
     _initialized = True
 
 
+def _retrieve_batch(queries: List[str]) -> List[List[dict]]:
+    """Blocking batched retrieval, run on the retrieval pool by QueryBatcher."""
+    # Advanced retriever with XGBoost re-ranking (best strategy - 61.56% recall)
+    return retrieve_advanced_batch(
+        queries,
+        get_vector_db(),
+        top_k=10,
+        use_llm_rerank=False,  # XGBoost is better and has no API limits
+        use_xgboost_rerank=True  # Enable XGBoost re-ranking for best results (61.56% recall)
+    )
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent queries into retrieve_advanced_batch calls.
+    
+    Requests put (query, future) on a queue; a single consumer task waits for
+    a free worker, takes the first waiting query, collects more for up to
+    max_delay_ms (at most max_size in total) and hands the batch to the
+    executor, resolving each future with its own result list. Up to
+    max_in_flight batches run at once; while all are busy, new queries
+    accumulate into the next batch.
+    """
+    
+    def __init__(
+        self,
+        max_size: int = BATCH_MAX_SIZE,
+        max_delay_ms: float = BATCH_MAX_DELAY_MS,
+        executor: Optional[ThreadPoolExecutor] = None,
+        max_in_flight: int = RETRIEVAL_WORKERS
+    ):
+        self.max_size = max(1, max_size)
+        self.max_delay = max(0.0, max_delay_ms) / 1000
+        self.executor = executor
+        self.max_in_flight = max(1, max_in_flight)
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._task: Optional[asyncio.Task] = None
+        self._running = set()  # in-flight batch tasks (kept referenced until done)
+    
+    def start(self):
+        """Start the consumer task on the running loop (idempotent)."""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._slots = asyncio.Semaphore(self.max_in_flight)
+            self._task = asyncio.get_running_loop().create_task(self._consume())
+    
+    async def submit(self, query: str) -> List[dict]:
+        self.start()  # lazy start if the startup hook did not run
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, future))
+        return await future
+    
+    async def _next_batch(self):
+        loop = asyncio.get_running_loop()
+        batch = [await self._queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+    
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._slots.acquire()
+            batch = await self._next_batch()
+            # Requests whose client went away are dropped from the batch
+            batch = [(query, future) for query, future in batch if not future.done()]
+            if not batch:
+                self._slots.release()
+                continue
+            task = loop.create_task(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+    
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        try:
+            results = await loop.run_in_executor(self.executor, _retrieve_batch, [query for query, _ in batch])
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+_batcher = QueryBatcher(executor=_pool)
+
+
 @app.on_event("startup")
 async def startup_event():
-    """Verify initialization on startup."""
+    """Verify initialization on startup and start the query batcher."""
     try:
         ensure_initialized()
+        _batcher.start()
         print("✓ API initialized successfully (using pre-generated files)")
     except Exception as e:
         print(f"❌ Initialization failed: {e}")
@@ -92,10 +253,10 @@ async def recommend_assessments(request: QueryRequest):
             raise HTTPException(status_code=400, detail="Query cannot be empty")
         
         # Handle URL input
-        if query.startswith('http://') or query.startswith('https://'):
-            jd_text = fetch_jd_from_url(query)
-            if jd_text:
-                query = clean_query(jd_text)
+        if query.startswith(_URL_PREFIXES):
+            jd_query = await asyncio.get_running_loop().run_in_executor(_pool, jd_query_from_url, query)
+            if jd_query is not None:
+                query = jd_query
             else:
                 raise HTTPException(status_code=400, detail="Could not fetch content from URL")
         
@@ -108,45 +269,37 @@ async def recommend_assessments(request: QueryRequest):
                 detail=f"Failed to initialize system: {str(e)}. Please check that assessments.json exists and GEMINI_API_KEY is set."
             )
         
-        # Get vector database
+        # Get vector database (loaded once, off the event loop; surfaces load
+        # errors before batching)
         try:
-            vector_db = get_vector_db()
+            await asyncio.get_running_loop().run_in_executor(_pool, get_vector_db)
         except Exception as e:
             raise HTTPException(
                 status_code=500,
                 detail=f"Vector database error: {str(e)}"
             )
         
-        # Use advanced retriever with XGBoost re-ranking (best strategy - 61.56% recall)
-        ranked = retrieve_advanced(
-            query=query,
-            vector_db=vector_db,
-            top_k=10,
-            use_llm_rerank=False,  # XGBoost is better and has no API limits
-            use_xgboost_rerank=True  # Enable XGBoost re-ranking for best results (61.56% recall)
-        )
+        # Retrieved together with other in-flight queries (see QueryBatcher)
+        ranked = await _batcher.submit(query)
         
         if not ranked:
             raise HTTPException(status_code=404, detail="No assessments found")
         
-        # Format response
-        assessments = []
-        for cand in ranked[:10]:  # Max 10 results
-            # Clean description - fix ellipsis encoding issue
-            description = cand.get('description', '') or ''
-            if description:
-                # Replace common encoding issues with proper characters
-                description = description.replace('â€¦', '…').replace('â€"', '—').replace('â€™', "'")
-            
-            assessments.append(AssessmentResponse(
+        # Format response. The candidates come from our own catalog, so the
+        # models are built without validation and serialized with orjson
+        # (max 10 results; descriptions get their encoding issues fixed)
+        assessments = [
+            AssessmentResponse.model_construct(
                 url=cand['url'],
                 name=cand.get('name', 'Unknown'),
                 adaptive_support=cand.get('adaptive_support', 'No'),
-                description=description,
-                duration=cand.get('duration', 0) or 0,
+                description=fix_encoding(cand.get('description') or ''),
+                duration=int(cand.get('duration') or 0),
                 remote_support=cand.get('remote_support', 'No'),
-                test_type=cand.get('test_type', [])
-            ))
+                test_type=list(cand.get('test_type') or [])
+            )
+            for cand in ranked[:10]
+        ]
         
         if len(assessments) < 5:
             raise HTTPException(
@@ -154,7 +307,8 @@ async def recommend_assessments(request: QueryRequest):
                 detail=f"Could not generate minimum 5 recommendations. Got {len(assessments)}."
             )
         
-        return RecommendationResponse(recommended_assessments=assessments)
+        response = RecommendationResponse.model_construct(recommended_assessments=assessments)
+        return ORJSONResponse(content=response.model_dump())
         
     except HTTPException:
         raise
@@ -0,0 +1,79 @@
+"""
+Client helpers for calling the /recommend endpoint of the running API.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+from tqdm import tqdm
+
+# Concurrent requests in flight and the overall request-rate cap (requests/second);
+# the rate matches the old 0.5 s sleep between serial requests
+API_WORKERS = int(os.getenv('API_WORKERS', '8'))
+API_RATE = float(os.getenv('API_RATE', '2'))
+
+
+class RateLimiter:
+    """Thread-safe limiter spacing request starts at least 1/rate seconds apart."""
+    
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def wait(self) -> None:
+        if self.interval <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+def make_session(pool_size: int = API_WORKERS) -> requests.Session:
+    """Keep-alive session with a connection pool sized for the worker threads."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+def recommend_many(
+    queries: List[str],
+    api_url: str,
+    workers: int = API_WORKERS,
+    rate: float = API_RATE,
+    timeout: int = 60,
+    desc: str = 'Querying API'
+) -> List[Union[dict, Exception]]:
+    """
+    POST every query to {api_url}/recommend concurrently, honouring the rate cap.
+    
+    Returns the decoded JSON response per query, in query order; a failed
+    request yields its exception instead so callers can report it.
+    """
+    queries = list(queries)
+    limiter = RateLimiter(rate)
+    session = make_session(max(1, workers))
+    
+    def _post(query):
+        limiter.wait()
+        try:
+            response = session.post(f"{api_url}/recommend", json={"query": query}, timeout=timeout)
+            response.raise_for_status()
+            return response.json()
+        except Exception as e:
+            return e
+    
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            return list(tqdm(executor.map(_post, queries), total=len(queries), desc=desc))
+    finally:
+        session.close()
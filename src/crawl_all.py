@@ -3,16 +3,19 @@ Quick crawler to get ALL assessments from both tables.
 Will combine Individual Test Solutions + Pre-packaged Job Solutions.
 """
 
-import requests
-from bs4 import BeautifulSoup
-import json
-import time
+import asyncio
+import aiohttp
+import lxml.html
+from lxml import etree
+import orjson
 import os
 from urllib.parse import urljoin
 
 BASE_URL = "https://www.shl.com"
 CATALOG_BASE = "https://www.shl.com/products/product-catalog/"
 OUTPUT_FILE = "data/assessments.json"
+# Catalog pages fetched at once (replaces the fixed sleep between pages)
+MAX_CONCURRENT_FETCHES = 4
 
 TEST_TYPE_MAP = {
     'A': 'Ability & Aptitude',
@@ -30,37 +33,48 @@ HEADERS = {
     "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
 }
 
-def fetch(session, url, retries=3):
+async def fetch(session, url, retries=3):
     for i in range(retries):
         try:
-            r = session.get(url, timeout=60)
-            if r.status_code == 200:
-                return r.text
-        except Exception as e:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=60)) as r:
+                if r.status == 200:
+                    return await r.text()
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
             print(f"  Retry {i+1}: {e}")
-            time.sleep(2)
+            await asyncio.sleep(2)
     return None
 
+# Compiled once; lxml walks the tree in C
+_ROWS_XPATH = etree.XPath('//tr[@data-entity-id]')
+_CELLS_XPATH = etree.XPath('.//td')
+
+def _text(el):
+    """Same as BeautifulSoup's get_text(strip=True): stripped text fragments, joined."""
+    return ''.join(t.strip() for t in el.itertext())
+
 def parse_rows(html):
-    soup = BeautifulSoup(html, 'html.parser')
+    try:
+        tree = lxml.html.fromstring(html)
+    except etree.ParserError:  # e.g. a whitespace-only body
+        return []
     results = []
     
-    for row in soup.find_all('tr', attrs={'data-entity-id': True}):
-        cells = row.find_all('td')
+    for row in _ROWS_XPATH(tree):
+        cells = _CELLS_XPATH(row)
         if len(cells) < 4:
             continue
         
-        link = cells[0].find('a')
-        if not link:
+        link = cells[0].find('.//a')
+        if link is None:
             continue
         
-        name = link.get_text(strip=True)
+        name = _text(link)
         url = urljoin(BASE_URL, link.get('href', ''))
-        remote = "Yes" if cells[1].find('img') else "No"
-        adaptive = "Yes" if cells[2].find('img') else "No"
+        remote = "Yes" if cells[1].find('.//img') is not None else "No"
+        adaptive = "Yes" if cells[2].find('.//img') is not None else "No"
         
         types = []
-        for c in cells[3].get_text(strip=True):
+        for c in _text(cells[3]):
             if c in TEST_TYPE_MAP:
                 types.append(TEST_TYPE_MAP[c])
         
@@ -76,24 +90,23 @@ def parse_rows(html):
     
     return results
 
-def main():
-    print("=" * 60)
-    print("SHL Crawler - All Assessments")
-    print("=" * 60)
+async def crawl_type(session, sem, type_id, n_pages, assessments, seen):
+    """
+    Fetch all n_pages catalog pages of one table concurrently, then append
+    their rows with unseen URLs in page order, stopping at the first failed
+    or empty page.
+    """
+    urls = [f"{CATALOG_BASE}?start={i * 12}&type={type_id}" for i in range(n_pages)]
     
-    session = requests.Session()
-    session.headers.update(HEADERS)
+    async def bounded_fetch(url):
+        async with sem:
+            return await fetch(session, url)
     
-    all_data = {}
+    pages = await asyncio.gather(*[bounded_fetch(url) for url in urls])
     
-    # Crawl Type 1 (Individual Test Solutions) - 32 pages
-    print("\n[1] Individual Test Solutions (type=1)")
-    for i in range(35):
-        start = i * 12
-        url = f"{CATALOG_BASE}?start={start}&type=1"
-        print(f"  Page {i+1} start={start}...", end=" ")
+    for i, html in enumerate(pages):
+        print(f"  Page {i+1} start={i * 12}...", end=" ")
         
-        html = fetch(session, url)
         if not html:
             print("FAILED")
             break
@@ -104,37 +117,38 @@ def main():
             break
         
         for r in rows:
-            all_data[r['url']] = r
-        print(f"{len(rows)} rows, total: {len(all_data)}")
-        time.sleep(0.3)
-    
-    # Crawl Type 2 (Pre-packaged Job Solutions) - 12 pages
-    print("\n[2] Pre-packaged Job Solutions (type=2)")
-    for i in range(15):
-        start = i * 12
-        url = f"{CATALOG_BASE}?start={start}&type=2"
-        print(f"  Page {i+1} start={start}...", end=" ")
-        
-        html = fetch(session, url)
-        if not html:
-            print("FAILED")
-            break
-        
-        rows = parse_rows(html)
-        if not rows:
-            print("empty - done")
-            break
+            if r['url'] not in seen:
+                seen.add(r['url'])
+                assessments.append(r)
+        print(f"{len(rows)} rows, total: {len(assessments)}")
+
+async def crawl():
+    assessments = []
+    seen = set()
+    sem = asyncio.Semaphore(MAX_CONCURRENT_FETCHES)
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_FETCHES, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(headers=HEADERS, connector=connector) as session:
+        # Crawl Type 1 (Individual Test Solutions) - 32 pages
+        print("\n[1] Individual Test Solutions (type=1)")
+        await crawl_type(session, sem, 1, 35, assessments, seen)
         
-        for r in rows:
-            all_data[r['url']] = r
-        print(f"{len(rows)} rows, total: {len(all_data)}")
-        time.sleep(0.3)
+        # Crawl Type 2 (Pre-packaged Job Solutions) - 12 pages
+        print("\n[2] Pre-packaged Job Solutions (type=2)")
+        await crawl_type(session, sem, 2, 15, assessments, seen)
+    return assessments
+
+def main():
+    print("=" * 60)
+    print("SHL Crawler - All Assessments")
+    print("=" * 60)
+    
+    assessments = asyncio.run(crawl())
     
     # Save
-    assessments = list(all_data.values())
     os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        json.dump(assessments, f, indent=2, ensure_ascii=False)
+    with open(OUTPUT_FILE, 'wb') as f:
+        # Same bytes as json.dump(indent=2, ensure_ascii=False), encoded in C
+        f.write(orjson.dumps(assessments, option=orjson.OPT_INDENT_2))
     
     print("\n" + "=" * 60)
     print(f"TOTAL: {len(assessments)} assessments saved to {OUTPUT_FILE}")
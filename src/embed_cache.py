@@ -0,0 +1,123 @@
+"""
+Persistent on-disk cache for query embeddings.
+
+Evaluation scripts embed the same train queries on every run. Vectors are
+keyed by sha1(model_name + '\\x00' + text) and stored in one .npz file per
+model, so later runs only call the embedding model for new texts.
+"""
+import atexit
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+CACHE_DIR = 'cache'
+
+# Caches switched on for this process (model name -> EmbeddingCache)
+_active: Dict[str, 'EmbeddingCache'] = {}
+
+
+def default_cache_path(model_name: str) -> str:
+    """cache/query_emb_<model>.npz - one file per model since dimensions differ."""
+    safe_name = re.sub(r'[^a-z0-9]+', '_', model_name.lower()).strip('_')
+    return os.path.join(CACHE_DIR, f'query_emb_{safe_name}.npz')
+
+
+def cache_key(model_name: str, text: str) -> str:
+    """Content hash identifying one (model, text) embedding."""
+    return hashlib.sha1((model_name + '\x00' + text).encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """Query-embedding cache for one model, backed by a single .npz file."""
+
+    def __init__(self, model_name: str, path: Optional[str] = None):
+        self.model_name = model_name
+        self.path = path or default_cache_path(model_name)
+        self._vectors: Dict[str, np.ndarray] = {}
+        self._dirty = False
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as data:
+                for key, vec in zip(data['keys'], data['vectors']):
+                    self._vectors[str(key)] = vec
+        except Exception as e:
+            print(f"Ignoring unreadable embedding cache {self.path}: {e}")
+            self._vectors = {}
+
+    def __len__(self):
+        return len(self._vectors)
+
+    def get(self, text: str) -> Optional[np.ndarray]:
+        return self._vectors.get(cache_key(self.model_name, text))
+
+    def put(self, text: str, vector) -> None:
+        with self._lock:
+            self._vectors[cache_key(self.model_name, text)] = np.asarray(vector, dtype=np.float32)
+            self._dirty = True
+
+    def get_or_compute(self, texts: List[str], encode_fn: Callable[[List[str]], np.ndarray]) -> np.ndarray:
+        """Return an (N, d) float32 array, calling encode_fn only for uncached texts."""
+        texts = list(texts)
+        missing = list(dict.fromkeys(t for t in texts if self.get(t) is None))
+        if missing:
+            for text, vec in zip(missing, encode_fn(missing)):
+                self.put(text, vec)
+        if not texts:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.stack([self.get(t) for t in texts])
+
+    def save(self) -> None:
+        """Atomically rewrite the .npz file if anything was added."""
+        with self._lock:
+            if not self._dirty or not self._vectors:
+                return
+            keys = np.array(list(self._vectors.keys()))
+            vectors = np.stack(list(self._vectors.values()))
+            self._dirty = False
+        directory = os.path.dirname(self.path) or '.'
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=directory, suffix='.npz.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.savez(f, keys=keys, vectors=vectors)
+            os.replace(tmp, self.path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+
+
+def get_or_compute(
+    texts: List[str],
+    encode_fn: Callable[[List[str]], np.ndarray],
+    path: Optional[str] = None,
+    model_name: str = ''
+) -> np.ndarray:
+    """One-shot helper: load the cache, embed cache misses, write it back."""
+    cache = _active.get(model_name) or EmbeddingCache(model_name, path)
+    vectors = cache.get_or_compute(texts, encode_fn)
+    cache.save()
+    return vectors
+
+
+def enable(model_name: str, path: Optional[str] = None) -> EmbeddingCache:
+    """Turn on the persistent cache for a model for the rest of this process (saved at exit)."""
+    if model_name not in _active:
+        cache = EmbeddingCache(model_name, path)
+        _active[model_name] = cache
+        atexit.register(cache.save)
+    return _active[model_name]
+
+
+def active(model_name: str) -> Optional[EmbeddingCache]:
+    """Return the enabled cache for a model, or None if caching is off."""
+    return _active.get(model_name)
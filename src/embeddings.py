@@ -19,6 +19,7 @@ genai.configure(api_key=api_key)
 
 # FAISS index and metadata storage
 INDEX_FILE = 'data/faiss_index.bin'
+ANN_INDEX_FILE = 'data/faiss_index_ann.bin'  # only written for large catalogs
 METADATA_FILE = 'data/faiss_metadata.pkl'
 
 
@@ -55,6 +56,8 @@ def initialize_vector_db(assessments: List[Dict], force_rebuild: bool = False):
         os.remove(INDEX_FILE)
         if os.path.exists(METADATA_FILE):
             os.remove(METADATA_FILE)
+        if os.path.exists(ANN_INDEX_FILE):
+            os.remove(ANN_INDEX_FILE)
     
     # Generate embeddings
     print("Generating embeddings...")
@@ -147,8 +150,22 @@ def initialize_vector_db(assessments: List[Dict], force_rebuild: bool = False):
     # Add to index
     index.add(embeddings_np)
     
+    # Large catalogs also ship a compressed IVFPQ index (PQ codes, ~1/8 of the
+    # flat size) next to the exact one, so the server does not rebuild an ANN
+    # index at startup and ground-truth checks still have the exact index.
+    # A few hundred vectors are too few to train PQ codebooks and stay flat.
+    try:
+        from src.search_core import maybe_ann_index
+    except ImportError:  # run as `python src/embeddings.py`
+        from search_core import maybe_ann_index
+    ann_index = maybe_ann_index(index, kind='ivfpq')
+    
     # Save index and metadata
     faiss.write_index(index, INDEX_FILE)
+    if ann_index is not index:
+        faiss.write_index(ann_index, ANN_INDEX_FILE)
+    elif os.path.exists(ANN_INDEX_FILE):
+        os.remove(ANN_INDEX_FILE)  # stale from a larger catalog
     with open(METADATA_FILE, 'wb') as f:
         pickle.dump(metadatas, f)
     
@@ -8,6 +8,7 @@ import json
 import faiss
 import numpy as np
 import pickle
+from functools import lru_cache
 from typing import List, Dict
 from tqdm import tqdm
 
@@ -21,6 +22,9 @@ except ImportError:
 # FAISS index and metadata storage (separate from Gemini embeddings)
 INDEX_FILE_ST = 'data/faiss_index_st.bin'
 METADATA_FILE_ST = 'data/faiss_metadata_st.pkl'
+# Raw normalized float32 vectors (N x d), memory-mapped for batched matmul search
+EMBEDDINGS_FILE_ST = 'data/faiss_embeddings_st.f32'
+MODEL_NAME_ST = 'all-MiniLM-L6-v2'
 
 # Initialize model globally for efficiency
 _model = None
@@ -29,8 +33,8 @@ def get_model():
     """Get or initialize the SentenceTransformer model."""
     global _model
     if _model is None and SENTENCE_TRANSFORMERS_AVAILABLE:
-        print("Loading SentenceTransformer model (all-MiniLM-L6-v2)...")
-        _model = SentenceTransformer('all-MiniLM-L6-v2')
+        print(f"Loading SentenceTransformer model ({MODEL_NAME_ST})...")
+        _model = SentenceTransformer(MODEL_NAME_ST)
         print("Model loaded successfully!")
     return _model
 
@@ -128,6 +132,8 @@ def initialize_vector_db_st(assessments: List[Dict], force_rebuild: bool = False
             os.remove(INDEX_FILE_ST)
         if os.path.exists(METADATA_FILE_ST):
             os.remove(METADATA_FILE_ST)
+        if os.path.exists(EMBEDDINGS_FILE_ST):
+            os.remove(EMBEDDINGS_FILE_ST)
     
     # Create document texts
     print("Creating document texts...")
@@ -176,6 +182,8 @@ def initialize_vector_db_st(assessments: List[Dict], force_rebuild: bool = False
     faiss.write_index(index, INDEX_FILE_ST)
     with open(METADATA_FILE_ST, 'wb') as f:
         pickle.dump(metadatas, f)
+    write_embeddings_st(embeddings_normalized)
+    get_vector_db_st.cache_clear()  # drop any earlier (stale or missing) load
     
     print(f"Added {index.ntotal} assessments to SentenceTransformer vector DB")
     print(f"Saved index to {INDEX_FILE_ST} and metadata to {METADATA_FILE_ST}")
@@ -183,8 +191,43 @@ def initialize_vector_db_st(assessments: List[Dict], force_rebuild: bool = False
     return {'index': index, 'metadata': metadatas}
 
 
-def get_vector_db_st():
-    """Load the SentenceTransformer vector database."""
+def write_embeddings_st(embeddings: np.ndarray, path: str = EMBEDDINGS_FILE_ST):
+    """Write the normalized vectors as raw float32 (atomic replace)."""
+    tmp = path + '.tmp'
+    np.ascontiguousarray(embeddings, dtype=np.float32).tofile(tmp)
+    os.replace(tmp, path)
+
+
+def load_embeddings_st(index, path: str = EMBEDDINGS_FILE_ST):
+    """
+    Memory-map the normalized vectors, exporting them from the index first if needed.
+    
+    The mapping is read-only and backed by the OS page cache, so processes
+    (and forked workers) share one copy instead of each holding its own.
+    Returns None if the file cannot be written or mapped.
+    """
+    shape = (index.ntotal, index.d)
+    expected_size = shape[0] * shape[1] * np.dtype(np.float32).itemsize
+    try:
+        if not os.path.exists(path) or os.path.getsize(path) != expected_size:
+            write_embeddings_st(index.reconstruct_n(0, index.ntotal), path)
+        if expected_size == 0:
+            return None
+        return np.memmap(path, dtype=np.float32, mode='r', shape=shape)
+    except (OSError, RuntimeError, ValueError) as e:
+        print(f"Warning: could not memory-map {path}, using the FAISS index only: {e}")
+        return None
+
+
+@lru_cache(maxsize=2)
+def get_vector_db_st(quantize: bool = False):
+    """
+    Load the SentenceTransformer vector database (once per process).
+    
+    The raw vectors are memory-mapped as 'embeddings' for batched search.
+    With quantize=True they are also kept in an 8-bit scalar-quantized
+    FAISS index ('index_int8') and searched instead.
+    """
     if not os.path.exists(INDEX_FILE_ST) or not os.path.exists(METADATA_FILE_ST):
         print(f"SentenceTransformer Vector DB not found. Please run initialize_vector_db_st first.")
         return None
@@ -193,7 +236,15 @@ def get_vector_db_st():
     with open(METADATA_FILE_ST, 'rb') as f:
         metadata = pickle.load(f)
     
-    return {'index': index, 'metadata': metadata}
+    db = {'index': index, 'metadata': metadata}
+    embeddings = load_embeddings_st(index)
+    if embeddings is not None:
+        db['embeddings'] = embeddings
+    if quantize:
+        from src.search_core import build_int8_index
+        vectors = embeddings if embeddings is not None else index.reconstruct_n(0, index.ntotal)
+        db.update({'index_int8': build_int8_index(vectors), 'quantized': True})
+    return db
 
 
 if __name__ == "__main__":
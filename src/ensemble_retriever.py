@@ -10,7 +10,8 @@ Strategies:
 from typing import List, Dict, Optional
 from collections import defaultdict
 from src.advanced_retriever import retrieve_advanced, preprocess_query
-from src.retriever import retrieve_candidates, get_vector_db
+from src.retriever import retrieve_candidates, get_vector_db, metadata_columns, term_mask
+from src.search_core import topk_indices
 import numpy as np
 
 
@@ -25,7 +26,6 @@ def keyword_only_retrieve(
     import faiss
     
     index = vector_db['index']
-    metadata = vector_db['metadata']
     
     # Get basic embedding for broad search
     query_embedding = get_query_embedding(query)
@@ -42,104 +42,49 @@ def keyword_only_retrieve(
     skills = set(query_info['skills'])
     roles = set(query_info['roles'])
     
-    candidates = []
-    for i, idx in enumerate(indices[0]):
-        if idx >= len(metadata):
-            continue
-        
-        meta = metadata[idx]
-        name_lower = meta['name'].lower()
-        desc_lower = (meta.get('description', '') or '').lower()
-        
-        # Pure keyword score
-        keyword_score = 0.0
-        
-        # Name matches (very strong)
-        for skill in skills:
-            if skill in name_lower:
-                keyword_score += 0.30
-        
-        for role in roles:
-            if role in name_lower:
-                keyword_score += 0.25
-        
-        # Description matches
-        for skill in skills:
-            if skill in desc_lower:
-                keyword_score += 0.10
-        
-        # Exact phrase matches
-        for skill in skills:
-            if skill in query_lower and skill in name_lower:
-                keyword_score += 0.15
-        
-        if keyword_score > 0:
-            candidates.append({
-                'url': meta['url'],
-                'alternate_urls': meta.get('alternate_urls', []),
-                'name': meta['name'],
-                'description': meta.get('description', ''),
-                'duration': meta.get('duration', 0) or 0,
-                'remote_support': meta.get('remote_support', 'No'),
-                'adaptive_support': meta.get('adaptive_support', 'No'),
-                'test_type': meta.get('test_type', []),
-                'keyword_score': keyword_score,
-                'distance': keyword_score
-            })
-    
-    # Sort by keyword score
-    candidates.sort(key=lambda x: x['keyword_score'], reverse=True)
-    return candidates[:top_k]
-
-
-def ensemble_retrieve(
-    query: str,
-    vector_db: Dict,
-    top_k: int = 10,
-    use_llm_rerank: bool = True,
-    include_st: bool = True
-) -> List[Dict]:
-    """
-    Ensemble retrieval combining multiple strategies with voting.
+    # Score the hits over the metadata columns (see src.retriever.MetadataColumns)
+    columns = metadata_columns(vector_db)
+    rows = indices[0][(indices[0] >= 0) & (indices[0] < len(columns.records))]
     
-    Args:
-        query: User query
-        vector_db: Vector database (Gemini-based)
-        top_k: Number of results to return
-        use_llm_rerank: Whether to use LLM re-ranking
-        include_st: Whether to include SentenceTransformer strategy (best performer)
+    # Pure keyword score
+    keyword_scores = np.zeros(len(rows))
     
-    Returns:
-        Ensemble-ranked list of candidates
-    """
-    query_info = preprocess_query(query)
-    
-    # Strategy 1: Advanced hybrid retrieval (Gemini)
-    advanced_results = retrieve_advanced(query, vector_db, top_k=top_k * 2, use_llm_rerank=False)
+    # Name matches (very strong)
+    for skill in skills:
+        keyword_scores += np.where(term_mask(columns, 'name', skill)[rows], 0.30, 0.0)
     
-    # Strategy 2: SentenceTransformer with keyword boost (Best: 33.33% recall)
-    st_results = []
-    if include_st:
-        try:
-            from src.retriever_st import retrieve_with_boost_st, get_vector_db_st
-            st_db = get_vector_db_st()
-            if st_db:
-                st_results = retrieve_with_boost_st(query, st_db, top_k=top_k * 2)
-        except Exception as e:
-            print(f"Warning: SentenceTransformer not available: {e}")
+    for role in roles:
+        keyword_scores += np.where(term_mask(columns, 'name', role)[rows], 0.25, 0.0)
     
-    # Strategy 3: Pure semantic retrieval
-    semantic_results = retrieve_candidates(query, vector_db, top_k=top_k * 2)
+    # Description matches
+    for skill in skills:
+        keyword_scores += np.where(term_mask(columns, 'desc', skill)[rows], 0.10, 0.0)
     
-    # Strategy 4: Keyword-only retrieval
-    keyword_results = keyword_only_retrieve(query, query_info, vector_db, top_k=top_k * 2)
+    # Exact phrase matches
+    for skill in skills:
+        if skill in query_lower:
+            keyword_scores += np.where(term_mask(columns, 'name', skill)[rows], 0.15, 0.0)
     
-    # Strategy 5: Duration-filtered (if duration constraint exists)
-    duration_results = []
-    if query_info.get('duration'):
-        filtered = [r for r in advanced_results if r.get('duration', 0) <= query_info['duration'] * 1.2]
-        duration_results = filtered[:top_k]
+    # Keep keyword hits only, best first; build dicts for the top_k survivors
+    matched = np.flatnonzero(keyword_scores > 0)
+    candidates = []
+    for j in matched[topk_indices(keyword_scores[matched], top_k)]:
+        keyword_score = float(keyword_scores[j])
+        candidates.append(dict(columns.records[rows[j]], keyword_score=keyword_score, distance=keyword_score))
+    return candidates
+
+
+def ensemble_combine(
+    advanced_results: List[Dict],
+    st_results: List[Dict],
+    semantic_results: List[Dict],
+    keyword_results: List[Dict]
+) -> List[Dict]:
+    """
+    Fuse per-strategy result lists into one ensemble ranking (no LLM step).
     
+    Candidates are copied, so the input lists can be reused for other combinations.
+    """
     # Collect all unique candidates with scores from each strategy
     candidate_scores = defaultdict(lambda: {
         'candidate': None,
@@ -150,7 +95,7 @@ def ensemble_retrieve(
     # Score from advanced retrieval (Gemini)
     for rank, cand in enumerate(advanced_results):
         url = cand['url']
-        candidate_scores[url]['candidate'] = cand
+        candidate_scores[url]['candidate'] = dict(cand)
         candidate_scores[url]['scores'].append(cand.get('combined_score', 0))
         candidate_scores[url]['ranks'].append(rank + 1)
     
@@ -158,7 +103,7 @@ def ensemble_retrieve(
     for rank, cand in enumerate(st_results):
         url = cand['url']
         if url not in candidate_scores:
-            candidate_scores[url]['candidate'] = cand
+            candidate_scores[url]['candidate'] = dict(cand)
         # Use combined score (semantic + boost) from ST
         st_score = cand.get('score', cand.get('semantic_score', 0))
         candidate_scores[url]['scores'].append(st_score)
@@ -168,7 +113,7 @@ def ensemble_retrieve(
     for rank, cand in enumerate(semantic_results):
         url = cand['url']
         if url not in candidate_scores:
-            candidate_scores[url]['candidate'] = cand
+            candidate_scores[url]['candidate'] = dict(cand)
         candidate_scores[url]['scores'].append(cand.get('distance', 0))
         candidate_scores[url]['ranks'].append(rank + 1)
     
@@ -176,7 +121,7 @@ def ensemble_retrieve(
     for rank, cand in enumerate(keyword_results):
         url = cand['url']
         if url not in candidate_scores:
-            candidate_scores[url]['candidate'] = cand
+            candidate_scores[url]['candidate'] = dict(cand)
         candidate_scores[url]['scores'].append(cand.get('keyword_score', 0))
         candidate_scores[url]['ranks'].append(rank + 1)
     
@@ -210,6 +155,53 @@ def ensemble_retrieve(
     # Sort by ensemble score
     ensemble_candidates.sort(key=lambda x: x.get('ensemble_score', 0), reverse=True)
     
+    return ensemble_candidates
+
+
+def ensemble_retrieve(
+    query: str,
+    vector_db: Dict,
+    top_k: int = 10,
+    use_llm_rerank: bool = True,
+    include_st: bool = True
+) -> List[Dict]:
+    """
+    Ensemble retrieval combining multiple strategies with voting.
+    
+    Args:
+        query: User query
+        vector_db: Vector database (Gemini-based)
+        top_k: Number of results to return
+        use_llm_rerank: Whether to use LLM re-ranking
+        include_st: Whether to include SentenceTransformer strategy (best performer)
+    
+    Returns:
+        Ensemble-ranked list of candidates
+    """
+    query_info = preprocess_query(query)
+    
+    # Strategy 1: Advanced hybrid retrieval (Gemini)
+    advanced_results = retrieve_advanced(query, vector_db, top_k=top_k * 2, use_llm_rerank=False)
+    
+    # Strategy 2: SentenceTransformer with keyword boost (Best: 33.33% recall)
+    st_results = []
+    if include_st:
+        try:
+            from src.retriever_st import retrieve_with_boost_st, get_vector_db_st
+            st_db = get_vector_db_st()
+            if st_db:
+                st_results = retrieve_with_boost_st(query, st_db, top_k=top_k * 2)
+        except Exception as e:
+            print(f"Warning: SentenceTransformer not available: {e}")
+    
+    # Strategy 3: Pure semantic retrieval
+    semantic_results = retrieve_candidates(query, vector_db, top_k=top_k * 2)
+    
+    # Strategy 4: Keyword-only retrieval
+    keyword_results = keyword_only_retrieve(query, query_info, vector_db, top_k=top_k * 2)
+    
+    ensemble_candidates = ensemble_combine(advanced_results, st_results, semantic_results, keyword_results)
+    
     # Apply LLM re-ranking if requested
     if use_llm_rerank and len(ensemble_candidates) > 0:
         try:
@@ -0,0 +1,101 @@
+"""
+Retrieval strategies for the unified evaluate.py runner.
+
+Each strategy runs every train query at once and returns query -> results,
+so batched encoders and shared components can be used. Strategies receive
+the already-loaded Gemini and SentenceTransformer DBs; nothing here loads a
+model or index itself.
+"""
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+from src.eval_utils import DEFAULT_WORKERS, map_queries
+
+# query -> retrieval components (see src.pipeline), shared by gemini/ensemble*
+_components: Dict[str, Dict] = {}
+
+
+class Strategy(NamedTuple):
+    label: str
+    run: Callable[..., Dict[str, List[Dict]]]
+    needs_gemini: bool = False
+    needs_st: bool = False
+
+
+def _shared_components(queries: List[str], vector_db: Dict, st_db: Optional[Dict], workers: int) -> Dict[str, Dict]:
+    """Retrieval components per query, computed once per process."""
+    from src.pipeline import retrieve_components
+    
+    todo = [q for q in queries if q not in _components]
+    if todo:
+        all_components = map_queries(
+            lambda q: retrieve_components(q, vector_db, top_k=10, include_st=st_db is not None),
+            todo, workers, catch_errors=True, desc='Components'
+        )
+        for query, components in zip(todo, all_components):
+            if components is not None:
+                _components[query] = components
+    return _components
+
+
+def _compose(queries, vector_db, st_db, workers, build) -> Dict[str, List[Dict]]:
+    components = _shared_components(queries, vector_db, st_db, workers)
+    return {q: build(components[q]) if q in components else [] for q in queries}
+
+
+def run_st(queries, vector_db, st_db, workers=DEFAULT_WORKERS, boost=False):
+    from src.retriever_st import retrieve_batch
+    return dict(zip(queries, retrieve_batch(queries, st_db, top_k=10, boost=boost)))
+
+
+def run_st_boost(queries, vector_db, st_db, workers=DEFAULT_WORKERS):
+    return run_st(queries, vector_db, st_db, workers, boost=True)
+
+
+def run_gemini(queries, vector_db, st_db, workers=DEFAULT_WORKERS):
+    from src.pipeline import advanced_from_components
+    return _compose(queries, vector_db, st_db, workers,
+                    lambda c: advanced_from_components(c, top_k=10))
+
+
+def run_ensemble(queries, vector_db, st_db, workers=DEFAULT_WORKERS, include_st=True):
+    from src.pipeline import ensemble_from_components
+    include_st = include_st and st_db is not None
+    return _compose(queries, vector_db, st_db, workers,
+                    lambda c: ensemble_from_components(c, top_k=10, include_st=include_st))
+
+
+def run_ensemble_no_st(queries, vector_db, st_db, workers=DEFAULT_WORKERS):
+    return run_ensemble(queries, vector_db, st_db, workers, include_st=False)
+
+
+def run_rerank(queries, vector_db, st_db, workers=DEFAULT_WORKERS):
+    from src.retriever import retrieve_candidates_batch
+    from src.reranker import rerank_batch
+    candidates = retrieve_candidates_batch(queries, vector_db, top_k=25)
+    return dict(zip(queries, rerank_batch(list(zip(queries, candidates)), top_k=10)))
+
+
+def _run_semantic(queries, vector_db, workers, top_k):
+    from src.retriever import retrieve_candidates_batch
+    results = retrieve_candidates_batch(queries, vector_db, top_k=top_k)
+    return {q: r[:10] for q, r in zip(queries, results)}
+
+
+def run_topk(queries, vector_db, st_db, workers=DEFAULT_WORKERS):
+    return _run_semantic(queries, vector_db, workers, top_k=30)
+
+
+def run_direct(queries, vector_db, st_db, workers=DEFAULT_WORKERS):
+    return _run_semantic(queries, vector_db, workers, top_k=15)
+
+
+STRATEGIES: Dict[str, Strategy] = {
+    'st': Strategy("SentenceTransformer (Simple)", run_st, needs_st=True),
+    'st_boost': Strategy("SentenceTransformer (Keyword Boost)", run_st_boost, needs_st=True),
+    'gemini': Strategy("Gemini Advanced (No LLM)", run_gemini, needs_gemini=True),
+    'ensemble': Strategy("Ensemble (ST + Gemini)", run_ensemble, needs_gemini=True, needs_st=True),
+    'ensemble_no_st': Strategy("Ensemble (Gemini Only)", run_ensemble_no_st, needs_gemini=True),
+    'rerank': Strategy("Semantic top 25 + LLM Re-ranking", run_rerank, needs_gemini=True),
+    'topk': Strategy("Semantic top_k=30, first 10", run_topk, needs_gemini=True),
+    'direct': Strategy("Semantic top_k=15, first 10", run_direct, needs_gemini=True),
+}
@@ -0,0 +1,173 @@
+"""
+Shared helpers for the evaluation scripts.
+"""
+import argparse
+import heapq
+from concurrent.futures import ThreadPoolExecutor
+from typing import AbstractSet, Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from src.url_utils import normalize_url_to_slug
+
+# Retrieval is dominated by Gemini round-trips, so threads overlap the waits
+DEFAULT_WORKERS = 16
+
+
+def load_train(path: str = 'data/train.csv') -> Dict[str, FrozenSet[str]]:
+    """
+    Load the labelled train set as query -> frozenset of relevant slugs.
+    
+    Queries keep their first-appearance order in the CSV. The slug sets are
+    read-only for the rest of the run, so they are frozen once here.
+    """
+    df = pd.read_csv(path, usecols=['Query', 'Assessment_url'], dtype=str, keep_default_na=False)
+    df['Query'] = df['Query'].str.strip()
+    df['slug'] = df['Assessment_url'].str.strip().map(normalize_url_to_slug)
+    return {query: frozenset(slugs) for query, slugs in df.groupby('Query', sort=False)['slug']}
+
+
+def parse_eval_args(
+    description: Optional[str] = None,
+    add_arguments: Optional[Callable[[argparse.ArgumentParser], None]] = None
+) -> argparse.Namespace:
+    """Common command-line flags for the evaluate_* scripts (add_arguments adds script-specific ones)."""
+    parser = argparse.ArgumentParser(description=description, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help=f'Concurrent retrieval threads, 1 = serial (default: {DEFAULT_WORKERS})')
+    if add_arguments is not None:
+        add_arguments(parser)
+    return parser.parse_args()
+
+
+def map_queries(
+    func: Callable[[str], object],
+    queries: Iterable[str],
+    workers: int = DEFAULT_WORKERS,
+    catch_errors: bool = False,
+    desc: str = 'Retrieving'
+) -> List[object]:
+    """
+    Run func(query) for every query on a thread pool.
+    
+    Results come back in query order. With catch_errors, a failing query is
+    reported and yields None instead of aborting the whole run.
+    """
+    queries = list(queries)
+    
+    def _call(query):
+        if not catch_errors:
+            return func(query)
+        try:
+            return func(query)
+        except Exception as e:
+            print(f"Error processing query '{query[:50]}...': {e}")
+            return None
+    
+    if workers <= 1:
+        return [_call(q) for q in tqdm(queries, desc=desc, leave=False)]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(tqdm(executor.map(_call, queries), total=len(queries), desc=desc, leave=False))
+
+
+def build_slug_vocab(train_queries: Dict[str, AbstractSet[str]]) -> Dict[str, int]:
+    """Assign a stable int id to every relevant slug in the train set."""
+    vocab = {}
+    for slugs in train_queries.values():
+        for slug in sorted(slugs):
+            vocab.setdefault(slug, len(vocab))
+    return vocab
+
+
+def slugs_to_ids(slugs: Iterable[str], vocab: Dict[str, int]) -> np.ndarray:
+    """Map slugs to a sorted, unique int32 id array (slugs outside the vocab are skipped)."""
+    ids = np.fromiter((vocab[s] for s in slugs if s in vocab), dtype=np.int32)
+    return np.unique(ids)
+
+
+class RecallScorer:
+    """
+    Per-query recall against the train set using integer slug ids.
+    
+    Relevant slugs are encoded once as sorted int32 arrays; each scoring call
+    maps the recommended slugs through the same vocab and intersects arrays.
+    """
+    
+    def __init__(self, train_queries: Dict[str, AbstractSet[str]]):
+        self.vocab = build_slug_vocab(train_queries)
+        self.relevant_ids = {q: slugs_to_ids(slugs, self.vocab) for q, slugs in train_queries.items()}
+    
+    def score(self, query: str, recommended_slugs: Iterable[str]) -> Tuple[int, float]:
+        """Return (hits, recall) for one query's recommended slugs."""
+        relevant = self.relevant_ids.get(query)
+        if relevant is None or relevant.size == 0:
+            return 0, 0.0
+        recommended = slugs_to_ids(recommended_slugs, self.vocab)
+        hits = np.intersect1d(relevant, recommended, assume_unique=True).size
+        return hits, hits / relevant.size
+
+
+class RecallTracker:
+    """
+    Running mean recall plus the `keep` lowest-recall queries for display.
+    
+    Memory stays constant in the number of queries: only a bounded heap of the
+    worst entries is kept (ties keep the earlier query).
+    """
+    
+    def __init__(self, keep: int = 20):
+        self.keep = keep
+        self.total = 0.0
+        self.count = 0
+        self._worst = []  # heap of (-recall, -seq, item); root = best of the kept
+    
+    def add(self, recall: float, item: Any = None) -> None:
+        self.total += recall
+        self.count += 1
+        if self.keep <= 0:
+            return
+        entry = (-recall, -self.count, item)
+        if len(self._worst) < self.keep:
+            heapq.heappush(self._worst, entry)
+        else:
+            heapq.heappushpop(self._worst, entry)
+    
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count > 0 else 0.0
+    
+    def worst(self) -> List[Any]:
+        """Kept items, lowest recall first."""
+        return [item for _, _, item in sorted(self._worst, key=lambda e: (-e[0], -e[1]))]
+
+
+def compute_recalls(
+    train_queries: Dict[str, AbstractSet[str]],
+    recommended: Dict[str, Iterable[str]]
+) -> pd.Series:
+    """
+    Compute per-query recall for all queries in one vectorized pass.
+    
+    Args:
+        train_queries: Query -> set of relevant slugs
+        recommended: Query -> recommended slugs (all URL variants)
+        
+    Returns:
+        Series of recall values indexed by query, in train_queries order
+    """
+    relevant = pd.DataFrame(
+        [(q, slug) for q, slugs in train_queries.items() for slug in slugs],
+        columns=['query', 'slug']
+    )
+    recs = pd.DataFrame(
+        [(q, slug) for q, slugs in recommended.items() for slug in set(slugs)],
+        columns=['query', 'slug']
+    )
+    
+    totals = relevant.groupby('query').size()
+    hits = relevant.merge(recs, on=['query', 'slug']).groupby('query').size()
+    recalls = hits.reindex(totals.index, fill_value=0) / totals
+    
+    return recalls.reindex(list(train_queries), fill_value=0.0)
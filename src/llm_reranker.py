@@ -4,10 +4,11 @@ Uses Gemini API for intelligent re-ranking.
 """
 import google.generativeai as genai
 import os
-import json
+import orjson
 import re
 from typing import List, Dict
 from dotenv import load_dotenv
+from src.utils import GEMINI_SLOTS
 
 load_dotenv()
 
@@ -91,13 +92,14 @@ Return exactly {top_k} URLs, ranked from most relevant to least relevant.
         for model_name in models_to_try:
             try:
                 model = genai.GenerativeModel(model_name)
-                response = model.generate_content(
-                    prompt,
-                    generation_config={
-                        "temperature": 0.1,  # Low temperature for consistent ranking
-                        "max_output_tokens": 2000,
-                    }
-                )
+                with GEMINI_SLOTS:
+                    response = model.generate_content(
+                        prompt,
+                        generation_config={
+                            "temperature": 0.1,  # Low temperature for consistent ranking
+                            "max_output_tokens": 2000,
+                        }
+                    )
                 
                 response_text = response.text.strip()
                 
@@ -115,10 +117,10 @@ Return exactly {top_k} URLs, ranked from most relevant to least relevant.
                 
                 # Try to parse JSON
                 try:
-                    ranked_urls = json.loads(response_text)
+                    ranked_urls = orjson.loads(response_text)
                     if isinstance(ranked_urls, list) and len(ranked_urls) > 0:
                         break  # Success!
-                except json.JSONDecodeError:
+                except orjson.JSONDecodeError:
                     # Try to extract URLs from text
                     url_pattern = r'https?://[^\s,\]]+'
                     urls_found = re.findall(url_pattern, response_text)
@@ -0,0 +1,66 @@
+"""
+Shared retrieval components for evaluating several strategies at once.
+
+Gemini Advanced and both ensemble variants are built from the same
+primitives (hybrid candidates, ST, semantic and keyword results). Computing
+those once per query and composing them locally avoids repeating the
+embedding and search work for every strategy.
+"""
+from typing import Dict, List
+
+from src.advanced_retriever import preprocess_query, expand_query, hybrid_retrieve, rerank_candidates
+from src.ensemble_retriever import keyword_only_retrieve, ensemble_combine
+from src.retriever import retrieve_candidates
+
+
+def retrieve_components(
+    query: str,
+    vector_db: Dict,
+    top_k: int = 10,
+    include_st: bool = True
+) -> Dict:
+    """
+    Run each retrieval primitive once for a query.
+    
+    Returns a dict with 'query', 'query_info', 'vector_db', 'hybrid'
+    (pre-rerank advanced candidates), 'st', 'semantic' and 'keyword' result
+    lists, sized for strategies that return top_k results.
+    """
+    query_info = preprocess_query(query)
+    expanded_query = expand_query(query_info)
+    
+    st_results = []
+    if include_st:
+        try:
+            from src.retriever_st import retrieve_with_boost_st, get_vector_db_st
+            st_db = get_vector_db_st()
+            if st_db:
+                st_results = retrieve_with_boost_st(query, st_db, top_k=top_k * 2)
+        except Exception as e:
+            print(f"Warning: SentenceTransformer not available: {e}")
+    
+    return {
+        'query': query,
+        'query_info': query_info,
+        'vector_db': vector_db,
+        'hybrid': hybrid_retrieve(expanded_query, query_info, vector_db, top_k=100),
+        'st': st_results,
+        'semantic': retrieve_candidates(query, vector_db, top_k=top_k * 2),
+        'keyword': keyword_only_retrieve(query, query_info, vector_db, top_k=top_k * 2),
+    }
+
+
+def advanced_from_components(components: Dict, top_k: int = 10) -> List[Dict]:
+    """Same result as retrieve_advanced(query, db, top_k, use_llm_rerank=False)."""
+    # Re-ranking mutates candidate scores, so work on copies
+    candidates = [dict(c) for c in components['hybrid']]
+    return rerank_candidates(components['query'], components['query_info'], candidates, top_k,
+                             vector_db=components.get('vector_db'))
+
+
+def ensemble_from_components(components: Dict, top_k: int = 10, include_st: bool = True) -> List[Dict]:
+    """Same result as ensemble_retrieve(query, db, top_k, use_llm_rerank=False, include_st)."""
+    advanced_results = advanced_from_components(components, top_k=top_k * 2)
+    st_results = components['st'] if include_st else []
+    combined = ensemble_combine(advanced_results, st_results, components['semantic'], components['keyword'])
+    return combined[:top_k]
@@ -1,8 +1,11 @@
 import google.generativeai as genai
 import os
-import json
-from typing import List, Dict
+import orjson
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple
 from dotenv import load_dotenv
+from src.utils import GEMINI_SLOTS
 
 load_dotenv()
 
@@ -11,19 +14,30 @@ if api_key:
     genai.configure(api_key=api_key)
 
 
-def rerank_assessments(query: str, candidates: List[Dict], top_k: int = 10) -> List[Dict]:
-    """Use LLM to re-rank candidate assessments."""
-    
-    if not candidates:
-        return []
-    
-    # Limit candidates for prompt (to avoid token limits)
-    max_candidates_for_prompt = 20
-    candidates_for_prompt = candidates[:max_candidates_for_prompt]
-    
-    # Format candidates for prompt
+# Models tried in order (user's API key: gemini-2.5-flash)
+MODEL_NAMES = ['gemini-2.5-flash', 'gemini-2.0-flash-lite', 'gemini-flash-lite-latest', 'gemini-2.0-flash']
+
+# Candidates shown to the LLM per query (to avoid token limits)
+MAX_CANDIDATES_FOR_PROMPT = 20
+
+# Queries packed into one rerank_batch prompt
+RERANK_BATCH_SIZE = 5
+
+
+def _get_model():
+    """First Gemini model from MODEL_NAMES that can be constructed."""
+    for model_name in MODEL_NAMES:
+        try:
+            return genai.GenerativeModel(model_name)
+        except Exception:
+            continue
+    raise ValueError("No working Gemini model found")
+
+
+def _format_candidates(candidates: List[Dict]) -> str:
+    """Numbered candidate list for the rerank prompts."""
     candidates_text = ""
-    for i, cand in enumerate(candidates_for_prompt, 1):
+    for i, cand in enumerate(candidates[:MAX_CANDIDATES_FOR_PROMPT], 1):
         candidates_text += f"{i}. {cand['name']}\n"
         desc = cand.get('description', '')[:200] if cand.get('description') else 'No description'
         candidates_text += f"   Description: {desc}...\n"
@@ -32,6 +46,55 @@ def rerank_assessments(query: str, candidates: List[Dict], top_k: int = 10) -> L
         candidates_text += f"   Test Type: {test_types}\n"
         duration = cand.get('duration', 0) or 0
         candidates_text += f"   Duration: {duration} mins\n\n"
+    return candidates_text
+
+
+def _strip_code_fences(response_text: str) -> str:
+    """Remove markdown code blocks around a JSON reply."""
+    if '```json' in response_text:
+        return response_text.split('```json')[1].split('```')[0].strip()
+    if '```' in response_text:
+        # Try to extract JSON from code block
+        for part in response_text.split('```'):
+            part = part.strip()
+            if part.startswith('[') or part.startswith('{'):
+                return part
+    return response_text
+
+
+def _apply_ranking(ranked_urls, candidates: List[Dict], top_k: int) -> List[Dict]:
+    """Map LLM-ranked URLs back to candidates, filling up with the originals."""
+    if not isinstance(ranked_urls, list):
+        ranked_urls = []
+    
+    url_to_candidate = {cand['url']: cand for cand in candidates}
+    ranked_candidates = []
+    seen_urls = set()
+    
+    for url in ranked_urls:
+        if isinstance(url, str) and url in url_to_candidate and url not in seen_urls:
+            ranked_candidates.append(url_to_candidate[url])
+            seen_urls.add(url)
+    
+    # If LLM didn't return enough, fill with remaining candidates
+    for cand in candidates:
+        if cand['url'] not in seen_urls and len(ranked_candidates) < top_k:
+            ranked_candidates.append(cand)
+            seen_urls.add(cand['url'])
+    
+    return ranked_candidates[:top_k]
+
+
+def _fallback_ranking(candidates: List[Dict], top_k: int) -> List[Dict]:
+    """Original candidates sorted by distance (most similar first)."""
+    return sorted(candidates, key=lambda x: x.get('distance', 1.0))[:top_k]
+
+
+def rerank_assessments(query: str, candidates: List[Dict], top_k: int = 10) -> List[Dict]:
+    """Use LLM to re-rank candidate assessments."""
+    
+    if not candidates:
+        return []
     
     prompt = f"""You are an SHL assessment recommendation assistant.
 Given the following user query and candidate assessments, rank them by relevance.
@@ -40,74 +103,98 @@ Return ONLY a JSON array of URLs in descending relevance order (most relevant fi
 User Query: {query}
 
 Candidate Assessments:
-{candidates_text}
+{_format_candidates(candidates)}
 
 Output format: ["url1", "url2", "url3", ...]
 Return exactly {top_k} URLs, ranked from most relevant to least relevant.
 """
     
     try:
-        # Try gemini-2.5-flash with fallback options (user's API key: gemini-2.5-flash)
-        model_names = ['gemini-2.5-flash', 'gemini-2.0-flash-lite', 'gemini-flash-lite-latest', 'gemini-2.0-flash']
-        model = None
-        for model_name in model_names:
-            try:
-                model = genai.GenerativeModel(model_name)
-                break
-            except Exception:
-                continue
-        if model is None:
-            raise ValueError("No working Gemini model found")
-        response = model.generate_content(prompt)
-        
-        # Parse JSON response
-        response_text = response.text.strip()
+        model = _get_model()
+        with GEMINI_SLOTS:
+            response = model.generate_content(prompt)
         
-        # Remove markdown code blocks if present
-        if '```json' in response_text:
-            response_text = response_text.split('```json')[1].split('```')[0].strip()
-        elif '```' in response_text:
-            # Try to extract JSON from code block
-            parts = response_text.split('```')
-            for part in parts:
-                part = part.strip()
-                if part.startswith('[') or part.startswith('{'):
-                    response_text = part
-                    break
+        response_text = _strip_code_fences(response.text.strip())
         
         # Try to parse JSON
         try:
-            ranked_urls = json.loads(response_text)
-        except json.JSONDecodeError:
+            ranked_urls = orjson.loads(response_text)
+        except orjson.JSONDecodeError:
             # Try to extract URLs from text
-            import re
             url_pattern = r'https?://[^\s,\]]+'
             ranked_urls = re.findall(url_pattern, response_text)
         
-        if not isinstance(ranked_urls, list):
-            ranked_urls = []
-        
-        # Map URLs back to full candidate objects
-        url_to_candidate = {cand['url']: cand for cand in candidates}
-        ranked_candidates = []
-        seen_urls = set()
-        
-        for url in ranked_urls:
-            if url in url_to_candidate and url not in seen_urls:
-                ranked_candidates.append(url_to_candidate[url])
-                seen_urls.add(url)
-        
-        # If LLM didn't return enough, fill with remaining candidates
-        for cand in candidates:
-            if cand['url'] not in seen_urls and len(ranked_candidates) < top_k:
-                ranked_candidates.append(cand)
-                seen_urls.add(cand['url'])
-        
-        return ranked_candidates[:top_k]
+        return _apply_ranking(ranked_urls, candidates, top_k)
         
     except Exception as e:
         print(f"Error in re-ranking: {e}")
-        # Fallback: return original candidates sorted by distance (most similar first)
-        sorted_candidates = sorted(candidates, key=lambda x: x.get('distance', 1.0))
-        return sorted_candidates[:top_k]
+        return _fallback_ranking(candidates, top_k)
 
+
+def _rerank_group(pairs: List[Tuple[str, List[Dict]]], top_k: int) -> List[List[Dict]]:
+    """Rerank several queries with a single prompt; falls back to one call per query."""
+    if len(pairs) == 1:
+        return [rerank_assessments(pairs[0][0], pairs[0][1], top_k=top_k)]
+    
+    sections = ""
+    for i, (query, candidates) in enumerate(pairs, 1):
+        sections += f"### Query {i}\nUser Query: {query}\n\nCandidate Assessments:\n{_format_candidates(candidates)}\n"
+    
+    prompt = f"""You are an SHL assessment recommendation assistant.
+For EACH of the {len(pairs)} user queries below, rank that query's candidate assessments by relevance.
+Only rank a query's own candidates.
+Return ONLY a JSON object mapping the query number to a JSON array of URLs in descending relevance order (most relevant first).
+
+{sections}
+Output format: {{"1": ["url1", "url2", ...], "2": ["url1", "url2", ...], ...}}
+Return exactly {top_k} URLs per query, ranked from most relevant to least relevant.
+"""
+    
+    try:
+        model = _get_model()
+        with GEMINI_SLOTS:
+            response = model.generate_content(
+                prompt,
+                generation_config={"response_mime_type": "application/json"}
+            )
+        ranked_by_query = orjson.loads(_strip_code_fences(response.text.strip()))
+        if not isinstance(ranked_by_query, dict):
+            raise ValueError("Batched rerank reply is not a JSON object")
+    except Exception as e:
+        print(f"Error in batched re-ranking ({len(pairs)} queries), reranking one by one: {e}")
+        return [rerank_assessments(query, candidates, top_k=top_k) for query, candidates in pairs]
+    
+    results = []
+    for i, (query, candidates) in enumerate(pairs, 1):
+        ranked_urls = ranked_by_query.get(str(i))
+        if not candidates:
+            results.append([])
+        elif isinstance(ranked_urls, list) and ranked_urls:
+            results.append(_apply_ranking(ranked_urls, candidates, top_k))
+        else:
+            # Query missing from the batched reply
+            results.append(rerank_assessments(query, candidates, top_k=top_k))
+    return results
+
+
+def rerank_batch(
+    query_cand_pairs: List[Tuple[str, List[Dict]]],
+    top_k: int = 10,
+    batch_size: int = RERANK_BATCH_SIZE,
+    workers: int = 4
+) -> List[List[Dict]]:
+    """
+    Re-rank many (query, candidates) pairs with batched LLM requests.
+    
+    Pairs are packed batch_size at a time into one JSON-per-query prompt and
+    the prompts are sent concurrently. Results are returned in input order,
+    with the same fallbacks as rerank_assessments.
+    """
+    pairs = list(query_cand_pairs)
+    batch_size = max(1, batch_size)
+    groups = [pairs[i:i + batch_size] for i in range(0, len(pairs), batch_size)]
+    
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        group_results = list(executor.map(lambda group: _rerank_group(group, top_k), groups))
+    
+    return [ranked for group in group_results for ranked in group]
@@ -1,10 +1,15 @@
-from typing import List, Dict, Optional
+from functools import lru_cache
+from typing import FrozenSet, List, Dict, NamedTuple, Optional
 import faiss
 import numpy as np
 import pickle
 import google.generativeai as genai
 import os
 from dotenv import load_dotenv
+from src import embed_cache
+from src.search_core import maybe_ann_index, search_batch, topk_indices
+from src.url_utils import get_all_url_variants
+from src.utils import GEMINI_SLOTS
 
 load_dotenv()
 
@@ -14,36 +19,171 @@ if api_key:
 
 # FAISS index and metadata storage
 INDEX_FILE = 'data/faiss_index.bin'
+ANN_INDEX_FILE = 'data/faiss_index_ann.bin'  # written by embeddings.py for large catalogs
 METADATA_FILE = 'data/faiss_metadata.pkl'
+EMBEDDING_MODEL = "models/text-embedding-004"
+
+# Memory-map the index file rather than copying it onto the heap; the zero-copy
+# IFC flag (faiss >= 1.10) also maps flat-index vectors
+INDEX_MMAP_FLAG = getattr(faiss, 'IO_FLAG_MMAP_IFC', faiss.IO_FLAG_MMAP)
+
+
+def enable_query_cache(path: Optional[str] = None):
+    """Persist Gemini query embeddings across runs (used by the evaluation scripts)."""
+    return embed_cache.enable(EMBEDDING_MODEL, path)
 
 
 def get_query_embedding(query: str) -> List[float]:
     """Get embedding for query using Gemini."""
+    cache = embed_cache.active(EMBEDDING_MODEL)
+    if cache is not None:
+        cached = cache.get(query)
+        if cached is not None:
+            return cached.tolist()
     try:
-        result = genai.embed_content(
-            model="models/text-embedding-004",
-            content=query,
-            task_type="retrieval_query"
-        )
+        with GEMINI_SLOTS:
+            result = genai.embed_content(
+                model=EMBEDDING_MODEL,
+                content=query,
+                task_type="retrieval_query"
+            )
+        if cache is not None:
+            cache.put(query, result['embedding'])
         return result['embedding']
     except Exception as e:
         print(f"Error getting query embedding: {e}")
         return None
 
 
+def get_query_embeddings(queries: List[str]) -> Optional[List[List[float]]]:
+    """Get embeddings for several queries with a single Gemini call."""
+    if not queries:
+        return []
+    
+    def _embed(texts):
+        with GEMINI_SLOTS:
+            result = genai.embed_content(
+                model=EMBEDDING_MODEL,
+                content=list(texts),
+                task_type="retrieval_query"
+            )
+        return result['embedding']
+    
+    try:
+        cache = embed_cache.active(EMBEDDING_MODEL)
+        if cache is not None:
+            return cache.get_or_compute(queries, _embed).tolist()
+        return _embed(queries)
+    except Exception as e:
+        print(f"Error getting batch query embeddings: {e}")
+        return None
+
+
+def _read_index(path: str):
+    """Memory-map a FAISS index file, or read it onto the heap if it cannot be mapped."""
+    try:
+        return faiss.read_index(path, INDEX_MMAP_FLAG)
+    except RuntimeError:
+        return faiss.read_index(path)
+
+
+@lru_cache(maxsize=1)
 def get_vector_db():
-    """Load FAISS index and metadata."""
+    """
+    Load FAISS index and metadata (once per process; later calls share the same dict).
+    
+    The index file is memory-mapped, so repeated runs share the OS page cache.
+    Large catalogs get an approximate index (the prebuilt ANN_INDEX_FILE, else
+    search_core.maybe_ann_index); the exact index is then kept as
+    'exact_index' for ground-truth checks.
+    """
     if not os.path.exists(INDEX_FILE) or not os.path.exists(METADATA_FILE):
         raise FileNotFoundError(
             f"Vector database not found. Please run embeddings.py first. "
             f"Looking for: {INDEX_FILE} and {METADATA_FILE}"
         )
     
-    index = faiss.read_index(INDEX_FILE)
+    exact_index = _read_index(INDEX_FILE)
+    if os.path.exists(ANN_INDEX_FILE) and os.path.getmtime(ANN_INDEX_FILE) >= os.path.getmtime(INDEX_FILE):
+        index = _read_index(ANN_INDEX_FILE)
+    else:
+        index = maybe_ann_index(exact_index)
     with open(METADATA_FILE, 'rb') as f:
         metadata = pickle.load(f)
     
-    return {'index': index, 'metadata': metadata}
+    vector_db = {'index': index, 'metadata': metadata}
+    if index is not exact_index:
+        vector_db['exact_index'] = exact_index
+    metadata_columns(vector_db)
+    return vector_db
+
+
+class MetadataColumns(NamedTuple):
+    """Struct-of-arrays view of vector_db['metadata'], indexed by FAISS row id."""
+    urls: np.ndarray            # object array of primary URLs
+    alternate_urls: List[List[str]]
+    names_lower: List[str]
+    descs_lower: List[str]
+    durations: np.ndarray       # minutes, 0 when unknown
+    url_variants: List[FrozenSet[str]]  # get_all_url_variants of each row
+    name_words: List[FrozenSet[str]]    # whitespace tokens of names_lower
+    test_types: List[FrozenSet[str]]
+    records: List[Dict]         # candidate fields (everything but the scores)
+    term_masks: Dict            # (field, term) -> bool mask over rows, see term_mask
+
+
+def metadata_columns(vector_db: Dict) -> MetadataColumns:
+    """Columns for a vector DB's metadata, built on first use and cached on the dict."""
+    columns = vector_db.get('columns')
+    if columns is not None:
+        return columns
+    
+    metadata = vector_db['metadata']
+    records = [{
+        'row_id': row_id,
+        'url': meta['url'],
+        'alternate_urls': meta.get('alternate_urls', []),
+        'name': meta['name'],
+        'description': meta.get('description', ''),
+        'duration': meta.get('duration', 0) or 0,
+        'remote_support': meta.get('remote_support', 'No'),
+        'adaptive_support': meta.get('adaptive_support', 'No'),
+        'test_type': meta.get('test_type', []) if isinstance(meta.get('test_type'), list) else [],
+    } for row_id, meta in enumerate(metadata)]
+    columns = MetadataColumns(
+        urls=np.array([r['url'] for r in records], dtype=object),
+        alternate_urls=[r['alternate_urls'] for r in records],
+        names_lower=[r['name'].lower() for r in records],
+        descs_lower=[(r['description'] or '').lower() for r in records],
+        durations=np.array([r['duration'] for r in records], dtype=np.float64),
+        url_variants=[get_all_url_variants(r['url'], r['alternate_urls']) for r in records],
+        name_words=[frozenset(r['name'].lower().split()) for r in records],
+        test_types=[frozenset(r['test_type']) for r in records],
+        records=records,
+        term_masks={}
+    )
+    return vector_db.setdefault('columns', columns)
+
+
+def term_mask(columns: MetadataColumns, field: str, term: str) -> np.ndarray:
+    """
+    Boolean mask over all metadata rows: term is a substring of the row's
+    lowercased name ('name') or description ('desc'), or one of its test
+    types ('test_type'). Masks are cached per (field, term); the skill, role
+    and test-type vocabularies are small, so each is computed once.
+    """
+    key = (field, term)
+    mask = columns.term_masks.get(key)
+    if mask is None:
+        if field == 'name':
+            values = (term in name for name in columns.names_lower)
+        elif field == 'desc':
+            values = (term in desc for desc in columns.descs_lower)
+        else:
+            values = (term in types for types in columns.test_types)
+        mask = np.fromiter(values, dtype=bool, count=len(columns.records))
+        columns.term_masks[key] = mask
+    return mask
 
 
 def extract_keywords(query: str) -> List[str]:
@@ -76,57 +216,109 @@ def retrieve_candidates(
     if not query_embedding:
         return []
     
+    distances, indices = _search(query_embedding, vector_db, top_k * 3)
+    return _rank_hits(query, distances[0], indices[0], metadata_columns(vector_db), top_k, max_duration)
+
+
+def retrieve_candidates_batch(
+    queries: List[str],
+    vector_db: Dict,
+    top_k: int = 20,
+    max_duration: Optional[int] = None
+) -> List[List[Dict]]:
+    """
+    retrieve_candidates over many queries with one embedding call and one FAISS search.
+    
+    Returns one result list per query, in input order. Falls back to per-query
+    retrieval if the batched embedding request fails.
+    """
+    queries = list(queries)
+    if not queries:
+        return []
+    
+    embeddings = get_query_embeddings(queries)
+    if not embeddings or len(embeddings) != len(queries):
+        return [retrieve_candidates(q, vector_db, top_k, max_duration) for q in queries]
+    
+    distances, indices = search_batch(vector_db, embeddings, top_k * 3)
+    columns = metadata_columns(vector_db)
+    return [
+        _rank_hits(query, distances[i], indices[i], columns, top_k, max_duration)
+        for i, query in enumerate(queries)
+    ]
+
+
+def retrieve_candidates_multi(
+    query: str,
+    vector_db: Dict,
+    top_ks: List[int],
+    max_duration: Optional[int] = None
+) -> Dict[int, List[Dict]]:
+    """
+    retrieve_candidates for several top_k values with one embedding and search.
+    
+    Each top_k re-ranks its own top_k * 3 search hits, so every entry equals
+    retrieve_candidates(query, vector_db, top_k) - a plain slice of the
+    deepest result would not, since keyword boosts reorder the pool.
+    """
+    query_embedding = get_query_embedding(query)
+    if not query_embedding:
+        return {k: [] for k in top_ks}
+    
+    distances, indices = _search(query_embedding, vector_db, max(top_ks) * 3)
+    columns = metadata_columns(vector_db)
+    return {
+        k: _rank_hits(query, distances[0][:k * 3], indices[0][:k * 3], columns, k, max_duration)
+        for k in top_ks
+    }
+
+
+def _search(query_embedding, vector_db: Dict, search_k: int):
+    """Cosine search of one query embedding against the FAISS index."""
     index = vector_db['index']
-    metadata = vector_db['metadata']
     
     # Normalize query embedding for cosine similarity
     query_vec = np.array([query_embedding], dtype='float32')
     faiss.normalize_L2(query_vec)
     
     # Search more candidates for re-ranking
-    search_k = min(top_k * 3, index.ntotal)
-    distances, indices = index.search(query_vec, search_k)
+    return index.search(query_vec, min(search_k, index.ntotal))
+
+
+def _rank_hits(query: str, distances, indices, columns: MetadataColumns, top_k: int, max_duration: Optional[int] = None) -> List[Dict]:
+    """
+    Keyword-boost one query's search hits and return the top_k by combined score.
     
+    Scores are computed over the metadata columns; result dicts are only
+    built for the top_k winners.
+    """
     # Extract keywords from query for boosting
     keywords = extract_keywords(query)
     
-    # Format results with keyword boost
-    candidates = []
-    for i, idx in enumerate(indices[0]):
-        if idx < len(metadata):
-            meta = metadata[idx]
-            
-            # Apply duration filter if specified
-            if max_duration and meta.get('duration', 0) > max_duration:
-                continue
-            
-            # Calculate keyword boost
-            name_lower = meta['name'].lower()
-            desc_lower = (meta.get('description', '') or '').lower()
-            
+    indices = np.asarray(indices)
+    keep = (indices >= 0) & (indices < len(columns.records))
+    # Apply duration filter if specified
+    if max_duration:
+        keep[keep] = columns.durations[indices[keep]] <= max_duration
+    rows = indices[keep]
+    scores = np.asarray(distances, dtype=np.float64)[keep]
+    
+    # Calculate keyword boost
+    if keywords:
+        names_lower = columns.names_lower
+        descs_lower = columns.descs_lower
+        for j, idx in enumerate(rows):
+            name_lower = names_lower[idx]
+            desc_lower = descs_lower[idx]
             keyword_boost = 0.0
             for kw in keywords:
                 if kw in name_lower:
                     keyword_boost += 0.15  # Boost for name match
                 elif kw in desc_lower:
                     keyword_boost += 0.05  # Smaller boost for description match
-            
             # Combined score (similarity + keyword boost)
-            combined_score = float(distances[0][i]) + keyword_boost
-            
-            candidates.append({
-                'url': meta['url'],
-                'alternate_urls': meta.get('alternate_urls', []),
-                'name': meta['name'],
-                'description': meta.get('description', ''),
-                'duration': meta.get('duration', 0) or 0,
-                'remote_support': meta.get('remote_support', 'No'),
-                'adaptive_support': meta.get('adaptive_support', 'No'),
-                'test_type': meta.get('test_type', []) if isinstance(meta.get('test_type'), list) else [],
-                'distance': combined_score
-            })
-    
-    # Re-sort by combined score (higher is better)
-    candidates.sort(key=lambda x: x['distance'], reverse=True)
-    
-    return candidates[:top_k]
+            scores[j] += keyword_boost
+    
+    # Re-sort by combined score (higher is better), only the top_k winners
+    records = columns.records
+    return [dict(records[rows[j]], distance=float(scores[j])) for j in topk_indices(scores, top_k)]
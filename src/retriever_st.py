@@ -15,15 +15,64 @@ try:
 except ImportError:
     SENTENCE_TRANSFORMERS_AVAILABLE = False
 
-from src.embeddings_st import get_model, get_vector_db_st, INDEX_FILE_ST, METADATA_FILE_ST
+from src import embed_cache
+from src.search_core import search_batch
+from src.embeddings_st import get_model, get_vector_db_st, INDEX_FILE_ST, METADATA_FILE_ST, MODEL_NAME_ST
+
+# Candidates pulled from the index before keyword boosting
+BOOST_SEARCH_K = 100
+
+
+def enable_query_cache_st(path: Optional[str] = None):
+    """Persist SentenceTransformer query embeddings across runs (used by the evaluation scripts)."""
+    return embed_cache.enable(MODEL_NAME_ST, path)
 
 
 def get_query_embedding_st(query: str) -> np.ndarray:
     """Get embedding for query using SentenceTransformer."""
+    cache = embed_cache.active(MODEL_NAME_ST)
+    if cache is not None:
+        cached = cache.get(query)
+        if cached is not None:
+            return cached
     model = get_model()
     if model is None:
         return None
-    return model.encode(query, convert_to_numpy=True)
+    embedding = model.encode(query, convert_to_numpy=True)
+    if cache is not None:
+        cache.put(query, embedding)
+    return embedding
+
+
+def encode_queries_batch(queries: List[str], batch_size: int = 64) -> Optional[np.ndarray]:
+    """
+    Embed many queries in one encode() call.
+    
+    Returns an (N, d) float32 array of L2-normalized vectors, in input order,
+    for the *_precomputed retrieval functions.
+    """
+    if not SENTENCE_TRANSFORMERS_AVAILABLE:
+        return None
+    
+    def _encode(texts):
+        # Model is loaded lazily, so a fully cached batch never loads it;
+        # encode() already runs the model in eval mode without autograd
+        return get_model().encode(
+            texts,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            normalize_embeddings=True
+        )
+    
+    cache = embed_cache.active(MODEL_NAME_ST)
+    if cache is not None:
+        embeddings = cache.get_or_compute(queries, _encode)
+    else:
+        embeddings = _encode(list(queries))
+    embeddings = np.ascontiguousarray(embeddings, dtype='float32')
+    # Vectors cached by get_query_embedding_st are unnormalized, so normalize here
+    faiss.normalize_L2(embeddings)
+    return embeddings
 
 
 def retrieve_candidates_st(
@@ -43,27 +92,32 @@ def retrieve_candidates_st(
         print("Error: Vector DB not available")
         return []
     
-    index = vector_db['index']
-    metadata = vector_db['metadata']
-    
     # Get query embedding
     query_embedding = get_query_embedding_st(query)
     if query_embedding is None:
         return []
     
-    # Normalize for cosine similarity
-    query_embedding = query_embedding.astype('float32').reshape(1, -1)
-    faiss.normalize_L2(query_embedding)
-    
+    return retrieve_candidates_st_precomputed(query_embedding, vector_db, top_k=top_k)
+
+
+def retrieve_candidates_st_precomputed(
+    query_embedding: np.ndarray,
+    vector_db: Dict,
+    top_k: int = 10
+) -> List[Dict]:
+    """retrieve_candidates_st for an already-encoded query (see encode_queries_batch)."""
     # Search
-    search_k = min(top_k * 2, index.ntotal)  # Get more candidates for filtering
-    distances, indices = index.search(query_embedding, search_k)
-    
+    distances, indices = search_batch(vector_db, query_embedding, top_k * 2)  # Get more candidates for filtering
+    return _build_candidates(distances[0], indices[0], vector_db['metadata'], top_k)
+
+
+def _build_candidates(distances, indices, metadata: List[Dict], top_k: int) -> List[Dict]:
+    """Turn one query's search hits into deduplicated candidate dicts."""
     # Build results
     candidates = []
     seen_urls = set()
     
-    for i, (dist, idx) in enumerate(zip(distances[0], indices[0])):
+    for i, (dist, idx) in enumerate(zip(distances, indices)):
         if idx < 0 or idx >= len(metadata):
             continue
         
@@ -109,22 +163,28 @@ def retrieve_with_boost_st(
     if vector_db is None:
         return []
     
-    index = vector_db['index']
-    metadata = vector_db['metadata']
-    
     # Get query embedding
     query_embedding = get_query_embedding_st(query)
     if query_embedding is None:
         return []
     
-    # Normalize for cosine similarity
-    query_embedding = query_embedding.astype('float32').reshape(1, -1)
-    faiss.normalize_L2(query_embedding)
-    
+    return retrieve_with_boost_st_precomputed(query, query_embedding, vector_db, top_k=top_k)
+
+
+def retrieve_with_boost_st_precomputed(
+    query: str,
+    query_embedding: np.ndarray,
+    vector_db: Dict,
+    top_k: int = 10
+) -> List[Dict]:
+    """retrieve_with_boost_st for an already-encoded query (see encode_queries_batch)."""
     # Get ALL candidates (or a large number)
-    search_k = min(100, index.ntotal)
-    distances, indices = index.search(query_embedding, search_k)
-    
+    distances, indices = search_batch(vector_db, query_embedding, BOOST_SEARCH_K)
+    return _build_boosted(query, distances[0], indices[0], vector_db['metadata'], top_k)
+
+
+def _build_boosted(query: str, distances, indices, metadata: List[Dict], top_k: int) -> List[Dict]:
+    """Keyword-boost one query's search hits and return the top_k."""
     # Extract keywords from query
     query_lower = query.lower()
     query_words = set(re.findall(r'\b\w+\b', query_lower))
@@ -151,7 +211,7 @@ def retrieve_with_boost_st(
     candidates = []
     seen_urls = set()
     
-    for dist, idx in zip(distances[0], indices[0]):
+    for dist, idx in zip(distances, indices):
         if idx < 0 or idx >= len(metadata):
             continue
         
@@ -208,6 +268,37 @@ def retrieve_with_boost_st(
     return candidates[:top_k]
 
 
+def retrieve_batch(
+    queries: List[str],
+    vector_db: Dict,
+    top_k: int = 10,
+    boost: bool = True
+) -> List[List[Dict]]:
+    """
+    Retrieve for many queries with one encode() call and one batched search.
+    
+    Returns one result list per query, in input order; boost selects
+    retrieve_with_boost_st scoring, otherwise retrieve_candidates_st.
+    """
+    queries = list(queries)
+    if not queries or vector_db is None:
+        return [[] for _ in queries]
+    
+    query_vecs = encode_queries_batch(queries)
+    if query_vecs is None:
+        return [[] for _ in queries]
+    
+    metadata = vector_db['metadata']
+    if boost:
+        distances, indices = search_batch(vector_db, query_vecs, BOOST_SEARCH_K)
+        return [
+            _build_boosted(q, distances[i], indices[i], metadata, top_k)
+            for i, q in enumerate(queries)
+        ]
+    distances, indices = search_batch(vector_db, query_vecs, top_k * 2)
+    return [_build_candidates(distances[i], indices[i], metadata, top_k) for i in range(len(queries))]
+
+
 if __name__ == "__main__":
     # Test the retriever
     db = get_vector_db_st()
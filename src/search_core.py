@@ -0,0 +1,136 @@
+"""
+Batched nearest-neighbour search shared by the retrievers.
+"""
+import os
+from typing import Dict, Tuple
+
+import faiss
+import numpy as np
+
+# Approximate index used in place of an exact flat index once the catalog has
+# more than ANN_MIN_VECTORS rows: 'hnsw', 'ivf', 'ivfpq', or 'flat' to always scan
+ANN_INDEX = os.getenv('ANN_INDEX', 'hnsw').lower()
+ANN_MIN_VECTORS = int(os.getenv('ANN_MIN_VECTORS', '500'))
+
+
+def topk_cosine(Q: np.ndarray, D: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k cosine similarity for a batch of queries with one matmul.
+
+    Args:
+        Q: (n_queries, d) unit-normalized query vectors
+        D: (n_docs, d) unit-normalized document vectors
+        k: Number of neighbours per query
+
+    Returns:
+        (scores, indices), each (n_queries, k), best first - same layout as
+        faiss index.search
+    """
+    Q = np.ascontiguousarray(Q, dtype=np.float32)
+    if Q.ndim == 1:
+        Q = Q.reshape(1, -1)
+    k = min(k, D.shape[0])
+    if k <= 0:
+        empty = np.empty((Q.shape[0], 0))
+        return empty.astype(np.float32), empty.astype(np.int64)
+
+    return _topk_from_scores(Q @ D.T, k)
+
+
+def build_int8_index(D: np.ndarray) -> faiss.IndexScalarQuantizer:
+    """
+    Inner-product index over 8-bit scalar-quantized document vectors.
+    
+    FAISS keeps only the uint8 codes (a quarter of the float32 matrix) and
+    decodes them inside its distance kernels, so searches never materialize
+    a float copy of the documents.
+    """
+    D = np.ascontiguousarray(D, dtype=np.float32)
+    index = faiss.IndexScalarQuantizer(D.shape[1], faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+    index.train(D)
+    index.add(D)
+    return index
+
+
+def _topk_from_scores(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Best-first top-k (scores, indices) of each row of a score matrix."""
+    rows = np.arange(scores.shape[0])[:, None]
+    if k < scores.shape[1]:
+        # Unordered top-k per row in O(n_docs), then sort only those k
+        part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+    part_scores = scores[rows, part]
+    order = np.argsort(-part_scores, axis=1, kind='stable')
+    return part_scores[rows, order], part[rows, order].astype(np.int64)
+
+
+def topk_indices(scores, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first, in O(n + k log k).
+    
+    Equivalent to a stable descending sort sliced to k: ties keep their
+    original order, including ties at the k-th place.
+    """
+    scores = np.asarray(scores)
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.size:
+        kth = scores[np.argpartition(-scores, k - 1)[k - 1]]
+        selected = np.flatnonzero(scores >= kth)
+    else:
+        selected = np.arange(scores.size)
+    order = np.argsort(-scores[selected], kind='stable')
+    return selected[order][:k]
+
+
+def maybe_ann_index(index, kind: str = ANN_INDEX, min_vectors: int = ANN_MIN_VECTORS):
+    """
+    Rebuild an exact IndexFlatIP as an HNSW, IVF or IVFPQ index for large catalogs.
+    
+    Small catalogs (the SHL catalog is a few hundred rows) keep the exact flat
+    index: a brute-force scan is already cheap there and loses no recall.
+    Other index types are returned unchanged.
+    """
+    if kind == 'flat' or index.ntotal <= min_vectors or not isinstance(index, faiss.IndexFlatIP):
+        return index
+    
+    vecs = index.reconstruct_n(0, index.ntotal)
+    d = index.d
+    if kind == 'ivf':
+        quantizer = faiss.IndexFlatIP(d)
+        nlist = max(1, int(np.sqrt(index.ntotal)))
+        ann = faiss.IndexIVFFlat(quantizer, d, nlist, faiss.METRIC_INNER_PRODUCT)
+        ann.train(vecs)
+        ann.nprobe = min(16, nlist)
+    elif kind == 'ivfpq' and d % 16 == 0:
+        quantizer = faiss.IndexFlatIP(d)
+        nlist = min(64, max(1, index.ntotal // 39))  # faiss wants ~39 training points per list
+        ann = faiss.IndexIVFPQ(quantizer, d, nlist, 16, 8, faiss.METRIC_INNER_PRODUCT)
+        ann.train(vecs)
+        ann.nprobe = min(8, nlist)
+    else:
+        ann = faiss.IndexHNSWFlat(d, 32, faiss.METRIC_INNER_PRODUCT)
+        ann.hnsw.efConstruction = 80
+        ann.hnsw.efSearch = 128
+    ann.add(vecs)
+    return ann
+
+
+def search_batch(vector_db: Dict, query_vecs: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Search all query vectors at once; normalizes them for cosine similarity.
+
+    Uses the 8-bit index of a quantized db ('quantized'), else the raw
+    embedding matrix when the db carries one ('embeddings'), otherwise a
+    single batched FAISS index.search call.
+    """
+    query_vecs = np.array(query_vecs, dtype=np.float32, ndmin=2)
+    faiss.normalize_L2(query_vecs)
+
+    embeddings = vector_db.get('embeddings')
+    if embeddings is not None and not vector_db.get('quantized'):
+        return topk_cosine(query_vecs, embeddings, k)
+
+    index = vector_db['index_int8'] if vector_db.get('quantized') else vector_db['index']
+    return index.search(query_vecs, min(k, index.ntotal))
@@ -0,0 +1,53 @@
+"""
+Packed (url, alternate_urls) table for the assessment catalog.
+
+scripts/add_alternate_urls.py writes it next to data/assessments.json so
+URL-only consumers can skip parsing the full JSON catalog.
+"""
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+URL_TABLE_FILE = 'data/assessment_urls.npz'
+
+
+def save_url_table(assessments: List[Dict], path: str = URL_TABLE_FILE) -> None:
+    """
+    Write each assessment's url and alternate_urls as flat string arrays.
+    
+    The alternates of assessment i are alternates[offsets[i]:offsets[i + 1]].
+    """
+    alternates = [a.get('alternate_urls') or [] for a in assessments]
+    offsets = np.zeros(len(assessments) + 1, dtype=np.int64)
+    np.cumsum([len(alts) for alts in alternates], out=offsets[1:])
+    
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        np.savez_compressed(
+            f,
+            urls=np.array([a.get('url', '') for a in assessments], dtype=np.str_),
+            alternates=np.array([alt for alts in alternates for alt in alts], dtype=np.str_),
+            offsets=offsets
+        )
+    os.replace(tmp_path, path)
+
+
+def load_url_table(path: str = URL_TABLE_FILE,
+                   source_path: Optional[str] = None) -> Optional[List[Tuple[str, List[str]]]]:
+    """
+    (url, alternate_urls) per assessment, or None if the table has not been written.
+    
+    With source_path, also None when the table is older than that catalog file,
+    since only add_alternate_urls.py refreshes the table.
+    """
+    if not os.path.exists(path):
+        return None
+    if source_path and os.path.exists(source_path) and os.path.getmtime(path) < os.path.getmtime(source_path):
+        return None
+    
+    with np.load(path, allow_pickle=False) as data:
+        urls = data['urls'].tolist()
+        alternates = data['alternates'].tolist()
+        offsets = data['offsets'].tolist()
+    return [(url, alternates[offsets[i]:offsets[i + 1]]) for i, url in enumerate(urls)]
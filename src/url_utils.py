@@ -2,9 +2,18 @@
 Unified URL normalization utilities for consistent URL matching across all components.
 """
 import re
-from typing import List, Set
+from functools import lru_cache
+from typing import FrozenSet, List, Tuple
 
+# Percent-escapes decoded in slugs (URLs are lowercased first)
+_PERCENT_ESCAPES = {'%28': '(', '%29': ')', '%20': ' ', '%2d': '-'}
+_PERCENT_RE = re.compile('|'.join(_PERCENT_ESCAPES))
 
+SOLUTIONS_VIEW_PATH = '/solutions/products/product-catalog/view/'
+PRODUCTS_VIEW_PATH = '/products/product-catalog/view/'
+
+
+@lru_cache(maxsize=1 << 16)
 def normalize_url_to_slug(url: str) -> str:
     """
     Extract canonical slug from URL.
@@ -15,6 +24,9 @@ def normalize_url_to_slug(url: str) -> str:
         
     Returns:
         Canonical slug (lowercase, decoded, no trailing slash)
+    
+    Results are memoized: evaluation loops normalize the same few hundred
+    catalog URLs many thousands of times.
     """
     if not url:
         return ""
@@ -22,18 +34,16 @@ def normalize_url_to_slug(url: str) -> str:
     url = url.lower().strip().rstrip('/')
     
     # Extract slug after /view/
-    if '/view/' in url:
-        slug = url.split('/view/')[-1].rstrip('/')
-        # Decode URL encoding
-        slug = slug.replace('%28', '(').replace('%29', ')')
-        slug = slug.replace('%20', ' ')
-        slug = slug.replace('%2d', '-')
-        return slug
+    _, sep, slug = url.rpartition('/view/')
+    if sep:
+        # Decode URL encoding in one pass
+        return _PERCENT_RE.sub(lambda m: _PERCENT_ESCAPES[m.group()], slug.rstrip('/'))
     
     # Fallback: return normalized URL
     return url
 
 
+@lru_cache(maxsize=1 << 15)
 def generate_alternate_url(url: str) -> str:
     """
     Generate alternate URL variant.
@@ -50,12 +60,12 @@ def generate_alternate_url(url: str) -> str:
     
     url_lower = url.lower()
     
-    if '/solutions/products/product-catalog/view/' in url_lower:
+    if SOLUTIONS_VIEW_PATH in url_lower:
         # Convert to /products/ variant
-        return url.replace('/solutions/products/product-catalog/view/', '/products/product-catalog/view/')
-    elif '/products/product-catalog/view/' in url_lower:
+        return url.replace(SOLUTIONS_VIEW_PATH, PRODUCTS_VIEW_PATH)
+    elif PRODUCTS_VIEW_PATH in url_lower:
         # Convert to /solutions/products/ variant
-        return url.replace('/products/product-catalog/view/', '/solutions/products/product-catalog/view/')
+        return url.replace(PRODUCTS_VIEW_PATH, SOLUTIONS_VIEW_PATH)
     
     return url
 
@@ -88,33 +98,40 @@ def normalize_url_for_comparison(url: str) -> str:
     return url.lower()
 
 
-def get_all_url_variants(url: str, alternate_urls: List[str] = None) -> Set[str]:
+def get_all_url_variants(url: str, alternate_urls: List[str] = None) -> FrozenSet[str]:
     """
     Get all URL variants (primary + alternates) normalized to slugs.
     
+    Results are memoized per (url, alternate_urls); the same catalog entries
+    come back for many queries in evaluation loops.
+    
     Args:
         url: Primary URL
         alternate_urls: List of alternate URLs
         
     Returns:
-        Set of normalized slugs for all URL variants
+        Frozen set of normalized slugs for all URL variants
     """
+    return _url_variants(url, tuple(alternate_urls) if alternate_urls else ())
+
+
+@lru_cache(maxsize=1 << 15)
+def _url_variants(url: str, alternate_urls: Tuple[str, ...]) -> FrozenSet[str]:
     variants = set()
     
     # Add primary URL slug
     variants.add(normalize_url_to_slug(url))
     
     # Add alternate URLs slugs
-    if alternate_urls:
-        for alt_url in alternate_urls:
-            variants.add(normalize_url_to_slug(alt_url))
+    for alt_url in alternate_urls:
+        variants.add(normalize_url_to_slug(alt_url))
     
     # Also generate and add the alternate variant if not already present
     alt_variant = generate_alternate_url(url)
     if alt_variant != url:
         variants.add(normalize_url_to_slug(alt_variant))
     
-    return variants
+    return frozenset(variants)
 
 
 def urls_match(url1: str, url2: str, alternate_urls1: List[str] = None, alternate_urls2: List[str] = None) -> bool:
@@ -1,8 +1,13 @@
+import os
 import re
+import threading
 from typing import Optional, List
 import requests
 from bs4 import BeautifulSoup
 
+# Caps concurrent Gemini calls when callers fan out over threads (API rate limits)
+GEMINI_SLOTS = threading.BoundedSemaphore(int(os.getenv('GEMINI_MAX_CONCURRENCY', '8')))
+
 
 def extract_duration_from_query(query: str) -> Optional[int]:
     """Extract maximum duration constraint from query text."""
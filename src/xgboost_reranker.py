@@ -4,7 +4,8 @@ Learns from training data to improve ranking without API calls.
 """
 import os
 import json
-import csv
+import threading
+from functools import lru_cache
 import numpy as np
 try:
     import pandas as pd
@@ -12,9 +13,10 @@ try:
 except ImportError:
     PANDAS_AVAILABLE = False
 from typing import List, Dict, Tuple
-from collections import defaultdict
 import re
 
+from src.search_core import topk_indices
+
 try:
     import xgboost as xgb
     XGBOOST_AVAILABLE = True
@@ -128,64 +130,83 @@ def extract_features(query: str, candidate: Dict, query_info: Dict = None) -> Di
     return features
 
 
-def prepare_training_data(train_csv_path: str, vector_db, retrieve_func) -> Tuple[pd.DataFrame, pd.DataFrame]:
+# Feature column order used for every model input matrix
+FEATURE_NAMES = tuple(extract_features('', {}))
+
+
+def features_matrix(query: str, candidates: List[Dict], query_info: Dict = None, out: np.ndarray = None) -> np.ndarray:
+    """
+    Feature rows for a query's candidates as a float32 (n, len(FEATURE_NAMES)) array.
+    
+    If out is given, rows are written into it (it must have len(candidates) rows).
+    """
+    if out is None:
+        out = np.empty((len(candidates), len(FEATURE_NAMES)), dtype=np.float32)
+    for row, cand in zip(out, candidates):
+        features = extract_features(query, cand, query_info)
+        row[:] = [features[name] for name in FEATURE_NAMES]
+    return out
+
+
+def _build_rows_for_query(query: str, relevant_slugs, vector_db, retrieve_func) -> Tuple[np.ndarray, np.ndarray]:
+    """Feature rows (FEATURE_NAMES order) and 0/1 relevance labels for one train query."""
+    from src.advanced_retriever import preprocess_query
+    from src.url_utils import get_all_url_variants
+    
+    # Get candidates using retrieval function
+    candidates = retrieve_func(query, vector_db, top_k=50)  # Get more candidates
+    
+    query_info = preprocess_query(query)
+    
+    # Extract features for each candidate
+    X = features_matrix(query, candidates, query_info)
+    
+    # Label: 1 if relevant, 0 if not
+    y = np.fromiter(
+        (not relevant_slugs.isdisjoint(get_all_url_variants(cand.get('url', ''), cand.get('alternate_urls', [])))
+         for cand in candidates),
+        dtype=np.int64, count=len(candidates)
+    )
+    return X, y
+
+
+def prepare_training_data(train_csv_path: str, vector_db, retrieve_func, workers: int = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
     """
     Prepare training data from train set.
     For each query-candidate pair, extract features and label (1 if relevant, 0 if not).
+    Queries are retrieved in parallel on a thread pool (see map_queries).
     """
     if not XGBOOST_AVAILABLE:
         return None, None
     
-    # Load train data
-    train_queries = defaultdict(set)
-    with open(train_csv_path, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            query = row['Query'].strip()
-            url = row['Assessment_url'].strip()
-            train_queries[query].add(url)
+    # Load train data (query -> relevant slugs)
+    from src.eval_utils import DEFAULT_WORKERS, load_train, map_queries
+    train_queries = load_train(train_csv_path)
     
     print(f"Preparing training data from {len(train_queries)} queries...")
     
-    # Import query preprocessing
-    from src.advanced_retriever import preprocess_query
-    from src.url_utils import normalize_url_to_slug, get_all_url_variants
+    rows = map_queries(
+        lambda q: _build_rows_for_query(q, train_queries[q], vector_db, retrieve_func),
+        train_queries,
+        DEFAULT_WORKERS if workers is None else workers,
+        desc='Training data'
+    )
     
-    X_features = []
-    y_labels = []
+    # Return as numpy arrays (pandas not needed), columns in FEATURE_NAMES order
+    if rows:
+        X = np.vstack([X_q for X_q, _ in rows])
+        y = np.concatenate([y_q for _, y_q in rows])
+    else:
+        X = np.empty((0, len(FEATURE_NAMES)), dtype=np.float32)
+        y = np.empty(0, dtype=np.int64)
     
-    for query, relevant_urls in train_queries.items():
-        # Get candidates using retrieval function
-        candidates = retrieve_func(query, vector_db, top_k=50)  # Get more candidates
-        
-        # Normalize relevant URLs
-        relevant_slugs = set()
-        for url in relevant_urls:
-            relevant_slugs.add(normalize_url_to_slug(url))
-        
-        query_info = preprocess_query(query)
-        
-        # Extract features for each candidate
-        for cand in candidates:
-            features = extract_features(query, cand, query_info)
-            X_features.append(features)
-            
-            # Label: 1 if relevant, 0 if not
-            cand_urls = get_all_url_variants(cand.get('url', ''), cand.get('alternate_urls', []))
-            is_relevant = 1 if len(relevant_slugs & cand_urls) > 0 else 0
-            y_labels.append(is_relevant)
-    
-    # Return as numpy arrays (pandas not needed)
-    import numpy as np
-    X = np.array(X_features)
-    y = np.array(y_labels)
-    
-    print(f"Prepared {len(X)} training samples ({sum(y_labels)} positive, {len(y_labels) - sum(y_labels)} negative)")
+    n_positive = int(y.sum())
+    print(f"Prepared {len(X)} training samples ({n_positive} positive, {len(y) - n_positive} negative)")
     
     return X, y
 
 
-def train_xgboost_reranker(train_csv_path: str, vector_db, retrieve_func, model_path: str = 'data/xgboost_reranker.pkl'):
+def train_xgboost_reranker(train_csv_path: str, vector_db, retrieve_func, model_path: str = 'data/xgboost_reranker.pkl', workers: int = None):
     """
     Train XGBoost model for re-ranking.
     """
@@ -193,7 +214,7 @@ def train_xgboost_reranker(train_csv_path: str, vector_db, retrieve_func, model_
         print("Error: xgboost not available")
         return None
     
-    X, y = prepare_training_data(train_csv_path, vector_db, retrieve_func)
+    X, y = prepare_training_data(train_csv_path, vector_db, retrieve_func, workers)
     
     if X is None or len(X) == 0:
         print("Error: No training data prepared")
@@ -247,6 +268,53 @@ def load_xgboost_reranker(model_path: str = 'data/xgboost_reranker.pkl'):
     return model
 
 
+def get_xgboost_reranker(model_path: str = 'data/xgboost_reranker.pkl'):
+    """
+    load_xgboost_reranker, memoized per process.
+    
+    The cache is keyed on the file's modification time, so a retrained model
+    is picked up on the next call; only a stat() is paid per query otherwise.
+    """
+    try:
+        mtime = os.stat(model_path).st_mtime_ns
+    except OSError:
+        return None
+    return _load_xgboost_reranker_cached(model_path, mtime)
+
+
+@lru_cache(maxsize=2)
+def _load_xgboost_reranker_cached(model_path: str, mtime: int):
+    return load_xgboost_reranker(model_path)
+
+
+# Per-thread feature buffer reused across rerank_with_xgboost calls
+_feature_buffers = threading.local()
+
+
+def _features_buffer(n_rows: int) -> np.ndarray:
+    """A (n_rows, len(FEATURE_NAMES)) float32 view of this thread's reusable buffer."""
+    buf = getattr(_feature_buffers, 'buf', None)
+    if buf is None or buf.shape[0] < n_rows:
+        buf = np.empty((max(n_rows, 64), len(FEATURE_NAMES)), dtype=np.float32)
+        _feature_buffers.buf = buf
+    return buf[:n_rows]
+
+
+def _predict_positive(model, X: np.ndarray) -> np.ndarray:
+    """
+    Probability of the positive class for each row of a float32 feature matrix.
+    
+    Binary-logistic models go through Booster.inplace_predict, which reads the
+    ndarray directly instead of building a DMatrix per call.
+    """
+    if getattr(model, 'objective', None) == 'binary:logistic' and hasattr(model, 'get_booster'):
+        try:
+            return model.get_booster().inplace_predict(np.ascontiguousarray(X, dtype=np.float32))
+        except (AttributeError, TypeError, ValueError):
+            pass
+    return model.predict_proba(X)[:, 1]
+
+
 def rerank_with_xgboost(
     query: str,
     candidates: List[Dict],
@@ -268,26 +336,60 @@ def rerank_with_xgboost(
         from src.advanced_retriever import preprocess_query
         query_info = preprocess_query(query)
     
-    features_list = []
-    for cand in candidates:
-        features = extract_features(query, cand, query_info)
-        features_list.append(features)
-    
-    # Convert to numpy array (no pandas needed)
-    import numpy as np
-    X = np.array(features_list)
+    X = features_matrix(query, candidates, query_info, out=_features_buffer(len(candidates)))
     
     # Get probability scores (higher = more likely to be relevant)
-    scores = model.predict_proba(X)[:, 1]  # Probability of positive class
+    scores = _predict_positive(model, X)
     
-    # Add scores to candidates and sort
+    # Add scores to candidates
     for i, cand in enumerate(candidates):
         cand['xgboost_score'] = float(scores[i])
     
-    # Sort by XGBoost score (descending)
-    candidates.sort(key=lambda x: x.get('xgboost_score', 0), reverse=True)
+    # Top_k by XGBoost score (descending), without sorting the whole list
+    return [candidates[i] for i in topk_indices(scores, top_k)]
+
+
+def rerank_with_xgboost_batch(
+    queries: List[str],
+    candidates_list: List[List[Dict]],
+    model,
+    query_infos: List[Dict] = None,
+    top_k: int = 10
+) -> List[List[Dict]]:
+    """
+    rerank_with_xgboost for many queries with a single model call.
+    
+    Features for every (query, candidate) pair go into one preallocated
+    float32 matrix; the scores are then split back per query by row offset.
+    """
+    if not XGBOOST_AVAILABLE or model is None:
+        return [candidates[:top_k] for candidates in candidates_list]
+    
+    if query_infos is None:
+        from src.advanced_retriever import preprocess_query
+        query_infos = [preprocess_query(q) for q in queries]
+    
+    sizes = [len(candidates) for candidates in candidates_list]
+    offsets = np.concatenate(([0], np.cumsum(sizes))).astype(int)
+    if offsets[-1] == 0:
+        return [[] for _ in candidates_list]
+    
+    X = np.empty((offsets[-1], len(FEATURE_NAMES)), dtype=np.float32)
+    for query, candidates, query_info, start, end in zip(queries, candidates_list, query_infos, offsets, offsets[1:]):
+        features_matrix(query, candidates, query_info, out=X[start:end])
+    
+    # Get probability scores (higher = more likely to be relevant)
+    scores = _predict_positive(model, X)
+    
+    results = []
+    for candidates, start, end in zip(candidates_list, offsets, offsets[1:]):
+        for i, cand in enumerate(candidates):
+            cand['xgboost_score'] = float(scores[start + i])
+        
+        # Top_k by XGBoost score (descending), without sorting the whole list
+        results.append([candidates[i] for i in topk_indices(scores[start:end], top_k)])
     
-    return candidates[:top_k]
+    return results
 
 
 if __name__ == "__main__":